@@ -28,4 +28,117 @@ export const processDocument = async (req, res) => {
     console.error('[Node.js] Error contacting ML service:', error.message);
     res.status(500).json({ message: 'Could not connect to the ML processing service.' });
   }
-};
\ No newline at end of file
+};
+
+// Relays the ML service's server-sent events (progress, decision, narrative tokens)
+// to the client as they arrive, instead of waiting for the whole answer.
+const ML_STREAM_URL = process.env.ML_STREAM_URL || (ML_API_URL && `${ML_API_URL}/stream`);
+
+export const processDocumentStream = async (req, res) => {
+  if (!req.file || !req.body.query) {
+    return res.status(400).json({ message: 'A PDF file and a query string are required.' });
+  }
+
+  console.log('[Node.js] Streaming request to Cloud ML Service...');
+
+  const formData = new FormData();
+  formData.append('file', req.file.buffer, { filename: req.file.originalname, contentType: 'application/pdf' });
+  formData.append('query', req.body.query);
+
+  try {
+    const mlResponse = await axios.post(ML_STREAM_URL, formData, {
+      headers: { ...formData.getHeaders() },
+      responseType: 'stream',
+      timeout: 180000
+    });
+
+    res.status(200).set({
+      'Content-Type': 'text/event-stream',
+      'Cache-Control': 'no-cache',
+      'Connection': 'keep-alive',
+      'X-Accel-Buffering': 'no'
+    });
+    res.flushHeaders();
+
+    mlResponse.data.pipe(res);
+    mlResponse.data.on('end', () => console.log('[Node.js] Stream from Python finished.'));
+    mlResponse.data.on('error', (streamError) => {
+      console.error('[Node.js] Error while relaying ML stream:', streamError.message);
+      res.end();
+    });
+    // Stop the upstream work if the browser goes away before the answer is complete.
+    // (req's 'close' fires as soon as the upload has been read, so listen on res.)
+    res.on('close', () => {
+      if (!res.writableEnded) {
+        mlResponse.data.destroy();
+      }
+    });
+
+  } catch (error) {
+    console.error('[Node.js] Error contacting ML service:', error.message);
+    if (!res.headersSent) {
+      res.status(500).json({ message: 'Could not connect to the ML processing service.' });
+    } else {
+      res.end();
+    }
+  }
+};
+
+
+// Job mode: the ML service queues the run and answers at once with a job id,
+// so no request has to stay open for the whole pipeline.
+const ML_JOBS_URL = process.env.ML_JOBS_URL || (ML_API_URL && ML_API_URL.replace(/\/process\/?$/, '/jobs'));
+// Longest long-poll the ML service accepts (its JOB_MAX_WAIT_SECONDS).
+const MAX_JOB_WAIT_SECONDS = 30;
+
+// Passes the ML service's own status codes through (202, 404, 503 + Retry-After),
+// so clients can tell a busy queue from a broken service.
+const relayJobResponse = (res, mlResponse) => {
+  const retryAfter = mlResponse.headers['retry-after'];
+  if (retryAfter) {
+    res.set('Retry-After', retryAfter);
+  }
+  res.status(mlResponse.status).json(mlResponse.data);
+};
+
+export const submitDocumentJob = async (req, res) => {
+  if (!req.file || !req.body.query) {
+    return res.status(400).json({ message: 'A PDF file and a query string are required.' });
+  }
+
+  console.log('[Node.js] Submitting job to Cloud ML Service...');
+
+  const formData = new FormData();
+  formData.append('file', req.file.buffer, { filename: req.file.originalname, contentType: 'application/pdf' });
+  formData.append('query', req.body.query);
+
+  try {
+    const mlResponse = await axios.post(ML_JOBS_URL, formData, {
+      headers: { ...formData.getHeaders() },
+      timeout: 30000,
+      validateStatus: (status) => status < 500 || status === 503
+    });
+    console.log(`[Node.js] ML service answered job submission with ${mlResponse.status}.`);
+    relayJobResponse(res, mlResponse);
+  } catch (error) {
+    console.error('[Node.js] Error contacting ML service:', error.message);
+    res.status(500).json({ message: 'Could not connect to the ML processing service.' });
+  }
+};
+
+export const getDocumentJob = async (req, res) => {
+  const wait = Math.min(Math.max(Number(req.query.wait) || 0, 0), MAX_JOB_WAIT_SECONDS);
+
+  try {
+    const mlResponse = await axios.get(`${ML_JOBS_URL}/${encodeURIComponent(req.params.jobId)}`, {
+      params: { wait },
+      // Leave room for the long poll itself.
+      timeout: (wait + 15) * 1000,
+      validateStatus: (status) => status < 500
+    });
+    relayJobResponse(res, mlResponse);
+  } catch (error) {
+    console.error('[Node.js] Error contacting ML service:', error.message);
+    res.status(500).json({ message: 'Could not connect to the ML processing service.' });
+  }
+};
@@ -1,6 +1,6 @@
 import express from 'express';
 import multer from 'multer';
-import { processDocument } from '../Controllers/documentController.js';
+import { processDocument, processDocumentStream, submitDocumentJob, getDocumentJob } from '../Controllers/documentController.js';
 
 const router = express.Router();
 
@@ -8,6 +8,9 @@ const storage = multer.memoryStorage();
 const upload = multer({ storage: storage });
 
 router.post('/process', upload.single('file'), processDocument);
+router.post('/process/stream', upload.single('file'), processDocumentStream);
+router.post('/jobs', upload.single('file'), submitDocumentJob);
+router.get('/jobs/:jobId', getDocumentJob);
 
 // Use 'export default' instead of 'module.exports'
 export default router;
\ No newline at end of file
@@ -1,12 +1,15 @@
 # modal_app.py
 
+import os
 import modal
 
 app = modal.App("policypal-fastapi")
 
 image = (
     modal.Image.debian_slim()
-    .pip_install("fastapi", "uvicorn", "transformers", "torch", "PyPDF2")
+    .pip_install("fastapi", "uvicorn", "transformers", "torch", "pypdf", "prometheus-client")
+    # Modules shared with the other PolicyPal services
+    .add_local_dir(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"), remote_path="/root/shared")
 )
 
 @app.function(image=image, gpu="any", timeout=600)
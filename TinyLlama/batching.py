@@ -0,0 +1,71 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class GenerationBatcher:
+    """
+    Collects prompts submitted from many threads into batches for one model call.
+
+    A single worker thread takes the first waiting prompt, then keeps collecting
+    until it has `max_batch_size` prompts or `max_wait` seconds have passed, and
+    hands the whole batch to `generate_batch(prompts) -> list of answers`. Each
+    caller blocks only on its own result.
+    """
+
+    _STOP = object()
+
+    def __init__(self, generate_batch, max_batch_size=8, max_wait=0.01):
+        self.generate_batch = generate_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="generation-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, prompt):
+        """Queues `prompt` and returns a Future for its answer."""
+        future = Future()
+        self._queue.put((prompt, future))
+        return future
+
+    def generate(self, prompt):
+        return self.submit(prompt).result()
+
+    def close(self):
+        self._queue.put(self._STOP)
+        self._worker.join()
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is self._STOP:
+                # Finish this batch first, then stop.
+                self._queue.put(item)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+            batch = [(prompt, future) for prompt, future in self._collect(item) if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                answers = self.generate_batch([prompt for prompt, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), answer in zip(batch, answers):
+                future.set_result(answer)
@@ -0,0 +1,104 @@
+import copy
+import threading
+from collections import OrderedDict
+
+
+def cache_nbytes(past_key_values):
+    """Bytes held by a transformers KV cache (DynamicCache of any recent layout, or legacy tuples)."""
+    if hasattr(past_key_values, "layers"):
+        tensors = [t for layer in past_key_values.layers for t in (layer.keys, layer.values) if t is not None]
+    elif hasattr(past_key_values, "key_cache"):
+        tensors = list(past_key_values.key_cache) + list(past_key_values.value_cache)
+    else:
+        tensors = [t for layer in past_key_values for t in layer]
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+class PrefixKVCache:
+    """
+    LRU of attention key/values for prompt prefixes, bounded by total tensor bytes.
+
+    An entry is stored once under the keys of every segment boundary it covers
+    (e.g. after each context chunk), so a later prompt that shares only the
+    first chunks still reuses it: the copy handed out is cropped to the
+    matched length.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # entry id -> (past_key_values, nbytes, {boundary key: length})
+        self._keys = {}  # boundary key -> entry id
+        self._next_id = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, boundaries):
+        """
+        `boundaries` is a list of `(key, length)` pairs, shortest first. Returns a
+        private copy of the cache for the longest stored one and its length, or
+        `(None, 0)`.
+        """
+        with self._lock:
+            for key, length in reversed(boundaries):
+                entry_id = self._keys.get(key)
+                if entry_id is None:
+                    continue
+                self._entries.move_to_end(entry_id)
+                past_key_values = self._entries[entry_id][0]
+                self.hits += 1
+                break
+            else:
+                self.misses += 1
+                return None, 0
+        # Generation appends to the cache in place, so callers always get their own copy.
+        past_key_values = copy.deepcopy(past_key_values)
+        if past_key_values.get_seq_length() > length:
+            past_key_values.crop(length)
+        return past_key_values, length
+
+    def put(self, boundaries, past_key_values):
+        """Stores `past_key_values`, which covers the last (longest) of `boundaries`."""
+        nbytes = cache_nbytes(past_key_values)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            last_key = boundaries[-1][0]
+            if last_key in self._keys:
+                self._entries.move_to_end(self._keys[last_key])
+                return
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (past_key_values, nbytes, dict(boundaries))
+            self._bytes += nbytes
+            for key, _ in boundaries:
+                # Newer entries take over shared boundaries; they are the likeliest to be reused.
+                self._keys[key] = entry_id
+            while self._bytes > self.max_bytes:
+                self._evict_oldest_locked()
+
+    def _evict_oldest_locked(self):
+        entry_id, (_, nbytes, keys) = self._entries.popitem(last=False)
+        self._bytes -= nbytes
+        self.evictions += 1
+        for key in keys:
+            if self._keys.get(key) == entry_id:
+                del self._keys[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -1,22 +1,44 @@
-from fastapi import FastAPI, Query
-from pdf_utils import extract_text_from_pdf
-from vectorstore import VectorStore
-from model import TinyLlamaQA
+from fastapi import FastAPI, Query, Response
+from pdf_utils import iter_pdf_pages
+from vectorstore import VectorStore, file_fingerprint
+from model import TinyLlamaQA, METRICS_SERVICE
+from shared import metrics
+from shared.chunking import chunk_texts, tokenizer_counter
 
 app = FastAPI()
 
 pdf_path = "data/policy.pdf"
-text = extract_text_from_pdf(pdf_path)
-chunks = [text[i:i+512] for i in range(0, len(text), 512)]  # simple chunking
+# Measured in the embedding model's own tokens; all-MiniLM-L6-v2 truncates inputs at 256.
+CHUNK_MAX_TOKENS = 200
+CHUNK_OVERLAP_TOKENS = 20
 
+def load_chunks():
+    # Clause-aligned chunks, produced while the pages are still being extracted.
+    return chunk_texts(iter_pdf_pages(pdf_path), CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS, tokenizer_counter(store.model.tokenizer))
+
+# The index is saved per (document, model, index layout, chunking) fingerprint, so restarts and
+# extra workers reuse it instead of re-encoding the whole policy.
 store = VectorStore()
-store.build_index(chunks)
+with metrics.stage_timer(METRICS_SERVICE, "index"):
+    store.load_or_build(file_fingerprint(pdf_path, store.model_name, store.index_type, store.metric, f"tokens-{CHUNK_MAX_TOKENS}-{CHUNK_OVERLAP_TOKENS}"), load_chunks)
+metrics.record_document(METRICS_SERVICE, len(store.texts))
 
 llm = TinyLlamaQA()
 
 @app.get("/ask")
 def ask_question(q: str = Query(..., alias="query")):
-    relevant_chunks = store.search(q)
-    context = "\n".join(relevant_chunks)
-    answer = llm.generate_answer(context, q)
+    with metrics.stage_timer(METRICS_SERVICE, "retrieval"):
+        relevant_chunks = store.search(q)
+    metrics.record_embeddings(METRICS_SERVICE, "query", 1)
+    # Passed as chunks so the model's prefix cache can reuse already-seen context.
+    # Includes the time spent waiting for a batch slot.
+    with metrics.stage_timer(METRICS_SERVICE, "generation"):
+        answer = llm.generate_answer(relevant_chunks, q)
     return {"query": q, "reply": answer}
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+app.add_middleware(metrics.MetricsMiddleware, service=METRICS_SERVICE, paths={"/ask"})
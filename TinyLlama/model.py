@@ -1,13 +1,130 @@
-from transformers import AutoTokenizer, AutoModelForCausalLM
+import os
+import sys
+import copy
+import bisect
+import hashlib
+
+from transformers import AutoTokenizer, AutoModelForCausalLM, DynamicCache
 import torch
 
+from batching import GenerationBatcher
+from kv_cache import PrefixKVCache
+
+# Modules shared with the other PolicyPal services live in the repo-level `shared/` package.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared import metrics
+
+METRICS_SERVICE = "tinyllama"
+
+MODEL_NAME = "TinyLlama/TinyLlama-1.1B-Chat-v1.0"
+MAX_NEW_TOKENS = int(os.environ.get("GENERATION_MAX_NEW_TOKENS", "200"))
+# Concurrent /ask requests arriving within GENERATION_MAX_WAIT_MS of each other
+# share one padded generate() call, up to GENERATION_MAX_BATCH_SIZE prompts.
+MAX_BATCH_SIZE = int(os.environ.get("GENERATION_MAX_BATCH_SIZE", "8"))
+MAX_WAIT_MS = float(os.environ.get("GENERATION_MAX_WAIT_MS", "10"))
+# Memory for reusable attention state of prompt prefixes (the retrieved context); 0 disables it.
+PREFIX_CACHE_MB = int(os.environ.get("GENERATION_PREFIX_CACHE_MB", "512"))
+# "int8" swaps the Linear layers for dynamically quantized ones (CPU only).
+QUANTIZE = os.environ.get("GENERATION_QUANTIZE", "none")
+
+
 class TinyLlamaQA:
-    def __init__(self):
-        self.tokenizer = AutoTokenizer.from_pretrained("TinyLlama/TinyLlama-1.1B-Chat-v1.0")
-        self.model = AutoModelForCausalLM.from_pretrained("TinyLlama/TinyLlama-1.1B-Chat-v1.0")
+    def __init__(self, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, prefix_cache_mb=PREFIX_CACHE_MB, quantize=QUANTIZE):
+        # Decoder-only models continue from the last position, so pad on the left.
+        self.tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME, padding_side="left")
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.model = AutoModelForCausalLM.from_pretrained(MODEL_NAME)
+        if quantize == "int8":
+            self.model = torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model.eval()
+        self.prefix_cache = PrefixKVCache(prefix_cache_mb * 1024 * 1024) if prefix_cache_mb > 0 else None
+        self.batcher = GenerationBatcher(self._generate_requests, max_batch_size=max_batch_size, max_wait=max_wait_ms / 1000)
+        if self.prefix_cache is not None:
+            metrics.register_cache(METRICS_SERVICE, "prefix_kv", self.prefix_cache.stats)
+
+    @staticmethod
+    def build_prompt(context, query):
+        return f"Context:\n{context}\n\nQuestion:\n{query}\n\nAnswer:"
 
     def generate_answer(self, context, query):
-        prompt = f"Context:\n{context}\n\nQuestion:\n{query}\n\nAnswer:"
-        inputs = self.tokenizer(prompt, return_tensors="pt")
-        outputs = self.model.generate(**inputs, max_new_tokens=200)
+        """
+        Answers one question; safe to call from many threads at once. `context` is
+        the retrieved text, either joined or as a list of chunks. Passing chunks
+        lets the prefix cache reuse the attention state of leading chunks that
+        other questions also retrieved.
+        """
+        return self.batcher.generate((context, query))
+
+    def _generate_requests(self, requests):
+        if len(requests) == 1 and self.prefix_cache is not None:
+            return [self.generate_cached(*requests[0])]
+        prompts = [self.build_prompt(context if isinstance(context, str) else "\n".join(context), query) for context, query in requests]
+        return self.generate_batch(prompts)
+
+    def generate_batch(self, prompts, **generate_kwargs):
+        inputs = self.tokenizer(prompts, return_tensors="pt", padding=True)
+        with torch.inference_mode():
+            outputs = self.model.generate(**inputs, max_new_tokens=MAX_NEW_TOKENS, pad_token_id=self.tokenizer.pad_token_id, **generate_kwargs)
+        completion_ids = outputs[:, inputs["input_ids"].shape[1]:]
+        for prompt_tokens, completion_tokens in zip(
+            inputs["attention_mask"].sum(dim=1).tolist(), (completion_ids != self.tokenizer.pad_token_id).sum(dim=1).tolist()
+        ):
+            metrics.record_llm_call(METRICS_SERVICE, "generation", prompt_tokens, completion_tokens)
+        return self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+    def generate_cached(self, context, query, **generate_kwargs):
+        """
+        Generates for a single prompt, prefilling only the part of the context
+        that is not already in the prefix cache.
+        """
+        if self.prefix_cache is None:
+            return self._generate_requests([(context, query)])[0]
+        chunks = [context] if isinstance(context, str) else list(context)
+        # The whole prompt is tokenized at once, exactly as generate_batch() does, so a
+        # request gets the same input whichever path serves it. Cache keys are the
+        # token ids up to the end of each chunk, found through the character offsets.
+        prompt = self.build_prompt("\n".join(chunks), query)
+        encoding = self.tokenizer(prompt, return_offsets_mapping=True)
+        input_ids = encoding["input_ids"]
+        token_ends = [end for _, end in encoding["offset_mapping"]]
+        # Where each chunk, and then the question header, ends in `prompt`.
+        segment_ends = []
+        position = len("Context:\n") - len("\n")
+        for chunk in chunks:
+            position += len("\n") + len(chunk)
+            segment_ends.append(position)
+        segment_ends.append(position + len("\n\nQuestion:\n"))
+        prefix_length = 0
+        boundaries = []
+        digest = hashlib.sha1()
+        for segment_end in segment_ends:
+            # A token straddling the end of a segment belongs to the next one.
+            length = bisect.bisect_right(token_ends, segment_end)
+            if length <= prefix_length:
+                continue
+            digest.update("".join(f"{token}," for token in input_ids[prefix_length:length]).encode("ascii"))
+            prefix_length = length
+            boundaries.append((digest.copy().digest(), prefix_length))
+        input_ids = torch.tensor([input_ids])
+
+        with torch.inference_mode():
+            past_key_values, cached_length = self.prefix_cache.lookup(boundaries)
+            if cached_length < prefix_length:
+                past_key_values = past_key_values if past_key_values is not None else DynamicCache()
+                self.model(input_ids=input_ids[:, cached_length:prefix_length], past_key_values=past_key_values, use_cache=True)
+                # generate() keeps appending to this cache, so the stored entry is a copy.
+                self.prefix_cache.put(boundaries, copy.deepcopy(past_key_values))
+            outputs = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                past_key_values=past_key_values,
+                max_new_tokens=MAX_NEW_TOKENS,
+                pad_token_id=self.tokenizer.pad_token_id,
+                **generate_kwargs,
+            )
+        metrics.record_llm_call(METRICS_SERVICE, "generation", input_ids.shape[1], outputs.shape[1] - input_ids.shape[1])
         return self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+
+    def close(self):
+        self.batcher.close()
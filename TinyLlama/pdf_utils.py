@@ -1,9 +1,13 @@
-import PyPDF2
+import os
+import sys
+
+# Modules shared with the other PolicyPal services live in the repo-level `shared/` package.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.pdf_ingest import extract_text, iter_pages, read_pdf_bytes
 
 def extract_text_from_pdf(pdf_path):
-    with open(pdf_path, 'rb') as file:
-        reader = PyPDF2.PdfReader(file)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text()
-        return text
+    return extract_text(read_pdf_bytes(pdf_path))
+
+def iter_pdf_pages(pdf_path):
+    """Yields (page_number, text) for each page of the PDF, lazily and in order."""
+    return iter_pages(read_pdf_bytes(pdf_path))
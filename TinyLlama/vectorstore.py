@@ -1,20 +1,388 @@
-from sentence_transformers import SentenceTransformer
+import os
+import json
+import math
+import shutil
+import bisect
+import hashlib
+import tempfile
+from collections.abc import Sequence
+
 import faiss
 import numpy as np
 
+MODEL_NAME = "all-MiniLM-L6-v2"
+INDEX_DIR = os.environ.get("VECTORSTORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "index"))
+# How many saved index versions to keep around for incremental rebuilds.
+KEEP_VERSIONS = int(os.environ.get("VECTORSTORE_KEEP_VERSIONS", "2"))
+
+# Index structure: "flat" (exact), "ivf", "hnsw" or "pq" (IVF + product quantization).
+INDEX_TYPE = os.environ.get("VECTORSTORE_INDEX_TYPE", "flat")
+# "l2" distance, or "ip" for inner product over normalized embeddings (cosine similarity).
+METRIC = os.environ.get("VECTORSTORE_METRIC", "l2")
+IVF_NPROBE = int(os.environ.get("VECTORSTORE_NPROBE", "16"))
+HNSW_M = int(os.environ.get("VECTORSTORE_HNSW_M", "32"))
+HNSW_EF_SEARCH = int(os.environ.get("VECTORSTORE_HNSW_EF_SEARCH", "64"))
+INDEX_TYPES = ("flat", "ivf", "hnsw", "pq")
+DEFAULT_DOCUMENT = "default"
+
+META_FILE = "meta.json"
+INDEX_FILE = "index.faiss"
+EMBEDDINGS_FILE = "embeddings.npy"
+HASHES_FILE = "hashes.npy"
+TEXTS_FILE = "texts.bin"
+OFFSETS_FILE = "offsets.npy"
+DOCUMENTS_FILE = "documents.json"
+
+
+def file_fingerprint(path, *parts):
+    """SHA-256 of a file's bytes plus any extra parts (model name, chunking settings...)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    for part in parts:
+        digest.update(b"\x00" + str(part).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _chunk_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+def _pq_subquantizers(dim):
+    """Largest divisor of `dim` giving sub-vectors of at least 4 dimensions, capped at 64."""
+    for m in range(min(64, dim // 4), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def make_index(dim, num_vectors, index_type=INDEX_TYPE, metric=METRIC):
+    """
+    Returns an empty faiss index of the requested type, sized for `num_vectors`.
+    IVF and PQ need enough vectors to train their centroids; below that they fall
+    back to HNSW, which needs no training and still keeps search sub-linear.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}.")
+    faiss_metric = faiss.METRIC_INNER_PRODUCT if metric == "ip" else faiss.METRIC_L2
+
+    if index_type in ("ivf", "pq"):
+        # faiss wants ~39 training points per centroid, and PQ 256 per sub-quantizer code.
+        nlist = min(int(4 * math.sqrt(max(num_vectors, 1))), num_vectors // 39)
+        if nlist < 8 or (index_type == "pq" and num_vectors < 39 * 256):
+            index_type = "hnsw"
+        elif index_type == "ivf":
+            return faiss.index_factory(dim, f"IVF{nlist},Flat", faiss_metric)
+        else:
+            return faiss.index_factory(dim, f"IVF{nlist},PQ{_pq_subquantizers(dim)}", faiss_metric)
+
+    if index_type == "hnsw":
+        return faiss.index_factory(dim, f"HNSW{HNSW_M}", faiss_metric)
+    return faiss.index_factory(dim, "Flat", faiss_metric)
+
+
+def search_parameters(index, selector=None, nprobe=IVF_NPROBE, ef_search=HNSW_EF_SEARCH):
+    """Per-query search parameters (IVF probes, HNSW beam width, optional ID filter) for `index`."""
+    if faiss.try_extract_index_ivf(index) is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+    if hasattr(index, "hnsw"):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=ef_search)
+    return faiss.SearchParameters(sel=selector) if selector is not None else None
+
+
+def _read_index(path):
+    # Memory-map the vectors so every worker on the host shares one copy of the
+    # pages. Older faiss builds without IO_FLAG_MMAP_IFC fall back to a normal read.
+    flags = getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    try:
+        return faiss.read_index(path, flags)
+    except RuntimeError:
+        return faiss.read_index(path)
+
+
+class MappedTexts(Sequence):
+    """Chunk texts stored as one UTF-8 blob plus offsets, read through a memory map."""
+
+    def __init__(self, directory):
+        self._offsets = np.load(os.path.join(directory, OFFSETS_FILE), mmap_mode="r")
+        texts_path = os.path.join(directory, TEXTS_FILE)
+        # np.memmap cannot map an empty file.
+        self._data = np.memmap(texts_path, dtype=np.uint8, mode="r") if os.path.getsize(texts_path) else np.empty(0, np.uint8)
+
+    @staticmethod
+    def write(directory, texts):
+        encoded = [text.encode("utf-8") for text in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(blob) for blob in encoded])
+        with open(os.path.join(directory, TEXTS_FILE), "wb") as f:
+            for blob in encoded:
+                f.write(blob)
+        np.save(os.path.join(directory, OFFSETS_FILE), offsets)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._data[self._offsets[i]:self._offsets[i + 1]].tobytes().decode("utf-8")
+
+
 class VectorStore:
-    def __init__(self):
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
+    """
+    Chunk embeddings for one or more documents in a single faiss index.
+
+    Each document's chunks occupy a contiguous range of index ids, so searches
+    can be restricted to some documents (by id or by metadata) with a faiss ID
+    selector instead of scanning and discarding hits.
+    """
+
+    def __init__(self, model_name=MODEL_NAME, index_dir=INDEX_DIR, index_type=INDEX_TYPE, metric=METRIC, model=None):
+        self.model_name = model_name
+        self.index_dir = index_dir
+        self.index_type = index_type
+        self.metric = metric
+        # Any object with SentenceTransformer's encode/get_sentence_embedding_dimension will do.
+        self._model = model
         self.index = None
         self.texts = []
+        self.embeddings = None
+        self.documents = []
+        self.fingerprint = None
+        self._read_only = False
+
+    @property
+    def model(self):
+        # Loaded on first use, so a worker that finds a saved index starts without it.
+        if self._model is None:
+            # Imported here because sentence_transformers pulls in torch, which a cold start should not pay for.
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def _encode(self, texts):
+        return self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=self.metric == "ip").astype(np.float32)
+
+    def build_index(self, texts, known_embeddings=None):
+        """Builds the index over a single document."""
+        self.build_documents([(DEFAULT_DOCUMENT, texts, {})], known_embeddings=known_embeddings)
+
+    def build_documents(self, documents, known_embeddings=None):
+        """
+        Builds the index in memory from `(doc_id, texts, metadata)` triples.
+        `known_embeddings` maps chunk hashes to vectors from a previous build; only
+        chunks missing from it are encoded.
+        """
+        self.texts = []
+        self.documents = []
+        for doc_id, texts, metadata in documents:
+            start = len(self.texts)
+            self.texts.extend(texts)
+            self.documents.append({"doc_id": doc_id, "start": start, "stop": len(self.texts), "metadata": metadata or {}})
+
+        known_embeddings = known_embeddings or {}
+        missing = [i for i, text in enumerate(self.texts) if _chunk_hash(text) not in known_embeddings]
 
-    def build_index(self, texts):
-        self.texts = texts
-        embeddings = self.model.encode(texts, convert_to_numpy=True)
-        self.index = faiss.IndexFlatL2(embeddings.shape[1])
+        dim = self.model.get_sentence_embedding_dimension()
+        embeddings = np.empty((len(self.texts), dim), dtype=np.float32)
+        for i, text in enumerate(self.texts):
+            vector = known_embeddings.get(_chunk_hash(text))
+            if vector is not None:
+                embeddings[i] = vector
+        if missing:
+            embeddings[missing] = self._encode([self.texts[i] for i in missing])
+        print(f">> VectorStore: encoded {len(missing)} of {len(self.texts)} chunks.")
+
+        self.embeddings = embeddings
+        self.index = make_index(dim, len(embeddings), self.index_type, self.metric)
+        if not self.index.is_trained:
+            self.index.train(embeddings)
         self.index.add(embeddings)
+        self._read_only = False
+
+    def add_document(self, doc_id, texts, metadata=None):
+        """Appends one document's chunks to the existing index."""
+        if self.index is None:
+            self.build_documents([(doc_id, texts, metadata)])
+            return
+        if any(document["doc_id"] == doc_id for document in self.documents):
+            raise ValueError(f"Document '{doc_id}' is already in the store.")
+        self._make_writable()
+
+        new_embeddings = self._encode(list(texts)) if texts else np.empty((0, self.index.d), dtype=np.float32)
+        start = len(self.texts)
+        self.texts.extend(texts)
+        self.documents.append({"doc_id": doc_id, "start": start, "stop": len(self.texts), "metadata": metadata or {}})
+        self.embeddings = np.concatenate([self.embeddings, new_embeddings])
+        self.index.add(new_embeddings)
+        self.fingerprint = None
+
+    def save(self, fingerprint):
+        """Persists the index, vectors, chunk texts and document table under `index_dir/<fingerprint>`."""
+        target = os.path.join(self.index_dir, fingerprint)
+        if os.path.exists(os.path.join(target, META_FILE)):
+            return
+        os.makedirs(self.index_dir, exist_ok=True)
+
+        # Write everything into a scratch directory and rename it into place, so
+        # other workers never see a half-written index.
+        scratch = tempfile.mkdtemp(dir=self.index_dir, prefix=".build-")
+        try:
+            faiss.write_index(self.index, os.path.join(scratch, INDEX_FILE))
+            np.save(os.path.join(scratch, EMBEDDINGS_FILE), self.embeddings)
+            hashes = b"".join(_chunk_hash(text) for text in self.texts)
+            np.save(os.path.join(scratch, HASHES_FILE), np.frombuffer(hashes, dtype=np.uint8).reshape(-1, 20))
+            MappedTexts.write(scratch, self.texts)
+            with open(os.path.join(scratch, DOCUMENTS_FILE), "w") as f:
+                json.dump(self.documents, f)
+            with open(os.path.join(scratch, META_FILE), "w") as f:
+                json.dump(self._meta(fingerprint), f)
+            os.rename(scratch, target)
+        except OSError:
+            # Another worker finished saving the same fingerprint first.
+            if not os.path.exists(os.path.join(target, META_FILE)):
+                raise
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+        self._prune()
+
+    def load(self, fingerprint):
+        """Opens a saved index memory-mapped. Returns False if there is none."""
+        directory = os.path.join(self.index_dir, fingerprint)
+        try:
+            with open(os.path.join(directory, META_FILE)) as f:
+                meta = json.load(f)
+            with open(os.path.join(directory, DOCUMENTS_FILE)) as f:
+                documents = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if not self._is_compatible(meta):
+            return False
+
+        self.index = _read_index(os.path.join(directory, INDEX_FILE))
+        self.embeddings = np.load(os.path.join(directory, EMBEDDINGS_FILE), mmap_mode="r")
+        self.texts = MappedTexts(directory)
+        self.documents = documents
+        self.fingerprint = fingerprint
+        self._read_only = True
+        os.utime(os.path.join(directory, META_FILE))
+        return True
+
+    def load_or_build(self, fingerprint, load_texts):
+        """
+        Loads the saved index for `fingerprint`, or builds it from `load_texts()`.
+        A rebuild reuses the vectors of every chunk the newest saved version
+        already encoded, then saves and reopens the result memory-mapped.
+        """
+        if self.load(fingerprint):
+            print(f">> VectorStore: loaded saved index {fingerprint[:12]}.")
+            return self
+
+        self.build_index(load_texts(), known_embeddings=self._previous_embeddings())
+        self.save(fingerprint)
+        self.load(fingerprint)
+        return self
+
+    def search(self, query, top_k=3, doc_ids=None, where=None):
+        """
+        Returns the texts of the `top_k` closest chunks. Pass a list of queries to
+        search them in one batched call and get one result list per query.
+        `doc_ids` and `where` (exact-match metadata filter) restrict the search to
+        some documents.
+        """
+        results = self.search_with_scores([query] if isinstance(query, str) else query, top_k, doc_ids, where)
+        texts = [[hit["text"] for hit in hits] for hits in results]
+        return texts[0] if isinstance(query, str) else texts
+
+    def search_with_scores(self, queries, top_k=3, doc_ids=None, where=None):
+        """Like `search`, but each hit is a dict with text, score, doc_id and metadata."""
+        selector = self._selector(doc_ids, where)
+        if selector is False:
+            return [[] for _ in queries]
+
+        query_embeddings = self._encode(list(queries))
+        scores, indices = self.index.search(query_embeddings, top_k, params=search_parameters(self.index, selector))
+
+        starts = [document["start"] for document in self.documents]
+        results = []
+        for row_scores, row_indices in zip(scores, indices):
+            hits = []
+            for score, i in zip(row_scores, row_indices):
+                if i == -1:
+                    continue
+                document = self.documents[bisect.bisect_right(starts, i) - 1]
+                hits.append({"text": self.texts[i], "score": float(score), "doc_id": document["doc_id"], "metadata": document["metadata"]})
+            results.append(hits)
+        return results
+
+    def _selector(self, doc_ids, where):
+        """faiss ID selector for the matching documents; None for no filter, False if nothing matches."""
+        if doc_ids is None and not where:
+            return None
+        wanted = set(doc_ids) if doc_ids is not None else None
+        ranges = [
+            (document["start"], document["stop"])
+            for document in self.documents
+            if (wanted is None or document["doc_id"] in wanted)
+            and all(document["metadata"].get(key) == value for key, value in (where or {}).items())
+        ]
+        if not ranges:
+            return False
+        if len(ranges) == 1:
+            return faiss.IDSelectorRange(*ranges[0])
+        ids = np.concatenate([np.arange(start, stop, dtype=np.int64) for start, stop in ranges])
+        return faiss.IDSelectorBatch(ids)
+
+    def _make_writable(self):
+        """Copies a memory-mapped, read-only index into memory so it can be extended."""
+        if not self._read_only:
+            return
+        # clone_index would keep viewing the mapped pages; re-read an owned copy instead.
+        self.index = faiss.read_index(os.path.join(self.index_dir, self.fingerprint, INDEX_FILE))
+        self.embeddings = np.array(self.embeddings)
+        self.texts = list(self.texts)
+        self._read_only = False
+
+    def _meta(self, fingerprint):
+        return {
+            "fingerprint": fingerprint,
+            "model": self.model_name,
+            "index_type": self.index_type,
+            "metric": self.metric,
+            "count": len(self.texts),
+        }
+
+    def _is_compatible(self, meta):
+        return (meta.get("model"), meta.get("index_type"), meta.get("metric")) == (self.model_name, self.index_type, self.metric)
+
+    def _saved_versions(self):
+        """Saved index directories this store could reuse, most recently used first."""
+        versions = []
+        if not os.path.isdir(self.index_dir):
+            return versions
+        for name in os.listdir(self.index_dir):
+            meta_path = os.path.join(self.index_dir, name, META_FILE)
+            try:
+                with open(meta_path) as f:
+                    if self._is_compatible(json.load(f)):
+                        versions.append((os.path.getmtime(meta_path), os.path.join(self.index_dir, name)))
+            except (OSError, ValueError):
+                continue
+        return [directory for _, directory in sorted(versions, reverse=True)]
+
+    def _previous_embeddings(self):
+        versions = self._saved_versions()
+        if not versions:
+            return {}
+        hashes = np.load(os.path.join(versions[0], HASHES_FILE))
+        embeddings = np.load(os.path.join(versions[0], EMBEDDINGS_FILE), mmap_mode="r")
+        return {row.tobytes(): embeddings[i] for i, row in enumerate(hashes)}
 
-    def search(self, query, top_k=3):
-        query_embedding = self.model.encode([query], convert_to_numpy=True)
-        scores, indices = self.index.search(query_embedding, top_k)
-        return [self.texts[i] for i in indices[0]]
+    def _prune(self):
+        for directory in self._saved_versions()[KEEP_VERSIONS:]:
+            shutil.rmtree(directory, ignore_errors=True)
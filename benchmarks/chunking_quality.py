@@ -0,0 +1,157 @@
+"""
+Retrieval quality versus chunk count for the chunking strategies.
+
+Compares the old character-based splitters with the token-aware chunker in
+`shared/chunking.py`, at several chunk sizes, on one PDF. Probe questions are
+sampled from the document: each is a sentence of the policy with its first
+and last few words dropped. A probe counts as answered at k when one of the
+top-k retrieved chunks contains the whole original sentence, so a chunker
+that cuts clauses in half is penalized even when retrieval finds the right
+region.
+
+For every strategy it reports the number of chunks (= embeddings per
+document), mean tokens per chunk, the LLM context size at k, recall@k and MRR.
+The default embedder is a hashed TF-IDF that needs no model or network; pass
+--embedder minilm to use the TinyLlama service's sentence-transformers model.
+
+Usage:
+    python benchmarks/chunking_quality.py --pdf policy-helper-ml/hackathon-policy.pdf --max-tokens 128 256 384 512
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import zlib
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from shared.chunking import estimate_tokens, iter_chunks  # noqa: E402
+from shared.pdf_ingest import iter_pages  # noqa: E402
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def sample_probes(pages, count: int, seed: int):
+    """(question, sentence) pairs: sentences of 14+ words, trimmed by 3 words on each side."""
+    sentences = set()
+    for _, text in pages:
+        for sentence in re.split(r"(?<=[.;])\s+", normalize(text)):
+            if len(sentence.split()) >= 14:
+                sentences.add(sentence)
+    sentences = sorted(sentences)
+    random.Random(seed).shuffle(sentences)
+    return [(" ".join(sentence.split()[3:-3]), sentence) for sentence in sentences[:count]]
+
+
+class HashingEmbedder:
+    """TF-IDF over hashed word features; deterministic and dependency-free."""
+
+    def __init__(self, dim: int = 1 << 14):
+        self.dim = dim
+        self.idf = None
+
+    def _counts(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in _WORD.findall(text.lower()):
+                matrix[row, zlib.crc32(word.encode("utf-8")) % self.dim] += 1
+        return matrix
+
+    def fit(self, texts):
+        counts = self._counts(texts)
+        self.idf = np.log((1 + len(texts)) / (1 + (counts > 0).sum(axis=0))) + 1
+        return self
+
+    def encode(self, texts):
+        vectors = np.log1p(self._counts(texts)) * self.idf
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9)
+
+
+class MiniLMEmbedder:
+    def __init__(self):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer("all-MiniLM-L6-v2")
+
+    def fit(self, texts):
+        return self
+
+    def encode(self, texts):
+        return self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+
+
+def strategies(pages, max_tokens_list, overlap_ratio):
+    text = "\n".join(page_text for _, page_text in pages)
+    yield "chars-512", [text[i:i + 512] for i in range(0, len(text), 512)]
+    try:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+        splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=150)
+        yield "recursive-1500/150", [chunk for _, page_text in pages for chunk in splitter.split_text(page_text)]
+    except ImportError:
+        pass
+    for max_tokens in max_tokens_list:
+        overlap = int(max_tokens * overlap_ratio)
+        yield f"tokens-{max_tokens}/{overlap}", [chunk.text for chunk in iter_chunks(iter(pages), max_tokens, overlap)]
+
+
+def evaluate(chunks, probes, embedder, k: int) -> dict:
+    embedder.fit(chunks)
+    chunk_vectors = embedder.encode(chunks)
+    query_vectors = embedder.encode([question for question, _ in probes])
+    rankings = np.argsort(-(query_vectors @ chunk_vectors.T), axis=1)[:, :k]
+    normalized_chunks = [normalize(chunk) for chunk in chunks]
+
+    hits = 0
+    reciprocal_ranks = []
+    for (_, sentence), ranking in zip(probes, rankings):
+        rank = next((position for position, i in enumerate(ranking) if sentence in normalized_chunks[i]), None)
+        hits += rank is not None
+        reciprocal_ranks.append(0.0 if rank is None else 1.0 / (rank + 1))
+
+    mean_tokens = statistics.mean(estimate_tokens(chunk) for chunk in chunks)
+    return {
+        "chunks": len(chunks),
+        "mean_tokens_per_chunk": round(mean_tokens, 1),
+        f"context_tokens_at_{k}": round(mean_tokens * k),
+        f"recall_at_{k}": round(hits / len(probes), 4),
+        "mrr": round(statistics.mean(reciprocal_ranks), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", default="policy-helper-ml/hackathon-policy.pdf")
+    parser.add_argument("--max-tokens", type=int, nargs="+", default=[128, 256, 384, 512])
+    parser.add_argument("--overlap-ratio", type=float, default=0.1)
+    parser.add_argument("--probes", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--embedder", choices=["hashing", "minilm"], default="hashing")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with open(args.pdf, "rb") as f:
+        pages = [(number, text) for number, text in iter_pages(f.read()) if text.strip()]
+    probes = sample_probes(pages, args.probes, args.seed)
+    embedder = HashingEmbedder() if args.embedder == "hashing" else MiniLMEmbedder()
+
+    results = {}
+    for name, chunks in strategies(pages, args.max_tokens, args.overlap_ratio):
+        results[name] = evaluate(chunks, probes, embedder, args.k)
+        print(f"{name}: {json.dumps(results[name])}")
+
+    print(json.dumps({"pdf": args.pdf, "probes": len(probes), "embedder": args.embedder, "strategies": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
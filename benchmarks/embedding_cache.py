@@ -0,0 +1,90 @@
+"""
+Embedding work saved by the chunk embedding cache when a policy is amended.
+
+Indexes a synthetic policy (see synthetic_pdf.py), then a new version of it in
+which a given fraction of the clauses was reworded, through RAGProcessor with
+the chunk embedding cache enabled. For each amendment fraction it reports how
+many chunks of the new version were sent to the embedding model, and how long
+its "embedding" stage took compared with indexing from scratch.
+
+Runs offline with the FakeEmbeddings stand-in (fakes.py), whose latency grows
+with the number of texts per call like a hosted embedding API.
+
+Usage:
+    python benchmarks/embedding_cache.py --pages 50 --amend 0.01 0.05 0.2 0.5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, "..", "doc_qa_backend"))
+
+# The cache file must be private to this run, so it is set before logic.py reads it.
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="embedding-cache-"), "embeddings.sqlite3")
+os.environ["EMBEDDING_CACHE_ENABLED"] = "true"
+
+from fakes import FakeChatModel, FakeEmbeddings  # noqa: E402
+from synthetic_pdf import make_policy_pdf  # noqa: E402
+from app.core.logic import RAGProcessor  # noqa: E402
+from app.core.timing import StageTimings  # noqa: E402
+
+
+async def index(processor: RAGProcessor, pdf_bytes: bytes) -> dict:
+    embeddings = processor.embedding_client
+    before = embeddings.texts_embedded
+    lookups_before = processor.document_embeddings.stats()
+    timings = StageTimings()
+    await processor.aget_vector_store(pdf_bytes, timings)
+    lookups = processor.document_embeddings.stats()
+    return {
+        "chunks": lookups["hits"] + lookups["misses"] - lookups_before["hits"] - lookups_before["misses"],
+        "texts_embedded": embeddings.texts_embedded - before,
+        "embedding_seconds": round(timings.stages.get("embedding", 0.0), 4),
+    }
+
+
+async def run(args) -> dict:
+    processor = RAGProcessor(
+        llm=FakeChatModel(),
+        embedding_model=FakeEmbeddings(latency=args.embed_latency, per_text_latency=args.embed_text_latency),
+        index_cache_dir=tempfile.mkdtemp(prefix="embedding-cache-index-"),
+    )
+    original = make_policy_pdf(args.pages, args.seed)
+    results = {}
+    for amend in args.amend:
+        processor.document_embeddings.store.clear()
+        processor.index_cache.clear()
+        cold = await index(processor, original)
+        amended = await index(processor, make_policy_pdf(args.pages, args.seed, amend=amend))
+        results[str(amend)] = {
+            "original": cold,
+            "amended": amended,
+            # An unamended copy is answered by the document index cache and embeds nothing.
+            "embedded_fraction": round(amended["texts_embedded"] / amended["chunks"], 4) if amended["chunks"] else 0.0,
+            "embedding_speedup": round(cold["embedding_seconds"] / amended["embedding_seconds"], 2) if amended["embedding_seconds"] else None,
+        }
+        print(json.dumps({"amend": amend, **results[str(amend)]}))
+    processor.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--amend", type=float, nargs="+", default=[0.01, 0.05, 0.2, 0.5], help="fractions of clauses reworded")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="seconds per embedding call")
+    parser.add_argument("--embed-text-latency", type=float, default=0.002, help="extra seconds per embedded text")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(json.dumps({"pages": args.pages, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Deterministic local stand-ins for the hosted models, with configurable latency.
+
+They implement just enough of each real client's interface for the services
+to run end to end without network access or API keys:
+
+    FakeChatModel            ChatGroq (invoke / ainvoke / astream)
+    FakeEmbeddings           CohereEmbeddings (a LangChain `Embeddings`)
+    FakeGemini               google.generativeai.GenerativeModel
+    FakeSentenceTransformer  sentence_transformers.SentenceTransformer
+    FakeGenerator            TinyLlamaQA.generate_batch
+
+Latencies are simulated with sleeps (asyncio.sleep on async paths), so the
+numbers measure the services' own overhead and scheduling, not model speed.
+Embeddings are hashed bags of words, so retrieval still prefers chunks that
+share words with the query.
+"""
+
+import asyncio
+import json
+import re
+import time
+import zlib
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+_WORD = re.compile(r"[a-z0-9]+")
+_SENTENCE = re.compile(r"[^.\n]*\b(?:covered|excluded|months|Sum Insured|indemnify)\b[^.\n]*\.")
+
+
+def hashed_embedding(text: str, dim: int) -> np.ndarray:
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in _WORD.findall(text.lower()):
+        vector[zlib.crc32(word.encode("utf-8")) % dim] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class _Message:
+    def __init__(self, content: str):
+        self.content = content
+
+
+class FakeChatModel:
+    """Answers each RAGProcessor prompt type with a well-formed canned response."""
+
+    def __init__(self, latency: float = 0.2, per_token_latency: float = 0.0, model_name: str = "fake-chat"):
+        self.latency = latency
+        self.per_token_latency = per_token_latency
+        self.model_name = model_name
+        self.calls = 0
+
+    def respond(self, prompt: str) -> str:
+        if "ENHANCED SEARCH QUERY" in prompt:
+            query = re.search(r'USER\'S ORIGINAL QUERY: "(.*)"', prompt)
+            return f"{query.group(1) if query else ''} coverage waiting period exclusions sum insured"
+        if '"quotes"' in prompt:
+            quotes = [" ".join(match.split()) for match in _SENTENCE.findall(prompt)[:3]]
+            return json.dumps({"quotes": quotes or ["The Insurer will indemnify the Insured up to the Sum Insured."]})
+        # The narrative prompt embeds the decision JSON, so it is recognised before the decision check.
+        if "DECISION DATA:" in prompt:
+            return "Good news: your policy covers this treatment, subject to pre-authorization."
+        if '"narrative_response"' in prompt:
+            return json.dumps({
+                "decision": "Approved",
+                "amount_covered": "Not Specified",
+                "narrative_response": "Good news: your policy covers this treatment, subject to pre-authorization.",
+            })
+        if '"decision"' in prompt:
+            return json.dumps({"decision": "Approved", "amount_covered": "Not Specified"})
+        return "Good news: your policy covers this treatment, subject to pre-authorization."
+
+    def _delay(self, response: str) -> float:
+        return self.latency + self.per_token_latency * len(response.split())
+
+    def invoke(self, prompt: str) -> _Message:
+        self.calls += 1
+        response = self.respond(prompt)
+        time.sleep(self._delay(response))
+        return _Message(response)
+
+    async def ainvoke(self, prompt: str) -> _Message:
+        self.calls += 1
+        response = self.respond(prompt)
+        await asyncio.sleep(self._delay(response))
+        return _Message(response)
+
+    async def astream(self, prompt: str):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        for word in self.respond(prompt).split(" "):
+            await asyncio.sleep(self.per_token_latency)
+            yield _Message(word + " ")
+
+
+class FakeEmbeddings(Embeddings):
+    def __init__(self, dim: int = 384, latency: float = 0.05, per_text_latency: float = 0.0005):
+        self.dim = dim
+        self.latency = latency
+        self.per_text_latency = per_text_latency
+        self.texts_embedded = 0
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        self.texts_embedded += len(texts)
+        return [hashed_embedding(text, self.dim).tolist() for text in texts]
+
+    def _delay(self, count: int) -> float:
+        return self.latency + self.per_text_latency * count
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self._delay(len(texts)))
+        return self._embed(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self._delay(len(texts)))
+        return self._embed(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+class _GeminiResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGemini:
+    def __init__(self, latency: float = 0.5, per_1k_prompt_tokens_latency: float = 0.0):
+        self.latency = latency
+        self.per_1k_prompt_tokens_latency = per_1k_prompt_tokens_latency
+        self.prompt_chars = 0
+
+    def generate_content(self, prompt: str) -> _GeminiResponse:
+        self.prompt_chars += len(prompt)
+        # Longer prompts take longer to read, roughly 4 characters per token.
+        time.sleep(self.latency + self.per_1k_prompt_tokens_latency * len(prompt) / 4000)
+        request = prompt.split("**User's Request:**", 1)[-1].lower()
+        status = "LIKELY DENIED" if "cosmetic" in request else "LIKELY APPROVED (NEEDS PRE-AUTHORIZATION)"
+        return _GeminiResponse("```json\n" + json.dumps({"status": status, "reason": "Synthetic decision."}) + "\n```")
+
+
+class FakeSentenceTransformer:
+    def __init__(self, dim: int = 384, per_text_latency: float = 0.0005):
+        self.dim = dim
+        self.per_text_latency = per_text_latency
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=False, **kwargs):
+        time.sleep(self.per_text_latency * len(texts))
+        # Hashed embeddings are unit length already, whatever normalize_embeddings says.
+        return np.stack([hashed_embedding(text, self.dim) for text in texts]) if texts else np.empty((0, self.dim), np.float32)
+
+
+class FakeGenerator:
+    """Batch generation whose cost grows sub-linearly with batch size, like a CPU forward pass."""
+
+    def __init__(self, latency: float = 0.3, per_item_latency: float = 0.03):
+        self.latency = latency
+        self.per_item_latency = per_item_latency
+        self.batch_sizes: List[int] = []
+
+    def generate_batch(self, prompts: List[str]) -> List[str]:
+        self.batch_sizes.append(len(prompts))
+        time.sleep(self.latency + self.per_item_latency * len(prompts))
+        return [f"{prompt}\nThe policy covers this, subject to its waiting periods." for prompt in prompts]
@@ -0,0 +1,130 @@
+"""
+Success rate and tail latency of LLM calls through shared/llm_client.py while
+the provider returns 429s and answers some requests slowly.
+
+Starts the stub provider (llm_stub_server.py) in-process. Then it sends
+--requests chat completions through a real ChatGroq client pointed at the
+stub, at most --concurrency at a time, under each pool configuration:
+
+    bare        no retries, no hedging (a 429 fails the request, as before)
+    retries     jittered exponential backoff, honouring Retry-After
+    hedged      retries, plus a duplicate request after the p90 latency
+    limited     retries and hedging, plus a client-side limit of --client-rpm
+                requests per minute (set it below --stub-rpm)
+
+For each configuration it reports the success rate, latency percentiles,
+the pool's retry/hedge counts and how many 429s the stub sent.
+
+Usage:
+    python benchmarks/llm_client_pool.py --requests 200 --rate-limit-rate 0.1 --slow-rate 0.05
+    python benchmarks/llm_client_pool.py --stub-rpm 300 --client-rpm 280 --rate-limit-rate 0
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, ".."))
+
+from langchain_groq import ChatGroq  # noqa: E402
+from llm_stub_server import StubSettings, start  # noqa: E402
+from shared.llm_client import ClientPool  # noqa: E402
+
+CONFIGS = {
+    "bare": {"max_retries": 0},
+    "retries": {"max_retries": 4},
+    "hedged": {"max_retries": 4, "hedge_percentile": 90},
+    "limited": {"max_retries": 4, "hedge_percentile": 90, "limit": True},
+}
+
+
+def percentile(samples: list, p: float) -> float:
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 4)
+
+
+async def run_config(name: str, args, base_url: str, settings: StubSettings) -> dict:
+    config = dict(CONFIGS[name])
+    client = ChatGroq(model_name="stub", groq_api_key="stub", groq_api_base=base_url, max_retries=0, temperature=0)
+    pool = ClientPool(
+        "groq",
+        [("stub", lambda: client)],
+        requests_per_minute=args.client_rpm if config.pop("limit", False) else 0,
+        backoff_base_seconds=args.backoff_base,
+        **config,
+    )
+    before = dict(settings.counts)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, failures = [], 0
+
+    async def one(i: int) -> None:
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await pool.acall(lambda llm: llm.ainvoke(f'Respond with "decision" for claim {i}'), 100)
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - started
+    pool.close()
+
+    stub_429s = settings.counts["rate_limited"] - before.get("rate_limited", 0)
+    return {
+        "success_rate": round(len(latencies) / args.requests, 4),
+        "p50_seconds": percentile(latencies, 50) if latencies else None,
+        "p95_seconds": percentile(latencies, 95) if latencies else None,
+        "p99_seconds": percentile(latencies, 99) if latencies else None,
+        "mean_seconds": round(statistics.mean(latencies), 4) if latencies else None,
+        "wall_seconds": round(elapsed, 2),
+        "stub_429s": stub_429s,
+        "pool": pool.stats(),
+    }
+
+
+async def run(args) -> dict:
+    settings = StubSettings(
+        latency=args.latency, slow_rate=args.slow_rate, slow_seconds=args.slow_seconds,
+        rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after, rpm=args.stub_rpm,
+    )
+    server = start(settings)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    results = {}
+    for name in args.configs:
+        # Each configuration starts with the stub's rate limit untouched.
+        settings.reset_limit()
+        results[name] = await run_config(name, args, base_url, settings)
+        print(f"{name}: {json.dumps({key: value for key, value in results[name].items() if key != 'pool'})}")
+    server.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--configs", nargs="+", choices=list(CONFIGS), default=list(CONFIGS))
+    parser.add_argument("--latency", type=float, default=0.1, help="stub seconds per normal request")
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="fraction of stub requests that are slow")
+    parser.add_argument("--slow-seconds", type=float, default=2.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.1, help="fraction of stub requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.2, help="Retry-After seconds the stub sends with a 429")
+    parser.add_argument("--stub-rpm", type=int, default=0, help="requests per minute the stub serves before answering 429")
+    parser.add_argument("--client-rpm", type=float, default=0, help="requests per minute the 'limited' pool allows itself")
+    parser.add_argument("--backoff-base", type=float, default=0.1, help="pool backoff base seconds")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(json.dumps({"requests": args.requests, "concurrency": args.concurrency, "configs": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Local stand-in for the Groq and Cohere HTTP APIs that misbehaves on purpose.
+
+Serves the endpoints the real SDKs call, so the services and
+shared/llm_client.py can be exercised end to end without keys or network:
+
+    POST /openai/v1/chat/completions   Groq (OpenAI format, streaming included)
+    POST /v1/embed                     Cohere embeddings (hashed bags of words, see fakes.py)
+
+Every request takes --latency seconds. A --slow-rate fraction of requests
+takes --slow-seconds instead, and a --rate-limit-rate fraction is answered
+with 429 and a Retry-After header. With --rpm, the stub also enforces a real
+per-minute request limit (a bucket refilling at --rpm a minute), as a provider would. Point the services at it with
+GROQ_API_BASE=http://127.0.0.1:8765 and COHERE_API_BASE=http://127.0.0.1:8765
+(any API key works).
+
+Usage:
+    python benchmarks/llm_stub_server.py --port 8765 --rate-limit-rate 0.2 --slow-rate 0.05 --slow-seconds 3
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fakes import FakeChatModel, hashed_embedding
+
+
+class StubSettings:
+    def __init__(self, latency=0.2, slow_rate=0.0, slow_seconds=3.0, rate_limit_rate=0.0, retry_after=1.0, rpm=0, dim=384, seed=0):
+        self.latency = latency
+        self.slow_rate = slow_rate
+        self.slow_seconds = slow_seconds
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.rpm = rpm
+        self.dim = dim
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        # Like most providers, the per-minute limit is a bucket that refills continuously.
+        self.allowance = float(rpm)
+        self.updated = time.monotonic()
+        self.counts = Counter()
+
+    def admit(self) -> bool:
+        """Whether to serve this request rather than answer 429."""
+        with self.lock:
+            self.counts["requests"] += 1
+            now = time.monotonic()
+            self.allowance = min(self.rpm, self.allowance + (now - self.updated) * self.rpm / 60)
+            self.updated = now
+            limited = (self.rpm and self.allowance < 1) or self.random.random() < self.rate_limit_rate
+            if limited:
+                self.counts["rate_limited"] += 1
+                return False
+            self.allowance -= 1
+            return True
+
+    def reset_limit(self) -> None:
+        with self.lock:
+            self.allowance = float(self.rpm)
+            self.updated = time.monotonic()
+
+    def delay(self) -> float:
+        with self.lock:
+            slow = self.random.random() < self.slow_rate
+            self.counts["slow" if slow else "normal"] += 1
+        return self.slow_seconds if slow else self.latency
+
+
+def make_handler(settings: StubSettings):
+    chat = FakeChatModel(latency=0)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _json(self, status: int, body: dict, headers: dict = None) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            try:
+                self._serve()
+            except (BrokenPipeError, ConnectionResetError):
+                # The client gave up on the request, e.g. the losing half of a hedged pair.
+                self.close_connection = True
+
+        def _serve(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not settings.admit():
+                self._json(429, {"error": {"message": "Rate limit reached (stub).", "type": "rate_limit_exceeded"}},
+                           {"Retry-After": str(settings.retry_after)})
+                return
+            time.sleep(settings.delay())
+            if self.path.endswith("/chat/completions"):
+                self._chat(body)
+            elif self.path.endswith("/embed"):
+                texts = body.get("texts", [])
+                self._json(200, {
+                    "id": "stub",
+                    "response_type": "embeddings_by_type",
+                    "texts": texts,
+                    "embeddings": {"float": [hashed_embedding(text, settings.dim).tolist() for text in texts]},
+                    "meta": {"billed_units": {"input_tokens": sum(len(text.split()) for text in texts)}},
+                })
+            else:
+                self._json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+        def _chat(self, body: dict) -> None:
+            prompt = "\n".join(message.get("content", "") for message in body.get("messages", []))
+            content = chat.respond(prompt)
+            usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4, "total_tokens": (len(prompt) + len(content)) // 4}
+            base = {"id": "stub", "object": "chat.completion", "created": int(time.time()), "model": body.get("model", "stub")}
+            if not body.get("stream"):
+                self._json(200, {
+                    **base,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": usage,
+                })
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            chunk = {**base, "object": "chat.completion.chunk"}
+            for word in content.split(" "):
+                delta = {"index": 0, "delta": {"role": "assistant", "content": word + " "}, "finish_reason": None}
+                self.wfile.write(f"data: {json.dumps({**chunk, 'choices': [delta]})}\n\n".encode("utf-8"))
+            last = {**chunk, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "x_groq": {"usage": usage}}
+            self.wfile.write(f"data: {json.dumps(last)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+            self.wfile.flush()
+            self.close_connection = True
+
+    return Handler
+
+
+def start(settings: StubSettings, port: int = 0) -> ThreadingHTTPServer:
+    """Serves the stub on a background thread; `server.server_address` has the port it got."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(settings))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per normal request")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of requests that are slow")
+    parser.add_argument("--slow-seconds", type=float, default=3.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with a 429")
+    parser.add_argument("--rpm", type=int, default=0, help="requests per minute served before answering 429 (0: no limit)")
+    args = parser.parse_args()
+
+    settings = StubSettings(args.latency, args.slow_rate, args.slow_seconds, args.rate_limit_rate, args.retry_after, args.rpm)
+    server = start(settings, args.port)
+    print(f">> LLM stub listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(60)
+            print(f">> {dict(settings.counts)}")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
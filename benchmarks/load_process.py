@@ -0,0 +1,89 @@
+"""
+Load benchmark for the doc_qa_backend `/api/process` endpoint.
+
+Fires the same (PDF, query) request at increasing concurrency levels against a
+running server and reports throughput and latency per level. With the async
+pipeline, throughput should keep rising with concurrency instead of staying
+flat at one request's worth.
+
+Usage:
+    python benchmarks/load_process.py --pdf policy-helper-ml/hackathon-policy.pdf \
+        --query "Is cataract surgery covered?" --concurrency 1 2 4 8 16
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+
+async def _one_request(client: httpx.AsyncClient, url: str, pdf_bytes: bytes, query: str) -> float:
+    started = time.perf_counter()
+    response = await client.post(
+        url,
+        data={"query": query},
+        files={"file": ("policy.pdf", pdf_bytes, "application/pdf")},
+    )
+    response.raise_for_status()
+    return time.perf_counter() - started
+
+
+async def run_level(url: str, pdf_bytes: bytes, query: str, concurrency: int, requests_per_level: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async with httpx.AsyncClient(timeout=None) as client:
+        async def worker():
+            nonlocal errors
+            async with semaphore:
+                try:
+                    latencies.append(await _one_request(client, url, pdf_bytes, query))
+                except httpx.HTTPError:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(requests_per_level)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": requests_per_level,
+        "errors": errors,
+        "wall_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        "latency_p50": round(statistics.median(latencies), 3) if latencies else None,
+        "latency_p95": round(latencies[int(0.95 * (len(latencies) - 1))], 3) if latencies else None,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000/api/process")
+    parser.add_argument("--pdf", required=True)
+    parser.add_argument("--query", default="Is cataract surgery covered?")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests-per-level", type=int, default=16)
+    args = parser.parse_args()
+
+    with open(args.pdf, "rb") as f:
+        pdf_bytes = f.read()
+
+    results = []
+    for concurrency in args.concurrency:
+        result = await run_level(args.url, pdf_bytes, args.query, concurrency, args.requests_per_level)
+        results.append(result)
+        print(json.dumps(result))
+
+    baseline = results[0]["throughput_rps"] or 1.0
+    for result in results:
+        result["speedup_vs_first_level"] = round(result["throughput_rps"] / baseline, 2)
+    print(json.dumps({"endpoint": args.url, "levels": results}, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,326 @@
+"""
+Offline end-to-end benchmark suite for the three Python services.
+
+Runs every service against synthetic policy PDFs (see synthetic_pdf.py) with
+the local model stand-ins from fakes.py, so it needs no network or API keys
+and gives the same workload on every run:
+
+    rag             doc_qa_backend RAGProcessor: parse, split, then the cold and warm
+                    pipeline stages (chunking, embedding, storing, expansion,
+                    retrieval, extraction, decision, narrative) and async throughput
+    tinyllama       TinyLlama VectorStore build/save/load/search, and /ask throughput
+                    through the GenerationBatcher (with a fake batch generator,
+                    so torch is not needed)
+    policy_checker  policy-checker index build, full vs retrieval adjudication
+                    and threaded throughput
+
+Each (suite, page count) pair runs in its own process, so peak RSS is
+measured per scenario. Results are written as JSON. With --baseline, a
+previous result file is compared stage by stage, and the exit status is 1
+if anything got slower than --tolerance allows.
+
+Usage:
+    python benchmarks/offline_suite.py --pages 5 50 500 --output results.json
+    python benchmarks/offline_suite.py --baseline results.json --tolerance 0.25
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARKS_DIR)
+
+SUITES = ("rag", "tinyllama", "policy_checker")
+QUERIES = [
+    "Is cataract surgery covered after 2 years?",
+    "I was hospitalized after an accident, am I covered?",
+    "Are maternity expenses covered?",
+    "Is physiotherapy covered after surgery?",
+    "Can I claim cosmetic surgery?",
+    "What is the waiting period for joint replacement?",
+    "Is road ambulance covered?",
+    "How do I cancel my policy?",
+]
+
+
+def _seconds(started: float) -> float:
+    return round(time.perf_counter() - started, 4)
+
+
+def _latency_summary(latencies, wall_seconds) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "throughput_rps": round(len(ordered) / wall_seconds, 3),
+        "p50_s": round(ordered[len(ordered) // 2], 4),
+        "p95_s": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+    }
+
+
+def _threaded_throughput(call, concurrency: int, requests: int) -> dict:
+    latencies = []
+    lock = threading.Lock()
+
+    def one(i):
+        started = time.perf_counter()
+        call(QUERIES[i % len(QUERIES)])
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    return _latency_summary(latencies, time.perf_counter() - started)
+
+
+def _parse_and_split(pdf_bytes: bytes, stages: dict):
+    from shared.chunking import iter_chunks
+    from shared.pdf_ingest import iter_pages
+
+    started = time.perf_counter()
+    pages = list(iter_pages(pdf_bytes))
+    stages["parse"] = _seconds(started)
+    started = time.perf_counter()
+    chunks = list(iter_chunks(iter(pages)))
+    stages["split"] = _seconds(started)
+    return pages, chunks
+
+
+def run_rag(pdf_bytes: bytes, args) -> dict:
+    sys.path.insert(0, os.path.join(REPO_ROOT, "doc_qa_backend"))
+    from fakes import FakeChatModel, FakeEmbeddings
+    from app.core.logic import RAGProcessor
+    from app.core.timing import StageTimings
+
+    stages = {}
+    _parse_and_split(pdf_bytes, stages)
+
+    processor = RAGProcessor(
+        llm=FakeChatModel(latency=args.llm_latency, per_token_latency=args.llm_token_latency),
+        embedding_model=FakeEmbeddings(latency=args.embed_latency),
+        index_cache_dir=tempfile.mkdtemp(prefix="offline-rag-"),
+    )
+    processor.llm_cache.enabled = False
+
+    async def scenario():
+        cold = StageTimings()
+        await processor.aprocess_document_and_query(pdf_bytes, QUERIES[0], timings=cold)
+        cold = cold.as_dict()
+        warm = StageTimings()
+        await processor.aprocess_document_and_query(pdf_bytes, QUERIES[1], timings=warm)
+        warm = warm.as_dict()
+
+        throughput = {}
+        for concurrency in args.concurrency:
+            semaphore = asyncio.Semaphore(concurrency)
+            latencies = []
+
+            async def one(i):
+                async with semaphore:
+                    started = time.perf_counter()
+                    await processor.aprocess_document_and_query(pdf_bytes, QUERIES[i % len(QUERIES)])
+                    latencies.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(args.requests)))
+            throughput[str(concurrency)] = _latency_summary(latencies, time.perf_counter() - started)
+        return cold, warm, throughput
+
+    cold, warm, throughput = asyncio.run(scenario())
+    processor.close()
+    stages.update({f"cold_{name}": seconds for name, seconds in cold.items()})
+    stages.update({f"warm_{name}": seconds for name, seconds in warm.items()})
+    return {"stages": stages, "throughput": throughput}
+
+
+def run_tinyllama(pdf_bytes: bytes, args) -> dict:
+    sys.path.insert(0, os.path.join(REPO_ROOT, "TinyLlama"))
+    from fakes import FakeGenerator, FakeSentenceTransformer
+    from batching import GenerationBatcher
+    from vectorstore import VectorStore
+
+    stages = {}
+    _, chunks = _parse_and_split(pdf_bytes, stages)
+    texts = [chunk.text for chunk in chunks]
+
+    store = VectorStore(index_dir=tempfile.mkdtemp(prefix="offline-vs-"), model=FakeSentenceTransformer())
+    started = time.perf_counter()
+    store.build_index(texts)
+    stages["embed_and_index"] = _seconds(started)
+    started = time.perf_counter()
+    store.save("offline")
+    stages["save"] = _seconds(started)
+    started = time.perf_counter()
+    store.load("offline")
+    stages["load_mmap"] = _seconds(started)
+    started = time.perf_counter()
+    for query in QUERIES:
+        store.search(query)
+    stages["search_per_query"] = round(_seconds(started) / len(QUERIES), 6)
+    started = time.perf_counter()
+    store.search(QUERIES)
+    stages["search_batched_per_query"] = round(_seconds(started) / len(QUERIES), 6)
+
+    generator = FakeGenerator(latency=args.generate_latency, per_item_latency=args.generate_item_latency)
+    batcher = GenerationBatcher(generator.generate_batch, max_batch_size=8, max_wait=0.01)
+
+    def ask(query):
+        chunks = store.search(query)
+        return batcher.generate(f"Context:\n{chr(10).join(chunks)}\n\nQuestion:\n{query}\n\nAnswer:")
+
+    throughput = {}
+    for concurrency in args.concurrency:
+        generator.batch_sizes.clear()
+        throughput[str(concurrency)] = _threaded_throughput(ask, concurrency, args.requests)
+        throughput[str(concurrency)]["mean_batch_size"] = round(statistics.mean(generator.batch_sizes), 2)
+    batcher.close()
+    return {"stages": stages, "throughput": throughput}
+
+
+def run_policy_checker(pdf_bytes: bytes, args) -> dict:
+    from fakes import FakeGemini
+    from shared.chunking import estimate_tokens
+
+    spec = importlib.util.spec_from_file_location("policy_checker", os.path.join(REPO_ROOT, "policy-helper-ml", "policy-checker.py"))
+    checker = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(checker)
+    checker.model = FakeGemini(latency=args.gemini_latency, per_1k_prompt_tokens_latency=args.gemini_prompt_latency)
+    checker.llm_cache.enabled = False
+
+    stages = {}
+    pdf_path = os.path.join(tempfile.mkdtemp(prefix="offline-pc-"), "policy.pdf")
+    with open(pdf_path, "wb") as f:
+        f.write(pdf_bytes)
+    started = time.perf_counter()
+    policy_index = checker.get_policy_index(pdf_path)
+    stages["extract_and_index"] = _seconds(started)
+    started = time.perf_counter()
+    checker.get_policy_index(pdf_path)
+    stages["cached_index_lookup"] = _seconds(started)
+
+    started = time.perf_counter()
+    excerpts, _ = policy_index.select_context(QUERIES[0])
+    stages["select_context"] = _seconds(started)
+    stages["full_prompt_tokens"] = estimate_tokens(checker.build_prompt(policy_index.full_text, QUERIES[0]))
+    stages["retrieval_prompt_tokens"] = estimate_tokens(checker.build_prompt(excerpts, QUERIES[0], excerpts=True))
+    started = time.perf_counter()
+    checker.adjudicate(policy_index.full_text, QUERIES[0])
+    stages["adjudicate_full"] = _seconds(started)
+    started = time.perf_counter()
+    checker.adjudicate(excerpts, QUERIES[0], excerpts=True)
+    stages["adjudicate_retrieval"] = _seconds(started)
+
+    def ask(query):
+        context, _ = checker.get_policy_index(pdf_path).select_context(query)
+        return checker.adjudicate(context, query, excerpts=True)
+
+    throughput = {str(concurrency): _threaded_throughput(ask, concurrency, args.requests) for concurrency in args.concurrency}
+    return {"stages": stages, "throughput": throughput}
+
+
+RUNNERS = {"rag": run_rag, "tinyllama": run_tinyllama, "policy_checker": run_policy_checker}
+
+
+def _run_scenario(suite: str, pages: int, args, results):
+    sys.path.insert(0, BENCHMARKS_DIR)
+    sys.path.insert(0, REPO_ROOT)
+    from synthetic_pdf import make_policy_pdf
+
+    try:
+        result = RUNNERS[suite](make_policy_pdf(pages, seed=args.seed), args)
+    except Exception as e:
+        result = {"error": f"{type(e).__name__}: {e}"}
+    result["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    results[f"{suite}/{pages}"] = result
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """Stages and peak memory that regressed by more than `tolerance` (a fraction) against the baseline."""
+    regressions = []
+    for scenario, result in current["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if not previous or "error" in result or "error" in previous:
+            continue
+        metrics = {f"stages.{name}": value for name, value in result["stages"].items()}
+        metrics["peak_rss_mb"] = result["peak_rss_mb"]
+        previous_metrics = {f"stages.{name}": value for name, value in previous["stages"].items()}
+        previous_metrics["peak_rss_mb"] = previous["peak_rss_mb"]
+        for name, value in metrics.items():
+            before = previous_metrics.get(name)
+            # Sub-millisecond timings are all noise.
+            if before and before > 0.001 and value > before * (1 + tolerance):
+                regressions.append({"scenario": scenario, "metric": name, "baseline": before, "current": value})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=list(SUITES))
+    parser.add_argument("--pages", type=int, nargs="+", default=[5, 50, 500])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=32, help="requests per concurrency level")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--llm-token-latency", type=float, default=0.0)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--gemini-latency", type=float, default=0.5)
+    parser.add_argument("--gemini-prompt-latency", type=float, default=0.02, help="extra seconds per 1k prompt tokens")
+    parser.add_argument("--generate-latency", type=float, default=0.3)
+    parser.add_argument("--generate-item-latency", type=float, default=0.03)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON results here as well as to stdout")
+    parser.add_argument("--baseline", help="previous results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    # The benchmark must not read or fill the shared on-disk LLM and chunk embedding caches.
+    os.environ["LLM_CACHE_ENABLED"] = "false"
+    os.environ["EMBEDDING_CACHE_ENABLED"] = "false"
+
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        results = manager.dict()
+        for suite in args.suites:
+            for pages in args.pages:
+                process = context.Process(target=_run_scenario, args=(suite, pages, args, results))
+                process.start()
+                process.join()
+                key = f"{suite}/{pages}"
+                if key not in results:
+                    results[key] = {"error": f"process exited with code {process.exitcode}"}
+                print(f"{key}: {json.dumps(results[key])}", file=sys.stderr)
+        scenarios = dict(results)
+
+    output = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "settings": {name: value for name, value in vars(args).items() if name not in ("output", "baseline")},
+        "scenarios": scenarios,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            output["regressions"] = compare(output, json.load(f), args.tolerance)
+
+    text = json.dumps(output, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    if output.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Per-stage latency of the RAGProcessor pipeline under each scheduling mode.
+
+Runs the async pipeline in-process on one PDF and query and reports the mean
+duration of every stage plus the end-to-end total for:
+
+    sequential         expansion waits for indexing, separate decision/narrative calls
+    overlapped         expansion runs concurrently with indexing
+    fused              one structured call produces decision and narrative
+    overlapped+fused   both
+
+By default every run starts from an empty index cache ("cold"), which is where
+overlapping expansion with indexing pays off. Pass --warm to measure repeat
+questions instead. The LLM response cache is bypassed unless --llm-cache is
+given, so every run pays for its LLM calls. Needs GROQ_API_KEY and
+COHERE_API_KEY like the service.
+
+Usage:
+    python benchmarks/pipeline_modes.py --pdf policy-helper-ml/hackathon-policy.pdf --runs 3
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "doc_qa_backend"))
+# Cold runs have to pay for chunk embeddings too, so the chunk embedding cache stays off.
+os.environ.setdefault("EMBEDDING_CACHE_ENABLED", "false")
+
+from app.core.logic import rag_processor  # noqa: E402
+from app.core.timing import StageTimings  # noqa: E402
+
+MODES = {
+    "sequential": {"overlap": False, "fused": False},
+    "overlapped": {"overlap": True, "fused": False},
+    "fused": {"overlap": False, "fused": True},
+    "overlapped+fused": {"overlap": True, "fused": True},
+}
+
+
+async def run_mode(pdf_bytes: bytes, query: str, runs: int, warm: bool, overlap: bool, fused: bool) -> dict:
+    samples = []
+    for _ in range(runs):
+        if not warm:
+            rag_processor.index_cache.clear()
+        timings = StageTimings()
+        await rag_processor.aprocess_document_and_query(pdf_bytes, query, timings=timings, overlap=overlap, fused=fused)
+        samples.append(timings.as_dict())
+
+    stage_names = sorted({name for sample in samples for name in sample})
+    return {
+        name: round(statistics.mean(sample.get(name, 0.0) for sample in samples), 4)
+        for name in stage_names
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", required=True)
+    parser.add_argument("--query", default="Is cataract surgery covered?")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--warm", action="store_true", help="reuse the document index between runs")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--llm-cache", action="store_true", help="answer repeated prompts from the LLM response cache")
+    args = parser.parse_args()
+
+    rag_processor.llm_cache.enabled = args.llm_cache
+
+    with open(args.pdf, "rb") as f:
+        pdf_bytes = f.read()
+    if args.warm:
+        await rag_processor.aget_vector_store(pdf_bytes)
+
+    results = {}
+    for mode in args.modes:
+        results[mode] = await run_mode(pdf_bytes, args.query, args.runs, args.warm, **MODES[mode])
+        print(f"{mode}: {json.dumps(results[mode])}")
+
+    baseline = results.get("sequential", {}).get("total")
+    if baseline:
+        for mode, stages in results.items():
+            stages["saved_vs_sequential"] = round(baseline - stages["total"], 4)
+
+    print(json.dumps({"cache": "warm" if args.warm else "cold", "runs": args.runs, "modes": results}, indent=2))
+    rag_processor.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
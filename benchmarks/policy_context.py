@@ -0,0 +1,109 @@
+"""
+Prompt size and decision agreement of the policy-checker context modes.
+
+Asks every query twice: once with the whole policy in the prompt ("full") and
+once with only the retrieved clauses plus the waiting-period and exclusion
+sections ("retrieval"). For each query it reports the estimated prompt tokens
+of both modes, the latency of both Gemini calls and whether the two decisions
+agree. The summary gives the mean token reduction and the agreement rate.
+
+--dry-run skips Gemini and reports prompt sizes only. The LLM response cache
+is bypassed unless --llm-cache is given. Needs GOOGLE_API_KEY like the service.
+
+Usage:
+    python benchmarks/policy_context.py --pdf policy-helper-ml/hackathon-policy.pdf --budget 6000
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import time
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, REPO_ROOT)
+
+from shared.chunking import estimate_tokens  # noqa: E402
+
+QUERIES = [
+    "I had an accident and was hospitalized for 3 days for a leg fracture surgery.",
+    "I have had this policy for 1.5 years and need to undergo cataract surgery.",
+    "I want to claim expenses for my physiotherapy sessions.",
+    "My policy started 10 days ago and I have been admitted for typhoid fever.",
+    "I have diabetes since before I bought the policy two years ago; can I claim my insulin hospitalization?",
+    "I want a nose job to improve my appearance.",
+    "Is the delivery of my baby covered?",
+    "I need a knee replacement, I have had the policy for 3 years.",
+    "I need a root canal treatment at my dentist.",
+    "I was injured while skydiving and need surgery.",
+]
+
+
+def load_policy_checker():
+    path = os.path.join(REPO_ROOT, "policy-helper-ml", "policy-checker.py")
+    spec = importlib.util.spec_from_file_location("policy_checker", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def timed_decision(checker, policy_doc, query, excerpts):
+    started = time.perf_counter()
+    try:
+        status = checker.adjudicate(policy_doc, query, excerpts).get("status", "").strip().upper()
+    except Exception as e:
+        status = f"ERROR: {e}"
+    return status, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", default=os.path.join(REPO_ROOT, "policy-helper-ml", "hackathon-policy.pdf"))
+    parser.add_argument("--budget", type=int, default=None, help="retrieval token budget (default POLICY_CONTEXT_TOKEN_BUDGET)")
+    parser.add_argument("--queries", nargs="+", default=QUERIES)
+    parser.add_argument("--dry-run", action="store_true", help="report prompt sizes without calling Gemini")
+    parser.add_argument("--llm-cache", action="store_true", help="answer repeated prompts from the LLM response cache")
+    args = parser.parse_args()
+
+    checker = load_policy_checker()
+    checker.llm_cache.enabled = args.llm_cache
+    budget = args.budget or checker.POLICY_CONTEXT_TOKEN_BUDGET
+
+    started = time.perf_counter()
+    policy_index = checker.get_policy_index(args.pdf)
+    index_seconds = time.perf_counter() - started
+
+    rows = []
+    for query in args.queries:
+        excerpts, _ = policy_index.select_context(query, budget)
+        row = {
+            "query": query,
+            "full_prompt_tokens": estimate_tokens(checker.build_prompt(policy_index.full_text, query)),
+            "retrieval_prompt_tokens": estimate_tokens(checker.build_prompt(excerpts, query, excerpts=True)),
+        }
+        row["token_reduction"] = round(1 - row["retrieval_prompt_tokens"] / row["full_prompt_tokens"], 4)
+        if not args.dry_run:
+            row["full_status"], row["full_seconds"] = timed_decision(checker, policy_index.full_text, query, False)
+            row["retrieval_status"], row["retrieval_seconds"] = timed_decision(checker, excerpts, query, True)
+            row["agree"] = row["full_status"] == row["retrieval_status"]
+        rows.append(row)
+        print(json.dumps(row))
+
+    summary = {
+        "budget": budget,
+        "index_build_seconds": round(index_seconds, 3),
+        "mean_full_prompt_tokens": round(statistics.mean(row["full_prompt_tokens"] for row in rows)),
+        "mean_retrieval_prompt_tokens": round(statistics.mean(row["retrieval_prompt_tokens"] for row in rows)),
+        "mean_token_reduction": round(statistics.mean(row["token_reduction"] for row in rows), 4),
+    }
+    if not args.dry_run:
+        summary["agreement"] = round(sum(row["agree"] for row in rows) / len(rows), 4)
+        summary["mean_full_seconds"] = round(statistics.mean(row["full_seconds"] for row in rows), 3)
+        summary["mean_retrieval_seconds"] = round(statistics.mean(row["retrieval_seconds"] for row in rows), 3)
+    print(json.dumps({"summary": summary, "queries": rows}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
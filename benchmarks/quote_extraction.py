@@ -0,0 +1,144 @@
+"""
+LLM quote extraction versus the local extractive selector (quotes.py).
+
+Indexes one policy, then answers each query twice through RAGProcessor: once
+with QUOTE_EXTRACTION_MODE "llm" and once with "local". For each query it
+reports the "extraction" stage and end-to-end latency of both, whether the
+decisions agree, and how many of the LLM's quotes the local selector also
+picked. A quote counts as picked when at least --overlap of its words appear
+in one of the local quotes, since the LLM often trims or re-wraps sentences.
+
+Needs GROQ_API_KEY and COHERE_API_KEY like the service, unless --offline is
+given, which uses a synthetic policy (synthetic_pdf.py) and the local
+stand-ins in fakes.py. Offline agreement only checks the plumbing: the fake
+LLM does not read the query.
+
+Usage:
+    python benchmarks/quote_extraction.py --pdf policy-helper-ml/hackathon-policy.pdf
+    python benchmarks/quote_extraction.py --offline --pages 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, "..", "doc_qa_backend"))
+# Sentence embeddings would otherwise be answered from the cache after the first query.
+os.environ.setdefault("EMBEDDING_CACHE_ENABLED", "false")
+
+from app.core.timing import StageTimings  # noqa: E402
+
+QUERIES = [
+    "I had an accident and was hospitalized for 3 days for a leg fracture surgery.",
+    "I have had this policy for 1.5 years and need to undergo cataract surgery.",
+    "I want to claim expenses for my physiotherapy sessions.",
+    "My policy started 10 days ago and I have been admitted for typhoid fever.",
+    "I want a nose job to improve my appearance.",
+    "Is the delivery of my baby covered?",
+    "I need a knee replacement, I have had the policy for 3 years.",
+    "I was injured while skydiving and need surgery.",
+]
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def words(text: str) -> set:
+    return set(_WORD.findall(text.lower()))
+
+
+def quote_agreement(llm_quotes: list, local_quotes: list, overlap: float) -> float:
+    """Fraction of the LLM's quotes that one of the local quotes covers."""
+    if not llm_quotes:
+        return 1.0
+    local_words = [words(quote) for quote in local_quotes]
+    covered = 0
+    for quote in llm_quotes:
+        quote_words = words(quote)
+        if quote_words and any(len(quote_words & other) >= overlap * len(quote_words) for other in local_words):
+            covered += 1
+    return covered / len(llm_quotes)
+
+
+async def answer(processor, pdf_bytes: bytes, query: str, mode: str) -> tuple:
+    processor.quote_extraction = mode
+    timings = StageTimings()
+    result = await processor.aprocess_document_and_query(pdf_bytes, query, timings=timings)
+    return result, timings.as_dict()
+
+
+async def run(processor, pdf_bytes: bytes, args) -> dict:
+    await processor.aget_vector_store(pdf_bytes)
+    rows = []
+    for query in args.queries:
+        llm_result, llm_timings = await answer(processor, pdf_bytes, query, "llm")
+        local_result, local_timings = await answer(processor, pdf_bytes, query, "local")
+        row = {
+            "query": query,
+            "llm_extraction_seconds": round(llm_timings.get("extraction", 0.0), 4),
+            "local_extraction_seconds": round(local_timings.get("extraction", 0.0), 4),
+            "llm_total_seconds": round(llm_timings["total"], 4),
+            "local_total_seconds": round(local_timings["total"], 4),
+            "llm_decision": llm_result.decision,
+            "local_decision": local_result.decision,
+            "quote_agreement": round(quote_agreement(llm_result.justification, local_result.justification, args.overlap), 4),
+            "local_quotes": local_result.justification,
+        }
+        rows.append(row)
+        print(json.dumps({key: value for key, value in row.items() if key != "local_quotes"}))
+
+    summary = {
+        "queries": len(rows),
+        "mean_llm_extraction_seconds": round(statistics.mean(row["llm_extraction_seconds"] for row in rows), 4),
+        "mean_local_extraction_seconds": round(statistics.mean(row["local_extraction_seconds"] for row in rows), 4),
+        "mean_llm_total_seconds": round(statistics.mean(row["llm_total_seconds"] for row in rows), 4),
+        "mean_local_total_seconds": round(statistics.mean(row["local_total_seconds"] for row in rows), 4),
+        "decision_agreement": round(sum(row["llm_decision"] == row["local_decision"] for row in rows) / len(rows), 4),
+        "mean_quote_agreement": round(statistics.mean(row["quote_agreement"] for row in rows), 4),
+    }
+    return {"summary": summary, "queries": rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="policy PDF to ask about (required unless --offline)")
+    parser.add_argument("--queries", nargs="+", default=QUERIES)
+    parser.add_argument("--overlap", type=float, default=0.6, help="share of a quote's words a local quote must contain")
+    parser.add_argument("--offline", action="store_true", help="use a synthetic policy and the fakes.py stand-ins")
+    parser.add_argument("--pages", type=int, default=20, help="synthetic policy length with --offline")
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="seconds per fake LLM call with --offline")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="seconds per fake embedding call with --offline")
+    args = parser.parse_args()
+
+    if args.offline:
+        from fakes import FakeChatModel, FakeEmbeddings
+        from synthetic_pdf import make_policy_pdf
+        from app.core.logic import RAGProcessor
+
+        processor = RAGProcessor(
+            llm=FakeChatModel(latency=args.llm_latency),
+            embedding_model=FakeEmbeddings(latency=args.embed_latency),
+            index_cache_dir=tempfile.mkdtemp(prefix="quote-extraction-"),
+        )
+        pdf_bytes = make_policy_pdf(args.pages)
+    else:
+        if not args.pdf:
+            parser.error("--pdf is required unless --offline is given")
+        from app.core.logic import rag_processor as processor
+
+        with open(args.pdf, "rb") as f:
+            pdf_bytes = f.read()
+    # Both modes must pay for their LLM calls on every query.
+    processor.llm_cache.enabled = False
+
+    results = asyncio.run(run(processor, pdf_bytes, args))
+    print(json.dumps(results, indent=2))
+    processor.close()
+
+
+if __name__ == "__main__":
+    main()
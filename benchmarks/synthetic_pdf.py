@@ -0,0 +1,153 @@
+"""
+Synthetic health-insurance policy PDFs for offline benchmarks.
+
+`make_policy_pdf(pages)` returns the bytes of a text PDF with the structure of
+a real policy wording: numbered sections, definitions, waiting periods,
+exclusions and benefit tables, filled with deterministic pseudo-random
+clauses. It writes PDF syntax directly, so no PDF library is needed; the
+output parses with pypdf like any other policy.
+
+`amend` rewrites that fraction of the clauses while leaving the rest of the
+wording untouched, like a new version of the same policy.
+
+Usage:
+    python benchmarks/synthetic_pdf.py --pages 5 50 500 --out-dir /tmp/policies
+"""
+
+import argparse
+import os
+import random
+import textwrap
+from typing import List
+
+LINES_PER_PAGE = 58
+LINE_WIDTH = 95
+
+CONDITIONS = [
+    "cataract", "hernia", "joint replacement", "kidney stones", "sinusitis", "tonsillitis", "varicose veins",
+    "gallbladder disease", "benign prostatic hypertrophy", "osteoarthritis", "gout", "fistula", "haemorrhoids",
+    "spinal disorders", "hysterectomy", "retinal detachment", "glaucoma", "polycystic ovarian disease",
+]
+BENEFITS = [
+    "In-patient Hospitalization", "Day Care Procedures", "Pre-hospitalization Expenses", "Post-hospitalization Expenses",
+    "Road Ambulance", "Organ Donor Expenses", "Domiciliary Hospitalization", "Physiotherapy", "Emergency Air Ambulance",
+    "Out-patient Dental Treatment", "Mental Illness Treatment", "Modern Treatment Methods", "Palliative Care",
+]
+EXCLUSIONS = [
+    "cosmetic or plastic surgery", "treatment for obesity or weight control", "hazardous or adventure sports",
+    "change-of-gender treatments", "unproven treatments", "maternity expenses", "refractive error correction",
+    "breach of law with criminal intent", "treatment at excluded providers", "substance abuse",
+]
+SECTION_TITLES = ["DEFINITIONS", "BENEFITS COVERED", "WAITING PERIODS", "EXCLUSIONS", "GENERAL CONDITIONS", "CLAIM PROCEDURE"]
+
+
+def _clause(section: str, number: str, rng: random.Random) -> str:
+    if section == "DEFINITIONS":
+        term = rng.choice(BENEFITS + CONDITIONS).title()
+        return (f"{number} {term} means any treatment, service or expense relating to {term.lower()} that is medically "
+                f"necessary and prescribed in writing by a Medical Practitioner, subject to the terms of this Policy.")
+    if section == "BENEFITS COVERED":
+        benefit = rng.choice(BENEFITS)
+        limit = rng.choice(["10%", "25%", "50%", "100%"])
+        return (f"{number} {benefit}: The Insurer will indemnify the Insured for {benefit.lower()} up to {limit} of the "
+                f"Sum Insured per Policy Year, provided that the treatment is taken in a Network Provider and "
+                f"pre-authorization is obtained at least {rng.randint(2, 7)} days before a planned admission.")
+    if section == "WAITING PERIODS":
+        condition = rng.choice(CONDITIONS)
+        months = rng.choice([12, 24, 36, 48])
+        return (f"{number} Expenses related to the treatment of {condition} shall be excluded until the expiry of "
+                f"{months} months of continuous coverage after the date of inception of the first policy with the "
+                f"Insurer. This exclusion shall not apply to claims arising due to an Accident.")
+    if section == "EXCLUSIONS":
+        exclusion = rng.choice(EXCLUSIONS)
+        return (f"{number} The Insurer shall not be liable to make any payment for expenses related to {exclusion}, "
+                f"unless such treatment is necessitated by an Accident or is specifically covered under an optional "
+                f"benefit mentioned in the Schedule (Code-Excl{rng.randint(1, 40):02d}).")
+    if section == "GENERAL CONDITIONS":
+        days = rng.choice([15, 30, 45])
+        return (f"{number} The Policyholder may cancel this Policy by giving {days} days written notice, and the "
+                f"Insurer shall refund premium on a pro-rata basis provided no claim has been made during the "
+                f"Policy Year, in accordance with the applicable regulations.")
+    return (f"{number} All claims must be notified within {rng.choice([24, 48, 72])} hours of admission and the "
+            f"documents listed in the Schedule must be submitted within {rng.choice([15, 30])} days of discharge, "
+            f"failing which the claim may be rejected unless the delay is shown to be beyond the Insured's control.")
+
+
+def policy_lines(pages: int, seed: int = 0, amend: float = 0.0, amend_seed: int = 1) -> List[List[str]]:
+    """Text lines of each page."""
+    rng = random.Random(seed)
+    amend_rng = random.Random(amend_seed)
+    lines: List[str] = []
+    section = 0
+    total_lines = pages * LINES_PER_PAGE
+    while len(lines) < total_lines:
+        title = SECTION_TITLES[section % len(SECTION_TITLES)]
+        section += 1
+        lines.extend(["", f"SECTION {section} - {title}", ""])
+        for clause_number in range(1, rng.randint(6, 14)):
+            clause = _clause(title, f"{section}.{clause_number}", rng)
+            # Drawn from a separate generator so the unamended clauses stay identical.
+            if amend and amend_rng.random() < amend:
+                clause = _clause(title, f"{section}.{clause_number}", amend_rng)
+            lines.extend(textwrap.wrap(clause, LINE_WIDTH))
+    lines = lines[:total_lines]
+    return [lines[i:i + LINES_PER_PAGE] for i in range(0, total_lines, LINES_PER_PAGE)]
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_policy_pdf(pages: int, seed: int = 0, amend: float = 0.0, amend_seed: int = 1) -> bytes:
+    page_lines = policy_lines(pages, seed, amend, amend_seed)
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")  # filled in once the page tree's number is known
+    page_tree = add(b"")
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    page_ids = []
+    for lines in page_lines:
+        text = "".join(f"({_escape(line)}) Tj T* " for line in lines)
+        stream = f"BT /F1 10 Tf 12.5 TL 40 760 Td {text}ET".encode("latin-1", "replace")
+        contents = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+            % (page_tree, font, contents)
+        ))
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % page_tree
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[page_tree - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref_offset)
+    return bytes(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[5, 50, 500])
+    parser.add_argument("--out-dir", default=".")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    for pages in args.pages:
+        path = os.path.join(args.out_dir, f"synthetic-policy-{pages}p.pdf")
+        with open(path, "wb") as f:
+            f.write(make_policy_pdf(pages, args.seed))
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Tokens/sec, time-to-first-token and peak memory of TinyLlamaQA inference modes.
+
+    fp32               full-precision model, whole prompt prefilled every time
+    fp32+prefix        prefix KV cache for the retrieved context
+    int8               dynamically quantized Linear layers (CPU)
+    int8+prefix        both
+
+Each mode runs in its own process so peak RSS is measured per mode. The
+workload asks several questions over a few fixed sets of context chunks, like
+repeated /ask traffic on one policy, so the prefix cache only pays for a
+context the first time it sees it. Needs the TinyLlama requirements installed
+and downloads the model on first run.
+
+Usage:
+    python benchmarks/tinyllama_inference.py --pdf TinyLlama/data/policy.pdf --contexts 3 --questions 4
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import time
+
+TINYLLAMA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "TinyLlama")
+
+MODES = {
+    "fp32": {"quantize": "none", "prefix_cache": False},
+    "fp32+prefix": {"quantize": "none", "prefix_cache": True},
+    "int8": {"quantize": "int8", "prefix_cache": False},
+    "int8+prefix": {"quantize": "int8", "prefix_cache": True},
+}
+
+QUESTIONS = [
+    "Is cataract surgery covered?",
+    "What is the waiting period for pre-existing diseases?",
+    "Are maternity expenses covered?",
+    "Is knee replacement surgery excluded in the first year?",
+    "What is the room rent limit?",
+    "Is ambulance cover included?",
+]
+
+
+class FirstTokenTimer:
+    """Minimal generate() streamer: the first put() is the prompt, every later one a new token."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.finished = None
+        self.tokens = 0
+        self._seen_prompt = False
+
+    def put(self, value):
+        if not self._seen_prompt:
+            self._seen_prompt = True
+            return
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.tokens += value.numel()
+
+    def end(self):
+        self.finished = time.perf_counter()
+
+
+def load_contexts(pdf_path, num_contexts, chunks_per_context, chunk_size):
+    if pdf_path:
+        from pdf_utils import extract_text_from_pdf
+
+        text = extract_text_from_pdf(pdf_path)
+    else:
+        text = " ".join(
+            f"Section {i}. The insurer shall indemnify hospitalization expenses for treatment of illness or injury "
+            f"subject to a waiting period of {i % 4 + 1} years, the sum insured and the exclusions in this policy."
+            for i in range(400)
+        )
+    chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+    step = max(1, len(chunks) // max(1, num_contexts * chunks_per_context))
+    chunks = chunks[::step]
+    return [chunks[i * chunks_per_context:(i + 1) * chunks_per_context] for i in range(num_contexts)]
+
+
+def run_mode(mode, contexts, num_questions, max_new_tokens, results):
+    sys.path.insert(0, TINYLLAMA_DIR)
+    os.environ["GENERATION_MAX_NEW_TOKENS"] = str(max_new_tokens)
+    from model import TinyLlamaQA
+
+    settings = MODES[mode]
+    llm = TinyLlamaQA(max_batch_size=1, prefix_cache_mb=512 if settings["prefix_cache"] else 0, quantize=settings["quantize"])
+
+    samples = []
+    for question in QUESTIONS[:num_questions]:
+        for chunks in contexts:
+            timer = FirstTokenTimer()
+            if settings["prefix_cache"]:
+                llm.generate_cached(chunks, question, streamer=timer)
+            else:
+                llm.generate_batch([llm.build_prompt("\n".join(chunks), question)], streamer=timer)
+            samples.append({
+                "ttft": timer.first_token_at - timer.started,
+                "seconds": timer.finished - timer.started,
+                "tokens": timer.tokens,
+            })
+    llm.close()
+
+    first_pass = samples[:len(contexts)]
+    repeat_pass = samples[len(contexts):] or first_pass
+    results[mode] = {
+        "tokens_per_second": round(sum(s["tokens"] for s in samples) / sum(s["seconds"] for s in samples), 3),
+        "ttft_first_seen_context_s": round(statistics.mean(s["ttft"] for s in first_pass), 4),
+        "ttft_repeated_context_s": round(statistics.mean(s["ttft"] for s in repeat_pass), 4),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "requests": len(samples),
+        "prefix_cache": llm.prefix_cache.stats() if llm.prefix_cache is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="policy PDF to take context chunks from (default: synthetic text)")
+    parser.add_argument("--contexts", type=int, default=3, help="distinct sets of retrieved chunks")
+    parser.add_argument("--chunks-per-context", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=512)
+    parser.add_argument("--questions", type=int, default=4, help="questions asked over every context")
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    args = parser.parse_args()
+
+    sys.path.insert(0, TINYLLAMA_DIR)
+    contexts = load_contexts(args.pdf, args.contexts, args.chunks_per_context, args.chunk_size)
+
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        results = manager.dict()
+        for mode in args.modes:
+            process = context.Process(target=run_mode, args=(mode, contexts, args.questions, args.max_new_tokens, results))
+            process.start()
+            process.join()
+            if mode in results:
+                print(f"{mode}: {json.dumps(results[mode])}")
+            else:
+                print(f"{mode}: failed (exit code {process.exitcode})")
+        print(json.dumps({"max_new_tokens": args.max_new_tokens, "modes": dict(results)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
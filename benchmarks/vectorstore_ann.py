@@ -0,0 +1,95 @@
+"""
+Recall versus latency of the TinyLlama VectorStore index types.
+
+Builds every index type over synthetic, clustered, normalized vectors (the
+shape of MiniLM chunk embeddings) at several corpus sizes. For each one it
+reports recall@k against the exact flat index, mean per-query latency of a
+batched search, build time and serialized index size.
+
+No model or PDF is needed. The indexes come from the same `make_index` and
+`search_parameters` that VectorStore uses, so VECTORSTORE_NPROBE,
+VECTORSTORE_HNSW_M and VECTORSTORE_HNSW_EF_SEARCH apply here too.
+
+Usage:
+    python benchmarks/vectorstore_ann.py --sizes 1000 10000 100000 --queries 500 --k 5
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "TinyLlama"))
+
+from vectorstore import INDEX_TYPES, make_index, search_parameters  # noqa: E402
+
+
+def synthetic_embeddings(count: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    """Unit vectors scattered around a few hundred topics, like chunks of many policy wordings."""
+    centers = rng.standard_normal((max(8, count // 50), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), count)] + 0.35 * rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def recall(approx: np.ndarray, exact: np.ndarray) -> float:
+    k = exact.shape[1]
+    found = sum(len(set(a) & set(e)) for a, e in zip(approx, exact))
+    return found / (len(exact) * k)
+
+
+def run_size(size: int, dim: int, num_queries: int, k: int, metric: str, index_types, rng) -> dict:
+    corpus = synthetic_embeddings(size, dim, rng)
+    queries = synthetic_embeddings(num_queries, dim, rng)
+
+    results = {}
+    exact = None
+    for index_type in ["flat"] + [name for name in index_types if name != "flat"]:
+        index = make_index(dim, size, index_type, metric)
+        started = time.perf_counter()
+        if not index.is_trained:
+            index.train(corpus)
+        index.add(corpus)
+        build_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        _, ids = index.search(queries, k, params=search_parameters(index))
+        search_seconds = time.perf_counter() - started
+        if exact is None:
+            exact = ids
+
+        results[index_type] = {
+            "faiss_index": type(index).__name__,
+            f"recall_at_{k}": round(recall(ids, exact), 4),
+            "latency_ms_per_query": round(1000 * search_seconds / num_queries, 4),
+            "build_seconds": round(build_seconds, 3),
+            "index_bytes": int(faiss.serialize_index(index).size),
+        }
+        print(f"{size} {index_type}: {json.dumps(results[index_type])}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=384, help="embedding size (all-MiniLM-L6-v2 is 384)")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--metric", choices=["l2", "ip"], default="ip")
+    parser.add_argument("--index-types", nargs="+", choices=list(INDEX_TYPES), default=list(INDEX_TYPES))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    results = {
+        str(size): run_size(size, args.dim, args.queries, args.k, args.metric, args.index_types, rng)
+        for size in args.sizes
+    }
+    print(json.dumps({"dim": args.dim, "metric": args.metric, "k": args.k, "queries": args.queries, "sizes": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Modules shared with the other PolicyPal services live in the repo-level `shared/` package.
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
@@ -1,8 +1,20 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from .core.logic import rag_processor, FinalResponse 
+import json
+from typing import List, Optional
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from .core.logic import rag_processor
+from .core.timing import StageTimings
+from .core.jobs import JobQueue, QueueFullError, JOB_MAX_WAIT_SECONDS
+from shared.llm_client import is_retryable
 
 router = APIRouter()
 
+async def run_process_job(payload: dict, timings: StageTimings) -> dict:
+    result = await rag_processor.aprocess_document_and_query(file_bytes=payload["file_bytes"], query=payload["query"], timings=timings)
+    return result.dict()
+
+job_queue = JobQueue(run_process_job)
+
 @router.post("/process")
 async def process_document_and_get_answer(
     query: str = Form(...),
@@ -23,8 +35,9 @@ async def process_document_and_get_answer(
         print(f"✅ File read successfully. Size: {len(file_bytes)} bytes")
         
         print("🧠 Processing with RAG processor...")
-        result = rag_processor.process_document_and_query(file_bytes=file_bytes, query=query)
-        print("✅ RAG processing complete")
+        timings = StageTimings()
+        result = await rag_processor.aprocess_document_and_query(file_bytes=file_bytes, query=query, timings=timings)
+        print(f"✅ RAG processing complete. Stage timings (s): {timings.as_dict()}")
         
         print("📤 Converting result to dict...")
         response_data = result.dict()
@@ -39,4 +52,132 @@ async def process_document_and_get_answer(
         print(f"Error message: {str(e)}")
         traceback.print_exc()
         print("---------------------------")
+        if is_retryable(e):
+            # The model provider is still rate limiting or unavailable after our retries.
+            raise HTTPException(status_code=503, detail="The model provider is busy. Try again later.", headers={"Retry-After": "30"})
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+
+
+@router.post("/process/stream")
+async def process_document_and_stream_answer(
+    query: str = Form(...),
+    file: UploadFile = File(...)
+):
+    """
+    Same inputs as /process, but streams the answer as server-sent events: progress
+    updates, the justification quotes and decision as soon as they exist, then the
+    PolicyPal narrative token by token, and a final `done` event with the full result.
+    """
+    print(f"📄 Received file: {file.filename} ({file.content_type})")
+    print(f"❓ Query (streaming): {query}")
+
+    if file.content_type != "application/pdf":
+        raise HTTPException(status_code=400, detail="Only PDF files are supported.")
+
+    file_bytes = await file.read()
+
+    async def event_stream():
+        timings = StageTimings()
+        try:
+            async for event, data in rag_processor.astream_document_and_query(file_bytes=file_bytes, query=query, timings=timings):
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+            print(f"✅ RAG streaming complete. Stage timings (s): {timings.as_dict()}")
+        except Exception as e:
+            import traceback
+            print("---! PYTHON SERVER ERROR (stream) !---")
+            traceback.print_exc()
+            yield f"event: error\ndata: {json.dumps({'message': f'An error occurred: {str(e)}'})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Keep proxies (nginx, Render) from buffering the stream.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/process/batch")
+async def process_document_batch(
+    queries: List[str] = Form(...),
+    file: UploadFile = File(...),
+    max_concurrency: Optional[int] = Form(None)
+):
+    """
+    Accepts one PDF document and many queries about it. The document is indexed once
+    and the answers are streamed back as newline-delimited JSON, one line per query,
+    in the order they finish.
+    """
+    # Accept either repeated `queries` form fields or a single JSON array.
+    if len(queries) == 1 and queries[0].lstrip().startswith("["):
+        try:
+            queries = json.loads(queries[0])
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="'queries' must be repeated form fields or a JSON array of strings.")
+    queries = [query for query in queries if isinstance(query, str) and query.strip()]
+
+    print(f"📄 Received file: {file.filename} ({file.content_type})")
+    print(f"❓ Batch of {len(queries)} queries")
+
+    if file.content_type != "application/pdf":
+        raise HTTPException(status_code=400, detail="Only PDF files are supported.")
+    if not queries:
+        raise HTTPException(status_code=400, detail="At least one query is required.")
+    if max_concurrency is not None and max_concurrency < 1:
+        raise HTTPException(status_code=400, detail="'max_concurrency' must be at least 1.")
+
+    file_bytes = await file.read()
+
+    async def stream_results():
+        try:
+            async for index, result in rag_processor.aprocess_batch(file_bytes, queries, max_concurrency=max_concurrency):
+                yield json.dumps({"index": index, "query": queries[index], "result": result.dict()}) + "\n"
+            print("✅ Batch processing complete")
+        except Exception as e:
+            import traceback
+            print("---! PYTHON SERVER ERROR (batch) !---")
+            traceback.print_exc()
+            yield json.dumps({"error": f"An error occurred: {str(e)}"}) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+@router.post("/jobs", status_code=202)
+async def submit_processing_job(
+    request: Request,
+    query: str = Form(...),
+    file: UploadFile = File(...)
+):
+    """
+    Same inputs as /process, but returns a job id at once instead of holding the
+    request open. Poll GET /jobs/{job_id} for the result. Answers 503 with a
+    Retry-After header when the job queue is full.
+    """
+    print(f"📄 Received file: {file.filename} ({file.content_type})")
+    print(f"❓ Query (job): {query}")
+
+    if file.content_type != "application/pdf":
+        raise HTTPException(status_code=400, detail="Only PDF files are supported.")
+
+    file_bytes = await file.read()
+    try:
+        job = job_queue.submit({"file_bytes": file_bytes, "query": query})
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=f"The service is busy: {str(e)} Try again later.", headers={"Retry-After": "30"})
+
+    print(f"🧾 Job {job.id} queued ({job_queue.queued} waiting, {job_queue.running} running)")
+    return JSONResponse(status_code=202, content=job.as_dict(), headers={"Location": str(request.url_for("get_processing_job", job_id=job.id))})
+
+
+@router.get("/jobs/{job_id}")
+async def get_processing_job(job_id: str, wait: float = Query(0, ge=0)):
+    """
+    Status of a submitted job, with its result once it has succeeded. With `wait`,
+    the request is held open until the job finishes or `wait` seconds pass
+    (capped at JOB_MAX_WAIT_SECONDS). `queue_wait_seconds` and
+    `processing_seconds` tell time spent waiting for a worker from time spent
+    running the pipeline.
+    """
+    job = await job_queue.wait(job_id, min(wait, JOB_MAX_WAIT_SECONDS))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job id.")
+    return job.as_dict()
@@ -0,0 +1,64 @@
+import asyncio
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from shared.chunking import estimate_tokens
+from shared.llm_client import ClientPool
+
+
+class PooledEmbeddings(Embeddings):
+    """
+    Sends every embedding request through a `ClientPool`, so it counts against
+    the provider's rate limits and is retried like LLM calls. Document texts are
+    split into requests of at most `batch_size`, each charged separately.
+    Async batches run concurrently; the pool spaces them out if they would
+    exceed the limits.
+    """
+
+    def __init__(self, base: Embeddings, pool: ClientPool, batch_size: int = 96):
+        self.base = base
+        self.pool = pool
+        self.batch_size = batch_size
+        # CachedEmbeddings keys its store on the wrapped model's name.
+        self.model = getattr(base, "model", None) or getattr(base, "model_name", None) or type(base).__name__
+
+    def _batches(self, texts: List[str]) -> List[List[str]]:
+        return [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+
+    @staticmethod
+    def _tokens(texts: List[str]) -> int:
+        return sum(estimate_tokens(text) for text in texts)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for batch in self._batches(texts):
+            vectors.extend(self.pool.call(lambda client: client.embed_documents(batch), self._tokens(batch)))
+        return vectors
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        async def embed(batch: List[str]) -> List[List[float]]:
+            return await self.pool.acall(lambda client: client.aembed_documents(batch), self._tokens(batch))
+
+        vectors = []
+        for batch_vectors in await asyncio.gather(*(embed(batch) for batch in self._batches(texts))):
+            vectors.extend(batch_vectors)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.pool.call(lambda client: client.embed_query(text), estimate_tokens(text))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.pool.acall(lambda client: client.aembed_query(text), estimate_tokens(text))
+
+    async def aembed_search_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds several search queries. Cohere clients embed a whole batch per
+        request with the "search_query" input type; other models embed them one by one.
+        """
+        if not hasattr(self.base, "aembed"):
+            return list(await asyncio.gather(*(self.aembed_query(text) for text in texts)))
+        vectors = []
+        for batch in self._batches(texts):
+            vectors.extend(await self.pool.acall(lambda client: client.aembed(batch, input_type="search_query"), self._tokens(batch)))
+        return vectors
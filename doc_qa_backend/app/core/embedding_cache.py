@@ -0,0 +1,151 @@
+import os
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "policypal", "embeddings.sqlite3")
+# SQLite's default limit on parameters per statement is 999 on older builds.
+_LOOKUP_BATCH = 500
+
+
+def embedding_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Chunk embeddings on local disk, keyed by the SHA-256 of model name and chunk
+    text. Vectors are stored as raw float16 (or float32) arrays in one SQLite
+    file, bounded by `max_bytes`; least recently used rows are evicted first.
+    WAL mode lets several processes share the file.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, dtype: str = "float16", max_bytes: int = 512 * 1024 * 1024):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                dtype TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        """The stored vectors of whichever `keys` are present."""
+        found: Dict[str, List[float]] = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), _LOOKUP_BATCH):
+                batch = list(keys[start:start + _LOOKUP_BATCH])
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(f"SELECT key, dtype, vector FROM embeddings WHERE key IN ({placeholders})", batch)
+                for key, dtype, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=dtype).astype(np.float32).tolist()
+                self._conn.execute(f"UPDATE embeddings SET last_used = ? WHERE key IN ({placeholders})", [now, *batch])
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        now = time.time()
+        rows = [(key, self.dtype.name, np.asarray(vector, dtype=self.dtype).tobytes(), now) for key, vector in items.items()]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, dtype, vector, last_used) VALUES (?, ?, ?, ?)", rows)
+            self._conn.execute("COMMIT")
+            self._evict_locked()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _evict_locked(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        stale_keys = []
+        for key, size in self._conn.execute("SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used"):
+            stale_keys.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", stale_keys)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embedding model so that document texts it has embedded before are
+    read from an `EmbeddingStore`. Only unseen texts go to the model, in one
+    `embed_documents` call, so re-indexing an amended policy costs roughly in
+    proportion to how much of it changed. Query embeddings are never cached.
+    """
+
+    def __init__(self, base: Embeddings, store: EmbeddingStore, model_name: Optional[str] = None):
+        self.base = base
+        self.store = store
+        self.model_name = model_name or getattr(base, "model", None) or getattr(base, "model_name", None) or type(base).__name__
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, texts: List[str]):
+        keys = [embedding_key(self.model_name, text) for text in texts]
+        found = self.store.get_many(list(dict.fromkeys(keys)))
+        # Each distinct unseen text is embedded once, even if it repeats within the document.
+        missing = list(dict.fromkeys(text for key, text in zip(keys, texts) if key not in found))
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        return keys, found, missing
+
+    def _complete(self, keys: List[str], found: Dict[str, List[float]], missing: List[str], vectors: List[List[float]]):
+        new = {embedding_key(self.model_name, text): vector for text, vector in zip(missing, vectors)}
+        if new:
+            self.store.put_many(new)
+        found.update(new)
+        return [found[key] for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._lookup(texts)
+        vectors = self.base.embed_documents(missing) if missing else []
+        return self._complete(keys, found, missing, vectors)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # The store does blocking I/O, so lookups and writes run off the event loop.
+        keys, found, missing = await asyncio.to_thread(self._lookup, texts)
+        vectors = await self.base.aembed_documents(missing) if missing else []
+        return await asyncio.to_thread(self._complete, keys, found, missing, vectors)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.base.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.base.aembed_query(text)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
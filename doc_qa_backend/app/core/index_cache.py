@@ -0,0 +1,371 @@
+import os
+import json
+import time
+import shutil
+import uuid
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import chromadb
+from langchain_community.vectorstores import Chroma
+
+from shared.singleflight import SingleFlight
+
+COLLECTION_NAME = "policy_document"
+MARKER_FILE = "index.json"
+BUILD_LOCK_STRIPES = 64
+
+
+def document_key(file_bytes: bytes, *parts: str) -> str:
+    """
+    Content address of an uploaded document: the SHA-256 of its raw bytes, plus
+    any settings that change how it is indexed (e.g. the chunking version).
+    """
+    digest = hashlib.sha256(file_bytes)
+    for part in parts:
+        digest.update(b"\x00" + part.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class _CacheEntry:
+    def __init__(self, vector_store: Chroma, created_at: float):
+        self.vector_store = vector_store
+        self.created_at = created_at
+
+
+class _OpenBuild:
+    """A build directory with an open client. `discarded` builds are deleted once released."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.discarded = False
+
+
+class DocumentIndexCache:
+    """
+    Content-addressed cache of per-document Chroma indexes.
+
+    Every index is persisted under `cache_dir/<sha256>/<build>` so it survives
+    restarts, and the most recently used ones are kept open in an in-memory LRU.
+    Entries expire after `ttl_seconds`; the open set is bounded by `max_entries`
+    and the on-disk set by `max_disk_entries`, least recently used first. Evicted
+    collections are closed so their memory is actually released, and removed ones
+    deleted, but only once no request still holds them.
+    """
+
+    def __init__(
+        self,
+        embedding_model,
+        cache_dir: str,
+        max_entries: int = 8,
+        max_disk_entries: int = 64,
+        ttl_seconds: float = 24 * 60 * 60,
+    ):
+        self.embedding_model = embedding_model
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Builds and removals of one key are serialised; async ingestion calls put()
+        # without going through `builds`. A fixed set of striped locks, so their
+        # number stays bounded however many documents pass through.
+        self._build_locks = [threading.RLock() for _ in range(BUILD_LOCK_STRIPES)]
+        # Builds whose client is still open, by path. Guarded by its own lock, since
+        # a client can be released (and this updated) while `_lock` is held.
+        self._open_builds: Dict[str, _OpenBuild] = {}
+        self._open_builds_lock = threading.RLock()
+        # Coalesces concurrent get_or_build misses on one key into a single build.
+        self.builds = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    # --- Public API ---
+
+    def get(self, key: str) -> Optional[Chroma]:
+        """Returns the cached index for `key`, reopening it from disk if needed."""
+        vector_store = self._lookup(key)
+        if vector_store is None:
+            with self._lock:
+                self.misses += 1
+        return vector_store
+
+    def get_or_build(self, key: str, load_chunks: Callable[[], List]) -> Optional[Chroma]:
+        """
+        Returns the index for `key`, building it from `load_chunks()` on a miss.
+        Concurrent misses on the same key wait for a single build and share it.
+        Returns None when `load_chunks` yields nothing, in which case nothing is cached.
+        """
+        vector_store = self.get(key)
+        if vector_store is not None:
+            return vector_store
+
+        def build() -> Optional[Chroma]:
+            # A build that finished just before this one started has already stored it.
+            vector_store = self._lookup(key)
+            if vector_store is not None:
+                return vector_store
+            chunks = load_chunks()
+            if not chunks:
+                return None
+            return self.put(key, chunks)
+
+        return self.builds.do(key, build)[0]
+
+    def put(self, key: str, chunks: List, embeddings: Optional[List[List[float]]] = None) -> Chroma:
+        """
+        Stores `chunks` in a fresh persisted collection under `key`. The chunks are
+        embedded with the cache's embedding model unless `embeddings` are supplied.
+        """
+        if embeddings is None:
+            embeddings = self.embedding_model.embed_documents([chunk.page_content for chunk in chunks])
+
+        # Each build gets its own directory, so a previous one still being read is
+        # never overwritten and can be deleted once its last reader is done.
+        build = uuid.uuid4().hex
+        path = self._build_path(key, build)
+        with self._build_lock(key):
+            self.remove(key)
+
+            client = chromadb.PersistentClient(path=path)
+            collection = client.get_or_create_collection(COLLECTION_NAME, embedding_function=None)
+            batch_size = client.get_max_batch_size()
+            for start in range(0, len(chunks), batch_size):
+                batch = chunks[start:start + batch_size]
+                collection.add(
+                    ids=[str(uuid.uuid4()) for _ in batch],
+                    embeddings=embeddings[start:start + batch_size],
+                    documents=[chunk.page_content for chunk in batch],
+                    metadatas=[chunk.metadata or None for chunk in batch],
+                )
+            vector_store = Chroma(
+                collection_name=COLLECTION_NAME,
+                embedding_function=self.embedding_model,
+                client=client,
+            )
+            self._track(path, vector_store)
+
+            created_at = time.time()
+            with open(self._marker_path(key), "w") as marker:
+                json.dump({"created_at": created_at, "chunks": len(chunks), "build": build}, marker)
+
+        with self._lock:
+            self._entries[key] = _CacheEntry(vector_store, created_at)
+            self._enforce_memory_limit_locked()
+        self._enforce_disk_limit()
+        return vector_store
+
+    def remove(self, key: str) -> None:
+        """
+        Drops `key` from memory and disk. Builds a request is still reading are
+        deleted when it lets go of them.
+        """
+        with self._build_lock(key):
+            with self._lock:
+                self._evict_locked(key)
+            # Without its marker the key reads as absent, so nothing reopens it.
+            try:
+                os.remove(self._marker_path(key))
+            except OSError:
+                pass
+            in_use = False
+            for path in self._build_paths(key):
+                with self._open_builds_lock:
+                    open_build = self._open_builds.get(path)
+                    if open_build is not None:
+                        open_build.discarded = True
+                if open_build is None:
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    in_use = True
+            if not in_use:
+                shutil.rmtree(self._path(key), ignore_errors=True)
+
+    def prune(self) -> None:
+        """Removes every expired entry, in memory and on disk."""
+        for key in self._disk_keys():
+            marker = self._read_marker(key)
+            if marker is None or self._is_expired(marker["created_at"]):
+                self.remove(key)
+
+    def close(self) -> None:
+        """Releases every open collection. Persisted indexes stay on disk."""
+        with self._lock:
+            for key in list(self._entries):
+                self._evict_locked(key)
+
+    def clear(self) -> None:
+        """Releases every open collection and deletes the whole on-disk cache."""
+        self.close()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "open_entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    # --- Internals ---
+
+    def _lookup(self, key: str) -> Optional[Chroma]:
+        with self._lock:
+            entry = self._entries.get(key)
+            vector_store = None
+            if entry is not None:
+                if self._is_expired(entry.created_at):
+                    self._evict_locked(key)
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    vector_store = entry.vector_store
+        if vector_store is not None:
+            # The disk limit evicts by the marker's mtime, so hot entries must refresh it.
+            self._touch_marker(key)
+            return vector_store
+
+        marker = self._read_marker(key)
+        if marker is None:
+            return None
+        if self._is_expired(marker["created_at"]):
+            self.remove(key)
+            return None
+
+        vector_store = self._open(key, marker["build"])
+        self._touch_marker(key)
+        with self._lock:
+            if key in self._entries:
+                # Another thread reopened it first; keep a single open client.
+                vector_store = self._entries[key].vector_store
+            else:
+                self._entries[key] = _CacheEntry(vector_store, marker["created_at"])
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self._enforce_memory_limit_locked()
+        return vector_store
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def _build_path(self, key: str, build: str) -> str:
+        return os.path.join(self._path(key), build)
+
+    def _build_paths(self, key: str) -> List[str]:
+        try:
+            names = os.listdir(self._path(key))
+        except OSError:
+            return []
+        return [self._build_path(key, name) for name in names if os.path.isdir(self._build_path(key, name))]
+
+    def _marker_path(self, key: str) -> str:
+        return os.path.join(self._path(key), MARKER_FILE)
+
+    def _is_expired(self, created_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - created_at > self.ttl_seconds
+
+    def _build_lock(self, key: str) -> threading.RLock:
+        return self._build_locks[hash(key) % len(self._build_locks)]
+
+    def _open(self, key: str, build: str) -> Chroma:
+        path = self._build_path(key, build)
+        vector_store = Chroma(
+            collection_name=COLLECTION_NAME,
+            embedding_function=self.embedding_model,
+            client=chromadb.PersistentClient(path=path),
+        )
+        self._track(path, vector_store)
+        return vector_store
+
+    def _track(self, path: str, vector_store: Chroma) -> None:
+        """
+        Closes the client behind `vector_store` once the last reference to it is
+        dropped, so an evicted index's memory is freed while a request that got it
+        before the eviction keeps a working index until it is done with it.
+        """
+        open_build = _OpenBuild(path)
+        with self._open_builds_lock:
+            self._open_builds[path] = open_build
+        weakref.finalize(vector_store, self._release, open_build, getattr(vector_store, "_client", None))
+
+    def _release(self, open_build: _OpenBuild, client) -> None:
+        if client is not None:
+            _close_client(client)
+        with self._open_builds_lock:
+            if self._open_builds.get(open_build.path) is open_build:
+                del self._open_builds[open_build.path]
+        if open_build.discarded:
+            shutil.rmtree(open_build.path, ignore_errors=True)
+            try:
+                os.rmdir(os.path.dirname(open_build.path))
+            except OSError:
+                pass
+
+    def _read_marker(self, key: str) -> Optional[dict]:
+        # The marker is written last, so a directory without one is a build
+        # that never finished and is treated as absent. So is one from before
+        # builds had their own directories.
+        try:
+            with open(self._marker_path(key)) as marker:
+                data = json.load(marker)
+            return {"created_at": float(data["created_at"]), "build": str(data["build"])}
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _touch_marker(self, key: str) -> None:
+        try:
+            os.utime(self._marker_path(key))
+        except OSError:
+            pass
+
+    def _disk_keys(self) -> List[str]:
+        try:
+            return [name for name in os.listdir(self.cache_dir) if os.path.isdir(self._path(name))]
+        except OSError:
+            return []
+
+    def _evict_locked(self, key: str) -> None:
+        if self._entries.pop(key, None) is not None:
+            self.evictions += 1
+
+    def _enforce_memory_limit_locked(self) -> None:
+        while len(self._entries) > self.max_entries:
+            oldest_key = next(iter(self._entries))
+            self._evict_locked(oldest_key)
+
+    def _enforce_disk_limit(self) -> None:
+        keys = self._disk_keys()
+        if len(keys) <= self.max_disk_entries:
+            return
+
+        def last_used(key: str) -> float:
+            try:
+                return os.path.getmtime(self._marker_path(key))
+            except OSError:
+                return 0.0
+
+        # Indexes open in memory are in use, so only the others are candidates.
+        with self._lock:
+            candidates = [key for key in keys if key not in self._entries]
+        candidates.sort(key=last_used)
+        for key in candidates[: len(keys) - self.max_disk_entries]:
+            self.remove(key)
+
+
+def _close_client(client) -> None:
+    close = getattr(client, "close", None)
+    try:
+        if close is not None:
+            close()
+    except Exception as e:
+        print(f"!!! Could not release Chroma client: {e}")
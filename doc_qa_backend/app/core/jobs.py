@@ -0,0 +1,177 @@
+import os
+import time
+import uuid
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .timing import StageTimings
+from shared import metrics
+
+# --- Job Queue Settings ---
+# JOB_WORKERS pipelines run at once; at most JOB_QUEUE_MAX more wait for a worker
+# before new submissions are rejected. Finished jobs are kept for JOB_RESULT_TTL_SECONDS.
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_QUEUE_MAX = int(os.environ.get("JOB_QUEUE_MAX", "32"))
+JOB_RESULT_TTL_SECONDS = float(os.environ.get("JOB_RESULT_TTL_SECONDS", "3600"))
+JOB_MAX_RETAINED = int(os.environ.get("JOB_MAX_RETAINED", "1000"))
+# Upper bound on how long one status request may be held open (long polling).
+JOB_MAX_WAIT_SECONDS = float(os.environ.get("JOB_MAX_WAIT_SECONDS", "30"))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+
+class QueueFullError(Exception):
+    """Raised by `JobQueue.submit` when JOB_QUEUE_MAX jobs are already waiting."""
+
+
+class Job:
+    def __init__(self, payload: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.payload: Optional[Dict[str, Any]] = payload
+        self.status = QUEUED
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.timings = StageTimings()
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.done = asyncio.Event()
+
+    @property
+    def queue_wait_seconds(self) -> float:
+        return (self.started_at or time.time()) - self.submitted_at
+
+    @property
+    def processing_seconds(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+    def as_dict(self) -> dict:
+        processing = self.processing_seconds
+        job = {
+            "job_id": self.id,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "queue_wait_seconds": round(self.queue_wait_seconds, 4),
+            "processing_seconds": round(processing, 4) if processing is not None else None,
+        }
+        if self.status == SUCCEEDED:
+            job["result"] = self.result
+            job["stage_timings"] = {name: round(seconds, 4) for name, seconds in self.timings.stages.items()}
+        if self.status == FAILED:
+            job["error"] = self.error
+        return job
+
+
+class JobQueue:
+    """
+    Bounded pool of asyncio workers for long-running jobs. `submit` returns at
+    once with a queued `Job`; `handler(payload, timings)` runs it on one of
+    `workers` workers. Time spent waiting for a worker is tracked separately
+    from processing time. Workers start with the first submission, so the
+    queue binds to the event loop the app is served on.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Dict[str, Any], StageTimings], Awaitable[dict]],
+        workers: int = JOB_WORKERS,
+        max_queued: int = JOB_QUEUE_MAX,
+        result_ttl_seconds: float = JOB_RESULT_TTL_SECONDS,
+        max_retained: int = JOB_MAX_RETAINED,
+        metrics_service: str = "doc_qa",
+    ):
+        self.handler = handler
+        self.workers = workers
+        self.max_queued = max_queued
+        self.result_ttl_seconds = result_ttl_seconds
+        self.max_retained = max_retained
+        self.metrics_service = metrics_service
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.running = 0
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def submit(self, payload: Dict[str, Any]) -> Job:
+        """Queues a job, or raises QueueFullError if `max_queued` jobs are already waiting."""
+        self._start()
+        self._prune()
+        job = Job(payload)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"{self.max_queued} jobs are already waiting.")
+        self._jobs[job.id] = job
+        self._publish_depth()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Job]:
+        """Returns the job once it has finished, or as it is after `timeout` seconds (long polling)."""
+        job = self.get(job_id)
+        if job is not None and timeout > 0:
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # --- Internals ---
+
+    def _start(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queued)
+            self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job.status = RUNNING
+            job.started_at = time.time()
+            self.running += 1
+            self._publish_depth()
+            metrics.observe_stage(self.metrics_service, "queue_wait", job.queue_wait_seconds)
+            try:
+                job.result = await self.handler(job.payload, job.timings)
+                job.status = SUCCEEDED
+            except Exception as e:
+                import traceback
+                print(f"---! JOB {job.id} FAILED !---")
+                traceback.print_exc()
+                job.error = f"An error occurred: {str(e)}"
+                job.status = FAILED
+            finally:
+                # The uploaded PDF is not needed once the job has run.
+                job.payload = None
+                job.finished_at = time.time()
+                self.running -= 1
+                self._publish_depth()
+                job.done.set()
+                self._queue.task_done()
+
+    def _prune(self) -> None:
+        """Forgets finished jobs past their TTL, and the oldest finished ones beyond `max_retained`."""
+        now = time.time()
+        finished = [job for job in self._jobs.values() if job.finished_at is not None]
+        excess = len(self._jobs) - self.max_retained
+        for job in finished:
+            if now - job.finished_at > self.result_ttl_seconds or excess > 0:
+                del self._jobs[job.id]
+                excess -= 1
+
+    def _publish_depth(self) -> None:
+        metrics.set_job_counts(self.metrics_service, queued=self.queued, running=self.running)
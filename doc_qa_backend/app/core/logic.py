@@ -1,20 +1,93 @@
 import os
 import json
-import tempfile
 import re
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from io import BytesIO
 from langchain_groq import ChatGroq
 from langchain_cohere import CohereEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from typing import Optional, List
-from pydantic.v1 import BaseModel, Field
+from langchain_core.documents import Document
+from typing import AsyncIterator, Callable, Optional, List, Tuple, Union
+from pydantic.v1 import BaseModel, Field, ValidationError
 from dotenv import load_dotenv
+from .index_cache import DocumentIndexCache, document_key
+from .embedding_cache import CachedEmbeddings, EmbeddingStore, DEFAULT_CACHE_PATH as DEFAULT_EMBEDDING_CACHE_PATH
+from .timing import StageTimings, add_stage_observer
+from .quotes import select_quotes, split_sentences
+from .clients import PooledEmbeddings
+from shared import metrics
+from shared.llm_cache import LLMResponseCache, normalize_prompt
+from shared.singleflight import AsyncSingleFlight, SingleFlight
+from shared.llm_client import ClientPool
+from shared.pdf_ingest import iter_pages
+from shared.chunking import estimate_tokens, iter_chunks
 
 # This line loads your .env file for local testing and deployment
 load_dotenv()
 
+# --- Document Index Cache Settings ---
+INDEX_CACHE_DIR = os.environ.get(
+    "INDEX_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), ".index_cache")
+)
+INDEX_CACHE_MAX_ENTRIES = int(os.environ.get("INDEX_CACHE_MAX_ENTRIES", "8"))
+INDEX_CACHE_MAX_DISK_ENTRIES = int(os.environ.get("INDEX_CACHE_MAX_DISK_ENTRIES", "64"))
+INDEX_CACHE_TTL_SECONDS = float(os.environ.get("INDEX_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+
+# --- Chunk Embedding Cache ---
+# Chunk vectors are reused across documents (e.g. a new version of a policy wording),
+# so only chunks whose text has never been embedded go to the embedding API.
+EMBEDDING_CACHE_ENABLED = os.environ.get("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", DEFAULT_EMBEDDING_CACHE_PATH)
+EMBEDDING_CACHE_DTYPE = os.environ.get("EMBEDDING_CACHE_DTYPE", "float16")
+EMBEDDING_CACHE_MAX_BYTES = int(os.environ.get("EMBEDDING_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# --- Chunking ---
+# Sizes are in embedding tokens (estimated; Cohere's tokenizer is not available locally).
+# The settings are part of the index cache key, so changing them re-indexes documents.
+CHUNK_MAX_TOKENS = int(os.environ.get("CHUNK_MAX_TOKENS", "384"))
+CHUNK_OVERLAP_TOKENS = int(os.environ.get("CHUNK_OVERLAP_TOKENS", "40"))
+CHUNKING_VERSION = f"tokens-{CHUNK_MAX_TOKENS}-{CHUNK_OVERLAP_TOKENS}"
+
+# Bounded pool for the blocking parts of the async pipeline (PDF parsing, splitting, Chroma I/O)
+RAG_EXECUTOR_WORKERS = int(os.environ.get("RAG_EXECUTOR_WORKERS", "4"))
+
+# --- Pipeline Scheduling ---
+# OVERLAP: run query expansion while the document is being indexed.
+# FUSED: produce the decision and the narrative with a single structured LLM call.
+RAG_OVERLAP_STAGES = os.environ.get("RAG_OVERLAP_STAGES", "true").lower() == "true"
+RAG_FUSED_DECISION = os.environ.get("RAG_FUSED_DECISION", "false").lower() == "true"
+
+# --- Quote Extraction ---
+# "llm" asks the model to copy out the relevant sentences. "local" ranks the sentences of
+# the retrieved chunks by embedding similarity and BM25 overlap with the query instead,
+# which saves an LLM round-trip and cannot fail to parse.
+QUOTE_EXTRACTION_MODE = os.environ.get("QUOTE_EXTRACTION_MODE", "llm").lower()
+QUOTE_MAX_SENTENCES = int(os.environ.get("QUOTE_MAX_SENTENCES", "5"))
+QUOTE_LEXICAL_WEIGHT = float(os.environ.get("QUOTE_LEXICAL_WEIGHT", "0.3"))
+
+# --- Model Clients ---
+# Every Groq and Cohere call goes through a shared.llm_client.ClientPool, which applies
+# GROQ_/COHERE_REQUESTS_PER_MINUTE and _TOKENS_PER_MINUTE, retries and optional hedging.
+# GROQ_FALLBACK_MODELS (comma-separated) are tried in order when GROQ_MODEL stays unavailable.
+GROQ_MODEL = os.environ.get("GROQ_MODEL", "llama3-8b-8192")
+GROQ_FALLBACK_MODELS = [name.strip() for name in os.environ.get("GROQ_FALLBACK_MODELS", "").split(",") if name.strip()]
+COHERE_EMBED_MODEL = "embed-english-light-v3.0"
+# Completion tokens charged against the tokens-per-minute limit before each LLM call.
+LLM_EXPECTED_COMPLETION_TOKENS = int(os.environ.get("LLM_EXPECTED_COMPLETION_TOKENS", "300"))
+
+# --- Batch Queries ---
+BATCH_QUERY_CONCURRENCY = int(os.environ.get("BATCH_QUERY_CONCURRENCY", "8"))
+COHERE_EMBED_BATCH_SIZE = 96  # Cohere's per-request limit on texts
+
+# --- Metrics ---
+# Every pipeline stage timed with StageTimings also lands in the Prometheus stage histogram.
+METRICS_SERVICE = "doc_qa"
+add_stage_observer(metrics.stage_observer(METRICS_SERVICE))
+
 # --- Data Models (Unchanged) ---
 class FinalResponse(BaseModel):
     decision: str
@@ -29,6 +102,23 @@ class DecisionResponse(BaseModel):
     decision: Optional[str] = "Could Not Determine"
     amount_covered: Optional[str] = "Not Specified" 
 
+class FusedDecisionResponse(DecisionResponse):
+    narrative_response: Optional[str] = ""
+
+def record_llm_usage(stage: str, prompt: str, completion: str, usage: Optional[dict] = None) -> None:
+    """Counts the tokens of one LLM call, estimating them when the provider reports no usage."""
+    usage = usage or {}
+    metrics.record_llm_call(
+        METRICS_SERVICE,
+        stage,
+        usage.get("input_tokens") or estimate_tokens(prompt),
+        usage.get("output_tokens") or estimate_tokens(completion),
+    )
+
+def _llm_request_tokens(prompt: str) -> int:
+    """What one LLM call is charged against the tokens-per-minute limit before it is sent."""
+    return estimate_tokens(prompt) + LLM_EXPECTED_COMPLETION_TOKENS
+
 # --- HELPER FUNCTION TO CLEAN LLM OUTPUT (Unchanged) ---
 def extract_json_from_string(text: str) -> Optional[str]:
     """
@@ -40,39 +130,61 @@ def extract_json_from_string(text: str) -> Optional[str]:
         return match.group(0)
     return None
 
-class RAGProcessor:
-    def __init__(self):
-        load_dotenv()
-        self.llm = ChatGroq(
-            temperature=0,
-            model_name="llama3-8b-8192",
-            groq_api_key=os.environ.get("GROQ_API_KEY")
-        )
-        self.embedding_model = CohereEmbeddings(
-            cohere_api_key=os.environ.get("COHERE_API_KEY"),
-            model="embed-english-light-v3.0" 
-        )
-        print(">> Fully Cloud RAG Processor Ready.")
-    
-    def process_document_and_query(self, file_bytes: bytes, query: str) -> FinalResponse:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-            temp_file.write(file_bytes)
-            temp_file_path = temp_file.name
-
-        try:
-            loader = PyPDFLoader(temp_file_path)
-            documents = loader.load()
-            
-            if not documents:
-                return FinalResponse(decision="Error", amount_covered="N/A", justification=[], narrative_response="Could not read the PDF.")
-
-            text_splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=150)
-            chunks = text_splitter.split_documents(documents)
-            vector_store = Chroma.from_documents(chunks, self.embedding_model)
-            retriever = vector_store.as_retriever(search_kwargs={"k": 5})
-
-            # --- ENHANCED PROMPT #1: Query Expansion ---
-            expansion_prompt_text = f"""You are an expert insurance policy analyst with 15+ years of experience. Your task is to transform a user's simple question into a comprehensive search query that will effectively retrieve relevant policy clauses from a vector database.
+def parse_quotes(quotes_response_str: str) -> Optional[List[str]]:
+    """Parses the extraction stage output. Returns None if it holds no valid JSON object."""
+    cleaned_quotes_json = extract_json_from_string(quotes_response_str)
+    if not cleaned_quotes_json:
+        return None
+    try:
+        return ExtractedQuotes.parse_raw(cleaned_quotes_json).quotes
+    except (ValidationError, json.JSONDecodeError):
+        return None
+
+def parse_decision(decision_response_str: str) -> Optional[DecisionResponse]:
+    """Parses the decision stage output. Returns None if it holds no valid JSON object."""
+    cleaned_decision_json = extract_json_from_string(decision_response_str)
+    if not cleaned_decision_json:
+        return None
+    try:
+        return DecisionResponse.parse_raw(cleaned_decision_json)
+    except (ValidationError, json.JSONDecodeError):
+        return None
+
+def parse_fused_decision(fused_response_str: str) -> Optional[FusedDecisionResponse]:
+    """Parses the fused decision + narrative output. Returns None if it holds no valid JSON object."""
+    cleaned_fused_json = extract_json_from_string(fused_response_str)
+    if not cleaned_fused_json:
+        return None
+    try:
+        # strict=False tolerates raw line breaks inside the narrative string,
+        # which models often emit despite being asked to escape them.
+        return FusedDecisionResponse.parse_obj(json.loads(cleaned_fused_json, strict=False))
+    except ValueError:
+        return None
+
+def _parses(parse: Callable[[str], Optional[object]]) -> Callable[[str], bool]:
+    """Response cache check: only replies `parse` can read are cached."""
+    return lambda response: parse(response) is not None
+
+# --- EARLY-EXIT RESPONSES ---
+def _unreadable_pdf_response() -> FinalResponse:
+    return FinalResponse(decision="Error", amount_covered="N/A", justification=[], narrative_response="Could not read the PDF.")
+
+def _no_context_response(query: str) -> FinalResponse:
+    return FinalResponse(decision="Could Not Determine", amount_covered="Not Specified", justification=[], narrative_response=f"Could not find information regarding '{query}'.")
+
+def _unparsable_quotes_response() -> FinalResponse:
+    return FinalResponse(decision="Error", amount_covered="N/A", justification=[], narrative_response="Could not parse justification quotes from AI response.")
+
+def _no_clauses_response(query: str) -> FinalResponse:
+    return FinalResponse(decision="Could Not Determine", amount_covered="Not Specified", justification=[], narrative_response=f"Found general information but no specific clauses for '{query}'.")
+
+def _unparsable_decision_response() -> FinalResponse:
+    return FinalResponse(decision="Error", amount_covered="N/A", justification=[], narrative_response="Could not parse final decision from AI response.")
+
+# --- ENHANCED PROMPT #1: Query Expansion ---
+def build_expansion_prompt(query: str) -> str:
+    return f"""You are an expert insurance policy analyst with 15+ years of experience. Your task is to transform a user's simple question into a comprehensive search query that will effectively retrieve relevant policy clauses from a vector database.
 
 ANALYSIS APPROACH:
 - Consider coverage scope, exclusions, limits, conditions, and eligibility requirements
@@ -89,17 +201,10 @@ Create an enhanced search query that includes:
 4. Both positive coverage terms and exclusionary language
 
 ENHANCED SEARCH QUERY:"""
-            
-            expanded_search_query = self.llm.invoke(expansion_prompt_text).content
-            
-            retrieved_docs = retriever.invoke(expanded_search_query)
-            context = "\n\n---\n\n".join([doc.page_content for doc in retrieved_docs])
-            
-            if not retrieved_docs or not context.strip():
-                return FinalResponse(decision="Could Not Determine", amount_covered="Not Specified", justification=[], narrative_response=f"Could not find information regarding '{query}'.")
-            
-            # --- ENHANCED PROMPT #2: Quote Extraction ---
-            extraction_prompt_text = f'''You are a legal document analyst specializing in insurance policy interpretation. Your expertise is in identifying the most relevant and actionable policy language.
+
+# --- ENHANCED PROMPT #2: Quote Extraction ---
+def build_extraction_prompt(context: str, query: str) -> str:
+    return f'''You are a legal document analyst specializing in insurance policy interpretation. Your expertise is in identifying the most relevant and actionable policy language.
 
 TASK: Extract sentences from the provided context that directly address the user's query. Focus on:
 - Specific coverage statements (what IS covered)
@@ -124,20 +229,10 @@ USER'S QUERY: {query}
 Extract the most relevant sentences that a claims adjudicator would need to make a coverage determination. Return ONLY a valid JSON object with the key "quotes" containing an array of relevant sentence quotes.
 
 JSON Response:'''
-            quotes_response_str = self.llm.invoke(extraction_prompt_text).content
-            
-            cleaned_quotes_json = extract_json_from_string(quotes_response_str)
-            if not cleaned_quotes_json:
-                 return FinalResponse(decision="Error", amount_covered="N/A", justification=[], narrative_response="Could not parse justification quotes from AI response.")
-            extracted_justifications = ExtractedQuotes.parse_raw(cleaned_quotes_json).quotes
-            
-            if not extracted_justifications:
-                return FinalResponse(decision="Could Not Determine", amount_covered="Not Specified", justification=[], narrative_response=f"Found general information but no specific clauses for '{query}'.")
-
-            quotes_for_decision = "\n".join(extracted_justifications)
-            
-            # --- ENHANCED PROMPT #3: Decision Making ---
-            decision_prompt_text = f'''You are a senior insurance claims adjudicator with 20+ years of experience in policy interpretation and claims decisions. You must make a coverage determination based strictly on the provided policy excerpts.
+
+# --- ENHANCED PROMPT #3: Decision Making ---
+def build_decision_prompt(quotes_for_decision: str, query: str) -> str:
+    return f'''You are a senior insurance claims adjudicator with 20+ years of experience in policy interpretation and claims decisions. You must make a coverage determination based strictly on the provided policy excerpts.
 
 DECISION FRAMEWORK:
 1. COVERAGE ANALYSIS: Is there explicit language covering this situation?
@@ -166,17 +261,10 @@ Respond with a valid JSON object containing:
 - "amount_covered": Specific amount/limit from policy, or "Not Specified" if none mentioned
 
 JSON Response:'''
-            decision_response_str = self.llm.invoke(decision_prompt_text).content
-
-            cleaned_decision_json = extract_json_from_string(decision_response_str)
-            if not cleaned_decision_json:
-                return FinalResponse(decision="Error", amount_covered="N/A", justification=[], narrative_response="Could not parse final decision from AI response.")
-            json_decision = DecisionResponse.parse_raw(cleaned_decision_json)
 
-            final_data_for_narrative = {"decision": json_decision.decision, "amount_covered": json_decision.amount_covered, "justification_quotes": extracted_justifications}
-            
-            # --- ENHANCED PROMPT #4: Narrative Generation ---
-            narrative_prompt_text = f'''You are "PolicyPal," a trusted AI insurance advisor known for clear, empathetic, and helpful communication. Your role is to translate complex policy decisions into plain English that customers can easily understand and act upon.
+# --- ENHANCED PROMPT #4: Narrative Generation ---
+def build_narrative_prompt(final_data_for_narrative: dict, query: str) -> str:
+    return f'''You are "PolicyPal," a trusted AI insurance advisor known for clear, empathetic, and helpful communication. Your role is to translate complex policy decisions into plain English that customers can easily understand and act upon.
 
 COMMUNICATION STYLE:
 - Professional yet approachable and empathetic
@@ -207,16 +295,647 @@ USER'S ORIGINAL QUESTION: "{query}"
 As PolicyPal, write a comprehensive yet accessible response that helps the user understand their coverage situation. If the decision is uncertain, acknowledge this honestly and guide them on next steps. Remember: use only plain text formatting.
 
 Your response:'''
-            narrative_text = self.llm.invoke(narrative_prompt_text).content
-            
-            return FinalResponse(
-                decision=json_decision.decision,
-                amount_covered=str(json_decision.amount_covered),
-                justification=extracted_justifications,
-                narrative_response=narrative_text.strip()
+
+# --- ENHANCED PROMPT #3+4: Fused Decision and Narrative ---
+def build_fused_decision_prompt(quotes_for_decision: str, query: str) -> str:
+    return f'''You are a senior insurance claims adjudicator with 20+ years of experience in policy interpretation and claims decisions, writing as "PolicyPal," a trusted AI insurance advisor known for clear, empathetic, and helpful communication. You must make a coverage determination based strictly on the provided policy excerpts, then explain it to the customer in plain English.
+
+DECISION FRAMEWORK:
+1. COVERAGE ANALYSIS: Is there explicit language covering this situation?
+2. EXCLUSION ANALYSIS: Are there any exclusions that would deny coverage?
+3. CONDITIONS ANALYSIS: Are all policy conditions and requirements met?
+4. LIMITS ANALYSIS: What monetary amounts, percentages, or limits apply?
+
+DECISION CATEGORIES:
+- "Approved": Clear, unambiguous coverage with no applicable exclusions
+- "Rejected": Explicit exclusion exists or coverage is clearly not provided
+- "Partial Approval": Limited coverage applies or conditions must be met
+- "Further Information Required": Policy provisions exist but additional details needed
+- "Could Not Determine": Policy language is ambiguous or insufficient
+
+NARRATIVE STYLE:
+- Professional yet approachable and empathetic
+- Use "your policy" language to make it personal
+- START with a clear, direct answer, EXPLAIN the reasoning using key policy phrases, CLARIFY conditions or limits, END with helpful next steps
+- Plain text only - no bold, italic, or markdown formatting
+- If the decision is uncertain, acknowledge this honestly and guide them on next steps
+
+POLICY EXCERPTS:
+---
+{quotes_for_decision}
+---
+
+USER'S COVERAGE QUESTION: {query}
+
+Based solely on these policy excerpts, make your determination. If specific dollar amounts, percentages, or limits are mentioned, include them exactly as stated.
+
+Respond with a valid JSON object containing:
+- "decision": Your coverage determination (use exact categories above)
+- "amount_covered": Specific amount/limit from policy, or "Not Specified" if none mentioned
+- "narrative_response": Your PolicyPal explanation for the customer, as a single JSON string (escape line breaks as \\n)
+
+JSON Response:'''
+
+class RAGProcessor:
+    def __init__(self, llm=None, embedding_model=None, index_cache_dir: str = INDEX_CACHE_DIR):
+        """
+        `llm` and `embedding_model` default to the Groq and Cohere clients, which are
+        only created on first use. Pass other LangChain-compatible models (e.g. local
+        stand-ins for offline benchmarks) to replace them.
+        """
+        load_dotenv()
+        self._llm = llm
+        self._groq_clients = {}
+        self._embedding_client = embedding_model
+        self._embedding_model = None
+        self._document_embeddings = None
+        self._index_cache = None
+        self._index_cache_dir = index_cache_dir
+        self._clients_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=RAG_EXECUTOR_WORKERS, thread_name_prefix="rag")
+        self.llm_cache = LLMResponseCache.from_env()
+        self.overlap_stages = RAG_OVERLAP_STAGES
+        self.fused_decision = RAG_FUSED_DECISION
+        self.quote_extraction = QUOTE_EXTRACTION_MODE
+        # Optional cap on concurrent LLM calls: any semaphore with acquire()/release(),
+        # e.g. a multiprocessing.Manager().Semaphore shared by several worker processes.
+        self.llm_semaphore = None
+        # Concurrent duplicates share the first execution: whole answers are keyed on
+        # (document, normalized query, pipeline mode), async ingestion on the document.
+        self.query_flights = AsyncSingleFlight()
+        self.sync_query_flights = SingleFlight()
+        self.ingestion_flights = AsyncSingleFlight()
+        # Fallback models only apply to the default Groq client, not to a model passed in.
+        fallbacks = GROQ_FALLBACK_MODELS if llm is None else []
+        self.llm_pool = ClientPool.from_env(
+            "groq",
+            [(getattr(llm, "model_name", GROQ_MODEL) if llm is not None else GROQ_MODEL, lambda: self.llm)]
+            + [(name, lambda name=name: self._groq_client(name)) for name in fallbacks],
+        )
+        # No fallback for embeddings: vectors from another model would not match the index.
+        self.embedding_pool = ClientPool.from_env(
+            "cohere", [(getattr(embedding_model, "model", COHERE_EMBED_MODEL) or COHERE_EMBED_MODEL, lambda: self.embedding_client)]
+        )
+        metrics.register_client_pool(METRICS_SERVICE, "groq", self.llm_pool.stats)
+        metrics.register_client_pool(METRICS_SERVICE, "cohere", self.embedding_pool.stats)
+        metrics.register_singleflight(METRICS_SERVICE, "query", self.query_flights.stats)
+        metrics.register_singleflight(METRICS_SERVICE, "query_sync", self.sync_query_flights.stats)
+        metrics.register_singleflight(METRICS_SERVICE, "ingestion", self.ingestion_flights.stats)
+        metrics.register_singleflight(
+            METRICS_SERVICE, "ingestion_sync", lambda: self._index_cache.builds.stats() if self._index_cache is not None else None
+        )
+        metrics.register_cache(METRICS_SERVICE, "llm_response", self.llm_cache.stats)
+        metrics.register_cache(METRICS_SERVICE, "document_index", lambda: self._index_cache and self._index_cache.stats())
+        metrics.register_cache(
+            METRICS_SERVICE, "chunk_embedding",
+            lambda: self._document_embeddings.stats() if isinstance(self._document_embeddings, CachedEmbeddings) else None,
+        )
+        print(">> Fully Cloud RAG Processor Ready.")
+
+    def _groq_client(self, model_name: str):
+        """One long-lived client per Groq model. Retries are left to `llm_pool`."""
+        with self._clients_lock:
+            if model_name not in self._groq_clients:
+                self._groq_clients[model_name] = ChatGroq(
+                    temperature=0,
+                    model_name=model_name,
+                    groq_api_key=os.environ.get("GROQ_API_KEY"),
+                    groq_api_base=os.environ.get("GROQ_API_BASE"),
+                    max_retries=0,
+                )
+            return self._groq_clients[model_name]
+
+    @property
+    def llm(self):
+        """The primary LLM client. Calls should go through `llm_pool` instead of using it directly."""
+        if self._llm is None:
+            self._llm = self._groq_client(GROQ_MODEL)
+        return self._llm
+
+    @property
+    def embedding_client(self):
+        if self._embedding_client is None:
+            with self._clients_lock:
+                if self._embedding_client is None:
+                    self._embedding_client = CohereEmbeddings(
+                        cohere_api_key=os.environ.get("COHERE_API_KEY"),
+                        model=COHERE_EMBED_MODEL,
+                        max_retries=0,
+                        **({"base_url": os.environ["COHERE_API_BASE"]} if os.environ.get("COHERE_API_BASE") else {}),
+                    )
+        return self._embedding_client
+
+    @property
+    def embedding_model(self) -> PooledEmbeddings:
+        """The embedding client behind `embedding_pool`."""
+        if self._embedding_model is None:
+            embedding_client = self.embedding_client
+            with self._clients_lock:
+                if self._embedding_model is None:
+                    self._embedding_model = PooledEmbeddings(embedding_client, self.embedding_pool, COHERE_EMBED_BATCH_SIZE)
+        return self._embedding_model
+
+    @property
+    def document_embeddings(self):
+        """The embedding model for document chunks, behind the chunk embedding cache when it is enabled."""
+        if self._document_embeddings is None:
+            embedding_model = self.embedding_model
+            with self._clients_lock:
+                if self._document_embeddings is None:
+                    self._document_embeddings = CachedEmbeddings(
+                        embedding_model,
+                        EmbeddingStore(EMBEDDING_CACHE_PATH, dtype=EMBEDDING_CACHE_DTYPE, max_bytes=EMBEDDING_CACHE_MAX_BYTES),
+                    ) if EMBEDDING_CACHE_ENABLED else embedding_model
+        return self._document_embeddings
+
+    @property
+    def index_cache(self) -> DocumentIndexCache:
+        if self._index_cache is None:
+            embedding_model = self.document_embeddings
+            with self._clients_lock:
+                if self._index_cache is None:
+                    self._index_cache = DocumentIndexCache(
+                        embedding_model,
+                        cache_dir=self._index_cache_dir,
+                        max_entries=INDEX_CACHE_MAX_ENTRIES,
+                        max_disk_entries=INDEX_CACHE_MAX_DISK_ENTRIES,
+                        ttl_seconds=INDEX_CACHE_TTL_SECONDS,
+                    )
+        return self._index_cache
+
+    def _load_chunks(self, file_bytes: bytes) -> list:
+        """Parses the PDF bytes in memory and splits them into clause-aligned, page-tagged chunks."""
+        chunks = [
+            Document(page_content=chunk.text, metadata=chunk.metadata)
+            for chunk in iter_chunks(iter_pages(file_bytes), CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS)
+        ]
+        metrics.record_document(METRICS_SERVICE, len(chunks))
+        return chunks
+
+    def get_vector_store(self, file_bytes: bytes):
+        """
+        Returns the Chroma index for this document, parsing and embedding it only
+        the first time these exact bytes are seen. Returns None if the PDF is unreadable.
+        """
+        def load_chunks() -> list:
+            # The index cache embeds whatever chunks it is given.
+            chunks = self._load_chunks(file_bytes)
+            metrics.record_embeddings(METRICS_SERVICE, "document", len(chunks))
+            return chunks
+
+        return self.index_cache.get_or_build(document_key(file_bytes, CHUNKING_VERSION), load_chunks)
+
+    async def aget_vector_store(self, file_bytes: bytes, timings: Optional[StageTimings] = None):
+        """
+        Async counterpart of `get_vector_store`. Parsing, splitting and Chroma I/O run
+        on the bounded executor; chunk embeddings go through the async embedding client.
+        On a cache miss, `timings` gets the "chunking", "embedding" and "storing" stages.
+        Concurrent misses on the same document share one build.
+        """
+        timings = timings or StageTimings()
+        loop = asyncio.get_running_loop()
+        key = document_key(file_bytes, CHUNKING_VERSION)
+
+        vector_store = await loop.run_in_executor(self.executor, self.index_cache.get, key)
+        if vector_store is not None:
+            return vector_store
+        return (await self.ingestion_flights.do(key, lambda: self._abuild_vector_store(key, file_bytes, timings)))[0]
+
+    async def _abuild_vector_store(self, key: str, file_bytes: bytes, timings: StageTimings):
+        loop = asyncio.get_running_loop()
+        # A build that finished just before this one started has already stored it.
+        vector_store = await loop.run_in_executor(self.executor, self.index_cache.get, key)
+        if vector_store is not None:
+            return vector_store
+
+        chunks = await timings.run("chunking", loop.run_in_executor(self.executor, self._load_chunks, file_bytes))
+        if not chunks:
+            return None
+        embeddings = await timings.run("embedding", self.document_embeddings.aembed_documents([chunk.page_content for chunk in chunks]))
+        metrics.record_embeddings(METRICS_SERVICE, "document", len(chunks))
+        return await timings.run("storing", loop.run_in_executor(self.executor, self.index_cache.put, key, chunks, embeddings))
+
+    def _retrieve(self, vector_store, search_query: str, k: int = 5) -> Tuple[list, List[float]]:
+        """Returns the `k` nearest chunks and the query embedding used to find them."""
+        query_embedding = self.embedding_model.embed_query(search_query)
+        metrics.record_embeddings(METRICS_SERVICE, "query", 1)
+        return vector_store.similarity_search_by_vector(query_embedding, k), query_embedding
+
+    async def _aretrieve(self, vector_store, search_query: str, k: int = 5) -> Tuple[list, List[float]]:
+        """Async `_retrieve`."""
+        query_embedding = await self.embedding_model.aembed_query(search_query)
+        metrics.record_embeddings(METRICS_SERVICE, "query", 1)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, vector_store.similarity_search_by_vector, query_embedding, k), query_embedding
+
+    async def _aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embeds search queries in as few API calls as possible."""
+        metrics.record_embeddings(METRICS_SERVICE, "query", len(texts))
+        return await self.embedding_model.aembed_search_queries(texts)
+
+    def _complete(self, prompt: str, stage: str = "llm", validate: Optional[Callable[[str], bool]] = None) -> str:
+        """
+        Runs a prompt through the LLM, answering repeats from the response cache.
+        With `validate`, replies it rejects (e.g. malformed JSON) are not cached;
+        neither are replies from a fallback model, which are keyed as the primary's.
+        Tokens of calls that reach the model are counted under `stage`.
+        """
+        def call() -> Tuple[str, str]:
+            if self.llm_semaphore is not None:
+                self.llm_semaphore.acquire()
+            try:
+                message, model_name = self.llm_pool.call_with_model(lambda llm: llm.invoke(prompt), _llm_request_tokens(prompt))
+            finally:
+                if self.llm_semaphore is not None:
+                    self.llm_semaphore.release()
+            record_llm_usage(stage, prompt, message.content, getattr(message, "usage_metadata", None))
+            return message.content, model_name
+        return self.llm_cache.get_or_call(self.llm_pool.model_name, prompt, call, validate)
+
+    @asynccontextmanager
+    async def _llm_slot(self):
+        """Holds one of `llm_semaphore`'s slots, waiting for it off the event loop."""
+        if self.llm_semaphore is None:
+            yield
+            return
+        await asyncio.to_thread(self.llm_semaphore.acquire)
+        try:
+            yield
+        finally:
+            self.llm_semaphore.release()
+
+    async def _acomplete(self, prompt: str, stage: str = "llm", validate: Optional[Callable[[str], bool]] = None) -> str:
+        async def call() -> Tuple[str, str]:
+            async with self._llm_slot():
+                message, model_name = await self.llm_pool.acall_with_model(lambda llm: llm.ainvoke(prompt), _llm_request_tokens(prompt))
+            record_llm_usage(stage, prompt, message.content, getattr(message, "usage_metadata", None))
+            return message.content, model_name
+        return await self.llm_cache.aget_or_call(self.llm_pool.model_name, prompt, call, validate)
+
+    async def _astream_complete(self, prompt: str, stage: str = "llm") -> AsyncIterator[str]:
+        """Streams a completion token by token. A cached response is yielded in one piece."""
+        model_name = self.llm_pool.model_name
+        cached = await asyncio.to_thread(self.llm_cache.get, model_name, prompt)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        usage = None
+        answered_by = None
+        async with self._llm_slot():
+            async for chunk, answered_by in self.llm_pool.astream_with_model(lambda llm: llm.astream(prompt), _llm_request_tokens(prompt)):
+                # Providers that report usage on a stream do so on its last chunk.
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield chunk.content
+        record_llm_usage(stage, prompt, "".join(parts), usage)
+        # Only the primary model's replies are cached under its name.
+        if parts and answered_by == model_name:
+            await asyncio.to_thread(self.llm_cache.set, model_name, prompt, "".join(parts))
+
+    def close(self):
+        """Releases open indexes and stops the executor. Persisted indexes stay on disk."""
+        self.executor.shutdown(wait=False)
+        self.llm_pool.close()
+        self.embedding_pool.close()
+        if self._index_cache is not None:
+            self._index_cache.close()
+        if isinstance(self._document_embeddings, CachedEmbeddings):
+            self._document_embeddings.store.close()
+
+    @staticmethod
+    def _query_flight_key(file_bytes: bytes, query: str, *mode) -> str:
+        return document_key(file_bytes, CHUNKING_VERSION, normalize_prompt(query), *(str(option) for option in mode))
+
+    def process_document_and_query(self, file_bytes: bytes, query: str, timings: Optional[StageTimings] = None) -> FinalResponse:
+        """
+        Answers `query` about the PDF. A call made while the same question about the
+        same document is already being answered waits for that answer instead; its
+        `timings` then only get a "coalesced_wait" stage.
+        """
+        timings = timings if timings is not None else StageTimings()
+        started = time.perf_counter()
+        response, shared = self.sync_query_flights.do(
+            self._query_flight_key(file_bytes, query),
+            lambda: self._process_document_and_query(file_bytes, query, timings),
+        )
+        if shared:
+            timings.record("coalesced_wait", time.perf_counter() - started)
+        return response
+
+    def _process_document_and_query(self, file_bytes: bytes, query: str, timings: StageTimings) -> FinalResponse:
+        with timings.stage("index"):
+            vector_store = self.get_vector_store(file_bytes)
+        if vector_store is None:
+            return _unreadable_pdf_response()
+
+        with timings.stage("expansion"):
+            expanded_search_query = self._complete(build_expansion_prompt(query), "expansion")
+
+        with timings.stage("retrieval"):
+            retrieved_docs, query_embedding = self._retrieve(vector_store, expanded_search_query)
+        context = "\n\n---\n\n".join([doc.page_content for doc in retrieved_docs])
+        if not retrieved_docs or not context.strip():
+            return _no_context_response(query)
+
+        with timings.stage("extraction"):
+            extracted_justifications = self._extract_quotes(retrieved_docs, query, query_embedding)
+        if extracted_justifications is None:
+            return _unparsable_quotes_response()
+        if not extracted_justifications:
+            return _no_clauses_response(query)
+
+        quotes_for_decision = "\n".join(extracted_justifications)
+        with timings.stage("decision"):
+            decision_response_str = self._complete(build_decision_prompt(quotes_for_decision, query), "decision", _parses(parse_decision))
+        json_decision = parse_decision(decision_response_str)
+        if json_decision is None:
+            return _unparsable_decision_response()
+
+        final_data_for_narrative = {"decision": json_decision.decision, "amount_covered": json_decision.amount_covered, "justification_quotes": extracted_justifications}
+        with timings.stage("narrative"):
+            narrative_text = self._complete(build_narrative_prompt(final_data_for_narrative, query), "narrative")
+
+        return FinalResponse(
+            decision=json_decision.decision,
+            amount_covered=str(json_decision.amount_covered),
+            justification=extracted_justifications,
+            narrative_response=narrative_text.strip()
+        )
+
+    async def _aexpand_query(self, query: str) -> str:
+        return await self._acomplete(build_expansion_prompt(query), "expansion")
+
+    async def _aindex_and_expand(self, file_bytes: bytes, query: str, timings: StageTimings, overlap: bool):
+        """
+        Returns `(vector_store, expanded_search_query)`. With `overlap` both run
+        concurrently; otherwise expansion is skipped when the PDF is unreadable.
+        The vector store is None if the PDF could not be read.
+        """
+        if overlap:
+            return await asyncio.gather(
+                timings.run("index", self.aget_vector_store(file_bytes, timings)),
+                timings.run("expansion", self._aexpand_query(query)),
             )
+        vector_store = await timings.run("index", self.aget_vector_store(file_bytes, timings))
+        if vector_store is None:
+            return None, None
+        return vector_store, await timings.run("expansion", self._aexpand_query(query))
+
+    async def aprocess_document_and_query(
+        self,
+        file_bytes: bytes,
+        query: str,
+        timings: Optional[StageTimings] = None,
+        overlap: Optional[bool] = None,
+        fused: Optional[bool] = None,
+    ) -> FinalResponse:
+        """
+        Async version of `process_document_and_query`. Never blocks the event loop,
+        so a single worker can serve many overlapping requests.
+
+        `overlap` runs query expansion concurrently with document indexing, since it
+        only needs the query text. `fused` replaces the decision and narrative calls
+        with one structured call. Both default to the processor's settings. Pass a
+        `StageTimings` to collect how long each stage took.
+
+        Concurrent calls for the same document, normalized query and mode share one
+        execution; the ones that waited only get a "coalesced_wait" stage.
+        """
+        timings = timings if timings is not None else StageTimings()
+        overlap = self.overlap_stages if overlap is None else overlap
+        fused = self.fused_decision if fused is None else fused
+
+        started = time.perf_counter()
+        response, shared = await self.query_flights.do(
+            self._query_flight_key(file_bytes, query, overlap, fused),
+            lambda: self._aprocess_document_and_query(file_bytes, query, timings, overlap, fused),
+        )
+        if shared:
+            timings.record("coalesced_wait", time.perf_counter() - started)
+        return response
+
+    async def _aprocess_document_and_query(
+        self, file_bytes: bytes, query: str, timings: StageTimings, overlap: bool, fused: bool
+    ) -> FinalResponse:
+        vector_store, expanded_search_query = await self._aindex_and_expand(file_bytes, query, timings, overlap)
+        if vector_store is None:
+            return _unreadable_pdf_response()
+
+        retrieved_docs, query_embedding = await timings.run("retrieval", self._aretrieve(vector_store, expanded_search_query))
+        return await self._aanswer_from_docs(retrieved_docs, query, timings, fused, query_embedding)
+
+    def _extract_quotes(self, retrieved_docs: list, query: str, query_embedding: Optional[List[float]] = None) -> Optional[List[str]]:
+        """
+        The justification sentences for `query`, chosen by the LLM or locally (see
+        QUOTE_EXTRACTION_MODE). Locally, sentences are scored against `query_embedding`,
+        the embedding retrieval already computed, if given. Returns None if the LLM's
+        answer could not be parsed.
+        """
+        if self.quote_extraction == "local":
+            sentences = split_sentences([doc.page_content for doc in retrieved_docs])
+            if not sentences:
+                return []
+            metrics.record_embeddings(METRICS_SERVICE, "sentence", len(sentences))
+            if query_embedding is None:
+                query_embedding = self.embedding_model.embed_query(query)
+            sentence_embeddings = self.document_embeddings.embed_documents(sentences)
+            return select_quotes(sentences, sentence_embeddings, query, query_embedding, QUOTE_MAX_SENTENCES, QUOTE_LEXICAL_WEIGHT)
+        context = "\n\n---\n\n".join([doc.page_content for doc in retrieved_docs])
+        return parse_quotes(self._complete(build_extraction_prompt(context, query), "extraction", _parses(parse_quotes)))
+
+    async def _aextract_quotes(self, retrieved_docs: list, query: str, query_embedding: Optional[List[float]] = None) -> Optional[List[str]]:
+        """
+        Async `_extract_quotes`. In local mode, sentences are embedded as documents
+        (through the chunk embedding cache) and scored against `query_embedding`, the
+        embedding retrieval already computed, if given.
+        """
+        if self.quote_extraction == "local":
+            sentences = split_sentences([doc.page_content for doc in retrieved_docs])
+            if not sentences:
+                return []
+            metrics.record_embeddings(METRICS_SERVICE, "sentence", len(sentences))
+            if query_embedding is None:
+                query_embedding = await self.embedding_model.aembed_query(query)
+            sentence_embeddings = await self.document_embeddings.aembed_documents(sentences)
+            return select_quotes(sentences, sentence_embeddings, query, query_embedding, QUOTE_MAX_SENTENCES, QUOTE_LEXICAL_WEIGHT)
+        context = "\n\n---\n\n".join([doc.page_content for doc in retrieved_docs])
+        return parse_quotes(await self._acomplete(build_extraction_prompt(context, query), "extraction", _parses(parse_quotes)))
+
+    async def _aanswer_from_docs(
+        self, retrieved_docs: list, query: str, timings: StageTimings, fused: bool, query_embedding: Optional[List[float]] = None
+    ) -> FinalResponse:
+        """Runs the extraction, decision and narrative stages over already retrieved chunks."""
+        context = "\n\n---\n\n".join([doc.page_content for doc in retrieved_docs])
+        if not retrieved_docs or not context.strip():
+            return _no_context_response(query)
+
+        extracted_justifications = await timings.run("extraction", self._aextract_quotes(retrieved_docs, query, query_embedding))
+        if extracted_justifications is None:
+            return _unparsable_quotes_response()
+        if not extracted_justifications:
+            return _no_clauses_response(query)
+
+        quotes_for_decision = "\n".join(extracted_justifications)
+        if fused:
+            fused_response_str = await timings.run("decision_narrative", self._acomplete(build_fused_decision_prompt(quotes_for_decision, query), "decision_narrative", _parses(parse_fused_decision)))
+            json_decision = parse_fused_decision(fused_response_str)
+            if json_decision is None:
+                return _unparsable_decision_response()
+            narrative_text = json_decision.narrative_response or ""
+        else:
+            decision_response_str = await timings.run("decision", self._acomplete(build_decision_prompt(quotes_for_decision, query), "decision", _parses(parse_decision)))
+            json_decision = parse_decision(decision_response_str)
+            if json_decision is None:
+                return _unparsable_decision_response()
+            narrative_text = ""
+
+        if not narrative_text.strip():
+            # In fused mode this only happens if the model left the narrative empty.
+            final_data_for_narrative = {"decision": json_decision.decision, "amount_covered": json_decision.amount_covered, "justification_quotes": extracted_justifications}
+            narrative_text = await timings.run("narrative", self._acomplete(build_narrative_prompt(final_data_for_narrative, query), "narrative"))
+
+        return FinalResponse(
+            decision=json_decision.decision,
+            amount_covered=str(json_decision.amount_covered),
+            justification=extracted_justifications,
+            narrative_response=narrative_text.strip()
+        )
+
+    async def aprocess_batch(
+        self,
+        file_bytes: bytes,
+        queries: List[str],
+        max_concurrency: Optional[int] = None,
+        fused: Optional[bool] = None,
+        return_exceptions: bool = False,
+    ) -> AsyncIterator[Tuple[int, Union[FinalResponse, BaseException]]]:
+        """
+        Answers many queries about one document, yielding `(query_index, response)`
+        pairs in completion order. A query that raises gets an "Error" response, or
+        with `return_exceptions` the exception itself, so callers can retry it.
+
+        The document is indexed once while every query is expanded, all expanded
+        queries are embedded in one batched call, and the per-query LLM stages run
+        concurrently with at most `max_concurrency` queries in flight.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or BATCH_QUERY_CONCURRENCY)
+        fused = self.fused_decision if fused is None else fused
+        loop = asyncio.get_running_loop()
+
+        def failure(index: int, e: Exception) -> Tuple[int, Union[FinalResponse, BaseException]]:
+            if return_exceptions:
+                return index, e
+            return index, FinalResponse(decision="Error", amount_covered="N/A", justification=[], narrative_response=f"An error occurred: {str(e)}")
+
+        async def expand(query: str) -> Union[str, Exception]:
+            # A query whose expansion fails is reported on its own; the rest still run.
+            async with semaphore:
+                try:
+                    return await self._aexpand_query(query)
+                except Exception as e:
+                    return e
+
+        vector_store, *expansions = await asyncio.gather(
+            self.aget_vector_store(file_bytes),
+            *(expand(query) for query in queries),
+        )
+        if vector_store is None:
+            for index in range(len(queries)):
+                yield index, _unreadable_pdf_response()
+            return
+
+        expanded_queries = [expansion for expansion in expansions if isinstance(expansion, str)]
+        query_embeddings = iter(await self._aembed_queries(expanded_queries) if expanded_queries else [])
+
+        async def answer(index: int, query: str, query_embedding: List[float]) -> Tuple[int, Union[FinalResponse, BaseException]]:
+            async with semaphore:
+                try:
+                    retrieved_docs = await loop.run_in_executor(self.executor, vector_store.similarity_search_by_vector, query_embedding, 5)
+                    return index, await self._aanswer_from_docs(retrieved_docs, query, StageTimings(), fused, query_embedding)
+                except Exception as e:
+                    return failure(index, e)
+
+        async def failed(index: int, e: Exception) -> Tuple[int, Union[FinalResponse, BaseException]]:
+            return failure(index, e)
+
+        tasks = [
+            asyncio.ensure_future(
+                failed(index, expansion) if isinstance(expansion, Exception) else answer(index, query, next(query_embeddings))
+            )
+            for index, (query, expansion) in enumerate(zip(queries, expansions))
+        ]
+        try:
+            for next_finished in asyncio.as_completed(tasks):
+                yield await next_finished
         finally:
-            os.remove(temp_file_path)
+            # Stop outstanding LLM calls if the consumer goes away (e.g. client disconnect).
+            for task in tasks:
+                task.cancel()
+
+    async def astream_document_and_query(
+        self,
+        file_bytes: bytes,
+        query: str,
+        timings: Optional[StageTimings] = None,
+    ) -> AsyncIterator[Tuple[str, dict]]:
+        """
+        Streaming version of `aprocess_document_and_query`. Yields `(event, data)` pairs:
+        "progress" as each stage starts, "justification" and "decision" as soon as they
+        exist, "token" for each piece of the narrative as the LLM generates it, and
+        finally "done" with the complete FinalResponse. Early exits go straight to "done".
+        Always uses separate decision and narrative calls, since a fused JSON answer
+        cannot be streamed as plain narrative text.
+        """
+        timings = timings if timings is not None else StageTimings()
+
+        yield "progress", {"stage": "indexing"}
+        vector_store, expanded_search_query = await self._aindex_and_expand(file_bytes, query, timings, self.overlap_stages)
+        if vector_store is None:
+            yield "done", _unreadable_pdf_response().dict()
+            return
+
+        yield "progress", {"stage": "retrieving"}
+        retrieved_docs, query_embedding = await timings.run("retrieval", self._aretrieve(vector_store, expanded_search_query))
+        context = "\n\n---\n\n".join([doc.page_content for doc in retrieved_docs])
+        if not retrieved_docs or not context.strip():
+            yield "done", _no_context_response(query).dict()
+            return
+
+        yield "progress", {"stage": "extracting"}
+        extracted_justifications = await timings.run("extraction", self._aextract_quotes(retrieved_docs, query, query_embedding))
+        if extracted_justifications is None:
+            yield "done", _unparsable_quotes_response().dict()
+            return
+        if not extracted_justifications:
+            yield "done", _no_clauses_response(query).dict()
+            return
+        yield "justification", {"quotes": extracted_justifications}
+
+        yield "progress", {"stage": "deciding"}
+        quotes_for_decision = "\n".join(extracted_justifications)
+        decision_response_str = await timings.run("decision", self._acomplete(build_decision_prompt(quotes_for_decision, query), "decision", _parses(parse_decision)))
+        json_decision = parse_decision(decision_response_str)
+        if json_decision is None:
+            yield "done", _unparsable_decision_response().dict()
+            return
+        yield "decision", {"decision": json_decision.decision, "amount_covered": str(json_decision.amount_covered)}
+
+        yield "progress", {"stage": "writing"}
+        final_data_for_narrative = {"decision": json_decision.decision, "amount_covered": json_decision.amount_covered, "justification_quotes": extracted_justifications}
+        narrative_parts = []
+        with timings.stage("narrative"):
+            async for token in self._astream_complete(build_narrative_prompt(final_data_for_narrative, query), "narrative"):
+                narrative_parts.append(token)
+                yield "token", {"text": token}
+
+        yield "done", FinalResponse(
+            decision=json_decision.decision,
+            amount_covered=str(json_decision.amount_covered),
+            justification=extracted_justifications,
+            narrative_response="".join(narrative_parts).strip()
+        ).dict()
 
 rag_processor = RAGProcessor()
-
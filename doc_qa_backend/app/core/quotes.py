@@ -0,0 +1,66 @@
+import re
+from typing import List, Sequence
+
+import numpy as np
+
+from shared.lexical import BM25Index
+
+# Sentence ends, unless the next word starts lower-case (e.g. "i.e. the", "Rs. 500 per day").
+_SENTENCE_END = re.compile(r"(?<=[.;!?])\s+(?=[(\"'A-Z0-9])")
+# "4.2 " / "(a) " clause numbers that open a new provision without ending punctuation before them.
+_CLAUSE_START = re.compile(r"\s+(?=(?:\d+(?:\.\d+)+|\([a-z]\))\s+[A-Z])")
+MIN_SENTENCE_WORDS = 5
+
+
+def split_sentences(chunks: Sequence[str]) -> List[str]:
+    """
+    Complete sentences of the retrieved chunks, in order, without duplicates
+    (neighbouring chunks overlap). PDF line wraps are joined and fragments
+    too short to justify anything and all-caps headings are dropped.
+    """
+    sentences = []
+    seen = set()
+    for chunk in chunks:
+        text = " ".join(chunk.split())
+        for piece in _SENTENCE_END.split(text):
+            for sentence in _CLAUSE_START.split(piece):
+                sentence = sentence.strip()
+                if sentence.isupper() or len(sentence.split()) < MIN_SENTENCE_WORDS or sentence in seen:
+                    continue
+                seen.add(sentence)
+                sentences.append(sentence)
+    return sentences
+
+
+def select_quotes(
+    sentences: Sequence[str],
+    sentence_embeddings: Sequence[Sequence[float]],
+    query: str,
+    query_embedding: Sequence[float],
+    max_quotes: int = 5,
+    lexical_weight: float = 0.3,
+    min_relative_score: float = 0.6,
+) -> List[str]:
+    """
+    Picks the sentences that best justify an answer to `query`, returned in
+    document order. Each sentence scores a mix of its embedding's cosine
+    similarity to the query and its BM25 score (scaled to the best one), so
+    exact policy terms ("cataract", "24 months") count as well as meaning.
+    Sentences scoring below `min_relative_score` of the best are left out.
+    """
+    if not sentences:
+        return []
+    vectors = np.asarray(sentence_embeddings, dtype=np.float32)
+    query_vector = np.asarray(query_embedding, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query_vector) or 1.0)
+    semantic = vectors @ query_vector / np.where(norms > 0, norms, 1.0)
+
+    lexical = np.asarray(BM25Index(sentences).scores(query), dtype=np.float32)
+    if lexical.max() > 0:
+        lexical /= lexical.max()
+
+    scores = (1 - lexical_weight) * semantic + lexical_weight * lexical
+    best = np.argsort(-scores)[:max_quotes]
+    top_score = scores[best[0]]
+    threshold = top_score * min_relative_score if top_score > 0 else top_score
+    return [sentences[i] for i in sorted(i for i in best if scores[i] >= threshold)]
@@ -0,0 +1,52 @@
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, List, TypeVar
+
+T = TypeVar("T")
+
+# Called with (stage, seconds) whenever any StageTimings finishes a stage, e.g. to feed metrics.
+_observers: List[Callable[[str, float], None]] = []
+
+
+def add_stage_observer(observer: Callable[[str, float], None]) -> None:
+    _observers.append(observer)
+
+
+class StageTimings:
+    """
+    Wall-clock duration of each pipeline stage, in seconds.
+
+    Stages may overlap (e.g. query expansion running while the document is
+    indexed), so the stage durations can add up to more than `total`.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def record(self, name: str, seconds: float) -> None:
+        self.stages[name] = seconds
+        for observer in _observers:
+            observer(name, seconds)
+
+    async def run(self, name: str, awaitable: Awaitable[T]) -> T:
+        """Awaits `awaitable` while timing it as stage `name`; handy inside asyncio.gather."""
+        with self.stage(name):
+            return await awaitable
+
+    @property
+    def total(self) -> float:
+        return time.perf_counter() - self._started
+
+    def as_dict(self) -> Dict[str, float]:
+        timings = {name: round(seconds, 4) for name, seconds in self.stages.items()}
+        timings["total"] = round(self.total, 4)
+        return timings
@@ -1,7 +1,9 @@
 # app/main.py
 
-from fastapi import FastAPI
-from .api import router as api_router
+from fastapi import FastAPI, Response
+from .api import router as api_router, job_queue
+from .core.logic import rag_processor, METRICS_SERVICE
+from shared import metrics
 
 app = FastAPI(
     title="PolicyPal ML Backend",
@@ -12,6 +14,24 @@ app = FastAPI(
 # Include the API endpoint(s) from api.py
 app.include_router(api_router, prefix="/api", tags=["Document Processing"])
 
+@app.on_event("shutdown")
+async def release_rag_resources():
+    await job_queue.close()
+    rag_processor.close()
+
 @app.get("/", tags=["Root"])
 async def read_root():
-    return {"message": "ML Service is running. Access the API docs at /docs"}
\ No newline at end of file
+    return {"message": "ML Service is running. Access the API docs at /docs"}
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    """Prometheus scrape endpoint: stage and request latency histograms, LLM token counts, cache hit rates."""
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+# Per-route request durations and in-flight counts, labelled by route template; other paths are grouped as "other".
+app.add_middleware(
+    metrics.MetricsMiddleware,
+    service=METRICS_SERVICE,
+    paths={"/"} | {"/api" + route.path for route in api_router.routes},
+)
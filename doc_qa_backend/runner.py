@@ -1,17 +1,47 @@
 # doc_qa_backend/runner.py
+"""
+Command-line adjudication, for one question or for a whole manifest of them.
 
+Single question:
+    python runner.py policy.pdf "Is cataract surgery covered?"
+
+Batch:
+    python runner.py --manifest claims.csv --output results.jsonl --workers 4 --llm-concurrency 8
+
+The manifest is a CSV (with a header row) or a JSONL file with a `pdf` and a
+`query` per row, plus an optional `id`. Relative PDF paths are resolved
+against the manifest's directory. Rows are grouped by PDF, so each document
+is parsed and indexed once. The groups are spread over a pool of worker
+processes, which together keep at most --llm-concurrency LLM calls in flight.
+
+Results are appended to the output JSONL as soon as each one is ready:
+`{"id", "pdf", "query", "result"}` or `{"id", "pdf", "query", "error"}`. If the
+output file already exists, rows that already have a result in it are
+skipped. After a crash, rerunning the same command picks up where it stopped.
+Rows that failed, including results with an "Error" decision, are retried.
+"""
+
+import os
 import sys
+import csv
 import json
+import time
+import asyncio
+import argparse
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from queue import Empty
+
 from app.core.logic import rag_processor
 
 def run_analysis(file_path, query):
-    """
-    This function now passes the file_path directly to the RAG processor.
-    """
+    """Answers one query about one PDF and prints the result as JSON."""
     try:
-        # Call the main processing function with the file_path
-        result = rag_processor.process_document_and_query(file_path=file_path, query=query)
-        
+        with open(file_path, "rb") as f:
+            file_bytes = f.read()
+        result = rag_processor.process_document_and_query(file_bytes=file_bytes, query=query)
+
         # Print the final result as a JSON string
         print(json.dumps(result.dict()))
 
@@ -25,13 +55,152 @@ def run_analysis(file_path, query):
         print(json.dumps(error_response), file=sys.stderr)
         sys.exit(1)
 
-if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        error_msg = {"error": "Invalid arguments. Expected file_path and query."}
+# --- Batch Mode ---
+
+def read_manifest(path):
+    """Returns `[(row_id, pdf_path, query)]`. Rows without an `id` are numbered from 1 in file order."""
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            records = [json.loads(line) for line in f if line.strip()]
+        else:
+            records = list(csv.DictReader(f))
+
+    rows = []
+    for number, record in enumerate(records, start=1):
+        pdf, query = (record.get("pdf") or "").strip(), (record.get("query") or "").strip()
+        if not pdf or not query:
+            raise ValueError(f"Manifest row {number} needs both a 'pdf' and a 'query'.")
+        row_id = str(record.get("id") or number)
+        rows.append((row_id, os.path.normpath(os.path.join(base_dir, pdf)), query))
+    if len({row_id for row_id, _, _ in rows}) != len(rows):
+        raise ValueError("Manifest ids must be unique.")
+    return rows
+
+def completed_ids(output_path):
+    """
+    Ids that already have a usable result in the output file. Errors, "Error"
+    decisions and unparsable (e.g. half-written) lines don't count.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            result = record.get("result")
+            if isinstance(result, dict) and result.get("decision") != "Error":
+                done.add(str(record["id"]))
+    return done
+
+_worker_loop = None
+
+def _init_worker(llm_semaphore):
+    # One event loop per worker: the async LLM and embedding clients stay bound to it across documents.
+    global _worker_loop
+    _worker_loop = asyncio.new_event_loop()
+    rag_processor.llm_semaphore = llm_semaphore
+
+def _run_document(pdf_path, rows, max_concurrency, results):
+    """Worker: indexes one PDF once and answers all of its `rows`, reporting each answer to `results` as it finishes."""
+    def report(index, **outcome):
+        row_id, query = rows[index]
+        results.put({"id": row_id, "pdf": pdf_path, "query": query, **outcome})
+
+    try:
+        with open(pdf_path, "rb") as f:
+            file_bytes = f.read()
+    except OSError as e:
+        for index in range(len(rows)):
+            report(index, error=f"Could not read the PDF: {e}")
+        return
+
+    async def answer_all():
+        answered = set()
+        try:
+            queries = [query for _, query in rows]
+            async for index, result in rag_processor.aprocess_batch(file_bytes, queries, max_concurrency=max_concurrency, return_exceptions=True):
+                answered.add(index)
+                if isinstance(result, Exception):
+                    report(index, error=f"An error occurred: {str(result)}")
+                else:
+                    report(index, result=result.dict())
+        except Exception as e:
+            for index in range(len(rows)):
+                if index not in answered:
+                    report(index, error=f"An error occurred: {str(e)}")
+
+    _worker_loop.run_until_complete(answer_all())
+
+def run_batch(manifest_path, output_path, workers, llm_concurrency):
+    rows = read_manifest(manifest_path)
+    done = completed_ids(output_path)
+    documents = OrderedDict()
+    for row_id, pdf_path, query in rows:
+        if row_id not in done:
+            documents.setdefault(pdf_path, []).append((row_id, query))
+    pending = sum(len(document_rows) for document_rows in documents.values())
+    print(f">> {len(rows)} rows, {len(done)} already done, {pending} to run over {len(documents)} documents.", file=sys.stderr)
+    if not pending:
+        return
+
+    # A crash can leave the last line half-written; start on a fresh line.
+    if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+        with open(output_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+        if needs_newline:
+            with open(output_path, "a", encoding="utf-8") as f:
+                f.write("\n")
+
+    started = time.perf_counter()
+    written = failed = 0
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager, open(output_path, "a", encoding="utf-8") as output:
+        llm_semaphore = manager.Semaphore(llm_concurrency)
+        results = manager.Queue()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(llm_semaphore,)) as pool:
+            futures = [
+                pool.submit(_run_document, pdf_path, document_rows, llm_concurrency, results)
+                for pdf_path, document_rows in documents.items()
+            ]
+            while written < pending:
+                try:
+                    record = results.get(timeout=1)
+                except Empty:
+                    if all(future.done() for future in futures):
+                        for future in futures:
+                            future.result()  # re-raises a worker crash
+                        break
+                    continue
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+                written += 1
+                failed += "error" in record
+                if written % 50 == 0 or written == pending:
+                    print(f">> {written}/{pending} written ({failed} failed) in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file_path", nargs="?", help="PDF to ask about (single-question mode)")
+    parser.add_argument("query", nargs="?", help="question to answer (single-question mode)")
+    parser.add_argument("--manifest", help="CSV or JSONL of pdf/query rows (batch mode)")
+    parser.add_argument("--output", default="results.jsonl", help="JSONL to append batch results to")
+    parser.add_argument("--workers", type=int, default=2, help="worker processes")
+    parser.add_argument("--llm-concurrency", type=int, default=8, help="LLM calls in flight across all workers")
+    args = parser.parse_args()
+
+    if args.manifest:
+        run_batch(args.manifest, args.output, args.workers, args.llm_concurrency)
+    elif args.file_path and args.query:
+        run_analysis(args.file_path, args.query)
+    else:
+        error_msg = {"error": "Invalid arguments. Expected file_path and query, or --manifest."}
         print(json.dumps(error_msg), file=sys.stderr)
         sys.exit(1)
-    
-    file_path_arg = sys.argv[1]
-    query_arg = sys.argv[2]
-    
-    run_analysis(file_path_arg, query_arg)
\ No newline at end of file
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,161 @@
 from flask import Flask, request, jsonify
 import google.generativeai as genai
-import fitz
 import json
 import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+
+# Modules shared with the other PolicyPal services live in the repo-level `shared/` package.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.chunking import estimate_tokens, iter_chunks
+from shared.lexical import BM25Index
+from shared.llm_cache import LLMResponseCache
+from shared.llm_client import ClientPool
+from shared.pdf_ingest import extract_text, iter_pages, read_pdf_bytes
 
 app = Flask(__name__)
 
-API_KEY = os.getenv("GOOGLE_API_KEY")
-if not API_KEY:
-    raise ValueError("API key not found.")
-genai.configure(api_key=API_KEY)
-model = genai.GenerativeModel('gemini-1.5-flash')
+MODEL_NAME = 'gemini-1.5-flash'
+# Comma-separated Gemini models to try, in order, when MODEL_NAME stays rate limited or unavailable.
+FALLBACK_MODEL_NAMES = [name.strip() for name in os.environ.get("GEMINI_FALLBACK_MODELS", "").split(",") if name.strip()]
+# Completion tokens charged against GEMINI_TOKENS_PER_MINUTE before each call.
+EXPECTED_COMPLETION_TOKENS = 100
+# Created on first use, so the module imports without a key; tests and benchmarks may
+# assign any object with a Gemini-style `generate_content(prompt).text` instead.
+model = None
+_fallback_models = {}
+_model_lock = threading.Lock()
+llm_cache = LLMResponseCache.from_env()
+
+def _configure_genai():
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise ValueError("API key not found.")
+    genai.configure(api_key=api_key)
+
+def get_model():
+    global model
+    with _model_lock:
+        if model is None:
+            _configure_genai()
+            model = genai.GenerativeModel(MODEL_NAME)
+        return model
+
+def get_fallback_model(model_name):
+    with _model_lock:
+        if model_name not in _fallback_models:
+            _configure_genai()
+            _fallback_models[model_name] = genai.GenerativeModel(model_name)
+        return _fallback_models[model_name]
+
+# Every Gemini call goes through this pool: GEMINI_REQUESTS_PER_MINUTE / GEMINI_TOKENS_PER_MINUTE,
+# retries with backoff, optional hedging and the fallback models (see shared/llm_client.py).
+llm_pool = ClientPool.from_env(
+    "gemini",
+    [(MODEL_NAME, get_model)] + [(name, lambda name=name: get_fallback_model(name)) for name in FALLBACK_MODEL_NAMES],
+)
+
+# --- Policy Context ---
+# "full" sends the whole policy with every request; "retrieval" sends only the clauses
+# most relevant to the query plus the waiting-period and exclusion sections.
+POLICY_CONTEXT_MODE = os.environ.get("POLICY_CONTEXT_MODE", "full")
+POLICY_CONTEXT_MODES = ("full", "retrieval")
+POLICY_CONTEXT_TOKEN_BUDGET = int(os.environ.get("POLICY_CONTEXT_TOKEN_BUDGET", "6000"))
+# Share of the budget the always-included sections may take; the rest goes to query matches.
+POLICY_PINNED_SHARE = float(os.environ.get("POLICY_PINNED_SHARE", "0.5"))
+POLICY_INDEX_CACHE_SIZE = int(os.environ.get("POLICY_INDEX_CACHE_SIZE", "16"))
+# Clauses whose heading matches are always considered, whatever the query says.
+PINNED_SECTIONS = re.compile(r"waiting period|exclusion|excl\d|pre-existing", re.IGNORECASE)
 
 def extract_text_from_pdf(pdf_path):
-    doc = fitz.open(pdf_path)
-    text = "".join([page.get_text() for page in doc])
-    doc.close()
-    return text
+    return extract_text(read_pdf_bytes(pdf_path))
+
+class PolicyIndex:
+    """A policy PDF extracted, split into clauses and indexed for lexical search, once."""
+
+    def __init__(self, pdf_bytes):
+        pages = list(iter_pages(pdf_bytes))
+        self.full_text = "\n".join(text for _, text in pages)
+        self.full_tokens = estimate_tokens(self.full_text)
+        self.chunks = list(iter_chunks(iter(pages), max_tokens=256, overlap_tokens=0))
+        self.chunk_tokens = [estimate_tokens(chunk.text) for chunk in self.chunks]
+        self.bm25 = BM25Index([chunk.text for chunk in self.chunks])
+        self.pinned = [i for i, chunk in enumerate(self.chunks) if PINNED_SECTIONS.search(chunk.text.split("\n", 1)[0])]
+
+    def select_context(self, query, token_budget=POLICY_CONTEXT_TOKEN_BUDGET):
+        """
+        Returns `(excerpts, tokens)`: the waiting-period/exclusion clauses and the
+        clauses that best match `query`, in document order, within `token_budget`.
+        """
+        scores = self.bm25.scores(query)
+        selected = set()
+        used = 0
+        for limit, candidates in (
+            (token_budget * POLICY_PINNED_SHARE, sorted(self.pinned, key=lambda i: -scores[i])),
+            (token_budget, sorted((i for i in range(len(self.chunks)) if scores[i] > 0), key=lambda i: -scores[i])),
+        ):
+            for i in candidates:
+                if i not in selected and used + self.chunk_tokens[i] <= limit:
+                    selected.add(i)
+                    used += self.chunk_tokens[i]
+        excerpts = "\n\n".join(f"[Page {self.chunks[i].page_start + 1}]\n{self.chunks[i].text}" for i in sorted(selected))
+        return excerpts, used
+
+_policy_indexes = OrderedDict()  # absolute path -> ((mtime_ns, size), PolicyIndex)
+_policy_indexes_lock = threading.Lock()
+
+def get_policy_index(pdf_path):
+    """The PolicyIndex for `pdf_path`, rebuilt only when the file's mtime or size changes."""
+    path = os.path.abspath(pdf_path)
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _policy_indexes_lock:
+        entry = _policy_indexes.get(path)
+        if entry is not None and entry[0] == version:
+            _policy_indexes.move_to_end(path)
+            return entry[1]
+
+    policy_index = PolicyIndex(read_pdf_bytes(path))
+    with _policy_indexes_lock:
+        _policy_indexes[path] = (version, policy_index)
+        _policy_indexes.move_to_end(path)
+        while len(_policy_indexes) > POLICY_INDEX_CACHE_SIZE:
+            _policy_indexes.popitem(last=False)
+    return policy_index
 
 @app.route("/api/policy-check", methods=["POST"])
 def policy_check():
     data = request.json
     user_query = data.get("query")
     pdf_path = data.get("pdf_path", "hackathon-policy.pdf")  # default
+    mode = data.get("mode", POLICY_CONTEXT_MODE)
 
     if not user_query:
         return jsonify({"error": "Missing 'query' field"}), 400
+    if mode not in POLICY_CONTEXT_MODES:
+        return jsonify({"error": f"'mode' must be one of {', '.join(POLICY_CONTEXT_MODES)}"}), 400
 
-    policy_text = extract_text_from_pdf(pdf_path)
-    if not policy_text:
+    policy_index = get_policy_index(pdf_path)
+    if not policy_index.full_text:
         return jsonify({"error": "Policy PDF text extraction failed"}), 500
 
-    return get_policy_decision(policy_text, user_query)
+    if mode == "retrieval":
+        policy_text, context_tokens = policy_index.select_context(user_query)
+        print(f">> policy-check: sent {context_tokens} of {policy_index.full_tokens} policy tokens.")
+        return get_policy_decision(policy_text, user_query, excerpts=True)
+    return get_policy_decision(policy_index.full_text, user_query)
 
-def get_policy_decision(policy_doc: str, user_query: str) -> dict:
-    """
-    This function sends the policy text and a user query to the AI using a highly-detailed prompt
-    to get an expert-level decision.
-    """
-    prompt_template = f"""
+def build_prompt(policy_doc: str, user_query: str, excerpts: bool = False) -> str:
+    document_heading = (
+        "**Policy Document (excerpts relevant to this request, including the waiting-period and exclusion clauses):**"
+        if excerpts else "**Policy Document:**"
+    )
+    return f"""
     You are an expert AI claims adjudicator for Bajaj Allianz, analyzing requests against the "Global Health Care" policy. Your analysis must be meticulous, strict, and based ONLY on the provided policy document.
 
-    **Policy Document:**
+    {document_heading}
     ---
     {policy_doc}
     ---
@@ -77,11 +191,43 @@ def get_policy_decision(policy_doc: str, user_query: str) -> dict:
       "reason": "Your one-sentence explanation based on the policy rules."
     }}
     """
-  
+
+def parse_decision(response_text: str):
+    """The model's `{"status", "reason"}` JSON, or None if the reply is not that."""
+    cleaned_response = response_text.strip().replace("```json", "").replace("```", "").strip()
     try:
-        response = model.generate_content(prompt_template)
-        cleaned_response = response.text.strip().replace("```json", "").replace("```", "").strip()
         result = json.loads(cleaned_response)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(result, dict) or not isinstance(result.get("status"), str) or not isinstance(result.get("reason"), str):
+        return None
+    return result
+
+def adjudicate(policy_doc: str, user_query: str, excerpts: bool = False) -> dict:
+    """Asks the model for a decision and returns its parsed `{"status", "reason"}` JSON."""
+    prompt_template = build_prompt(policy_doc, user_query, excerpts)
+    response_text = llm_cache.get_or_call(
+        MODEL_NAME,
+        prompt_template,
+        lambda: llm_pool.call_with_model(
+            lambda client: client.generate_content(prompt_template).text,
+            estimate_tokens(prompt_template) + EXPECTED_COMPLETION_TOKENS,
+        ),
+        # Don't keep serving an unusable answer from the cache.
+        validate=lambda response: parse_decision(response) is not None,
+    )
+    result = parse_decision(response_text)
+    if result is None:
+        raise ValueError(f"Unexpected reply from the model: {response_text[:200]!r}")
+    return result
+
+def get_policy_decision(policy_doc: str, user_query: str, excerpts: bool = False) -> dict:
+    """
+    This function sends the policy text and a user query to the AI using a highly-detailed prompt
+    to get an expert-level decision.
+    """
+    try:
+        result = adjudicate(policy_doc, user_query, excerpts)
         return jsonify({
             "reply": f"{result['status']}: {result['reason']}"
         })
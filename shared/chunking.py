@@ -0,0 +1,186 @@
+"""
+Token-aware, page-anchored chunking shared by the PolicyPal retrieval stacks.
+
+Chunks are sized in tokens of the embedding model rather than characters, and
+are cut at the most natural boundary available: a new section or clause
+first, then a paragraph, then a sentence, and only as a last resort between
+words. Every chunk remembers the pages it came from.
+
+`iter_chunks` consumes `(page_number, text)` pairs lazily, e.g. straight from
+`shared.pdf_ingest.iter_pages`, and yields chunks as soon as they are full, so a
+long document never has to be held in memory as one string.
+"""
+
+import re
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+TokenCounter = Callable[[str], int]
+
+# "4.2 ", "4.2.1) ", "(a) ", "iv) " at the start of a line.
+_NUMBERED_CLAUSE = re.compile(r"^\s*(?:\d+(?:\.\d+)*[.)]?|\(?[a-z]\)|\(?[ivx]{1,5}\))\s+\S", re.IGNORECASE)
+_SECTION_KEYWORD = re.compile(
+    r"^\s*(?:section|clause|article|part|chapter|schedule|annexure|exclusions?|definitions?|conditions?)\b",
+    re.IGNORECASE,
+)
+_SENTENCE_END = re.compile(r"(?<=[.;:!?])\s+(?=[(\"'A-Z0-9])")
+_WORD_OR_PUNCT = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough subword token count for when the embedding model's tokenizer is not
+    available locally (e.g. a hosted embedding API): one per punctuation mark
+    or short word, more for long words that split into several pieces.
+    """
+    return sum(1 + len(piece) // 7 for piece in _WORD_OR_PUNCT.findall(text))
+
+
+def tokenizer_counter(tokenizer) -> TokenCounter:
+    """Token counter backed by a Hugging Face tokenizer (e.g. `SentenceTransformer(...).tokenizer`)."""
+    return lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+
+
+class Chunk(NamedTuple):
+    text: str
+    page_start: int
+    page_end: int
+    token_count: int
+
+    @property
+    def metadata(self) -> dict:
+        return {"page": self.page_start, "page_end": self.page_end}
+
+
+class _Unit(NamedTuple):
+    text: str
+    tokens: int
+    page: int
+    starts_section: bool
+    # Joined to the previous unit with a space when it continues the same paragraph.
+    continues_paragraph: bool
+
+
+def _is_heading(line: str) -> bool:
+    if _NUMBERED_CLAUSE.match(line) or _SECTION_KEYWORD.match(line):
+        return True
+    stripped = line.strip()
+    # Short all-caps lines ("WAITING PERIODS") are headings in most policy wordings.
+    return stripped.isupper() and len(stripped.split()) <= 12
+
+
+def _blocks(text: str) -> Iterator[Tuple[str, bool]]:
+    """Paragraphs of a page, as `(text, starts_section)`. Headings always start a new block."""
+    lines: List[str] = []
+    starts_section = False
+    for line in text.splitlines():
+        if not line.strip():
+            if lines:
+                yield "\n".join(lines), starts_section
+                lines, starts_section = [], False
+            continue
+        if _is_heading(line) and lines:
+            yield "\n".join(lines), starts_section
+            lines = []
+        if not lines:
+            starts_section = _is_heading(line)
+        lines.append(line.strip())
+    if lines:
+        yield "\n".join(lines), starts_section
+
+
+def _split_words(text: str, max_tokens: int, count_tokens: TokenCounter) -> Iterator[str]:
+    """Last resort for a sentence longer than `max_tokens`: pack whole words (word counts are summed)."""
+    piece: List[str] = []
+    piece_tokens = 0
+    for word in text.split():
+        word_tokens = count_tokens(word)
+        if word_tokens > max_tokens:
+            # Not a word at all (a table row or garbage from extraction); cut it by characters.
+            step = max(1, len(word) * max_tokens // word_tokens)
+            parts = [word[i:i + step] for i in range(0, len(word), step)]
+        else:
+            parts = [word]
+        for part in parts:
+            part_tokens = word_tokens if len(parts) == 1 else count_tokens(part)
+            if piece and piece_tokens + part_tokens > max_tokens:
+                yield " ".join(piece)
+                piece, piece_tokens = [], 0
+            piece.append(part)
+            piece_tokens += part_tokens
+    if piece:
+        yield " ".join(piece)
+
+
+def _units(pages: Iterable[Tuple[int, str]], max_tokens: int, count_tokens: TokenCounter) -> Iterator[_Unit]:
+    for page_number, text in pages:
+        for block, starts_section in _blocks(text):
+            tokens = count_tokens(block)
+            if tokens <= max_tokens:
+                yield _Unit(block, tokens, page_number, starts_section, False)
+                continue
+            first = True
+            for sentence in _SENTENCE_END.split(block):
+                sentence_tokens = count_tokens(sentence)
+                pieces = [sentence] if sentence_tokens <= max_tokens else list(_split_words(sentence, max_tokens, count_tokens))
+                for piece in pieces:
+                    piece_tokens = sentence_tokens if len(pieces) == 1 else count_tokens(piece)
+                    yield _Unit(piece, piece_tokens, page_number, starts_section and first, not first)
+                    first = False
+
+
+def _make_chunk(units: List[_Unit]) -> Chunk:
+    parts = [units[0].text]
+    for unit in units[1:]:
+        parts.append((" " if unit.continues_paragraph else "\n") + unit.text)
+    return Chunk("".join(parts), units[0].page, units[-1].page, sum(unit.tokens for unit in units))
+
+
+def iter_chunks(
+    pages: Iterable[Tuple[int, str]],
+    max_tokens: int = 384,
+    overlap_tokens: int = 40,
+    count_tokens: TokenCounter = estimate_tokens,
+    min_tokens: Optional[int] = None,
+) -> Iterator[Chunk]:
+    """
+    Packs the text of `pages` into chunks of at most `max_tokens` tokens.
+
+    A chunk is closed early at a section or clause heading once it holds at
+    least `min_tokens` (default half of `max_tokens`), so clauses are not
+    split across chunks when they don't have to be. Within a section,
+    consecutive chunks share up to `overlap_tokens` of trailing text.
+    """
+    min_tokens = max_tokens // 2 if min_tokens is None else min_tokens
+    current: List[_Unit] = []
+    current_tokens = 0
+
+    for unit in _units(pages, max_tokens, count_tokens):
+        if current and (current_tokens + unit.tokens > max_tokens or (unit.starts_section and current_tokens >= min_tokens)):
+            yield _make_chunk(current)
+            # Carry the tail of the previous chunk over, unless a new section starts here.
+            carried: List[_Unit] = []
+            if not unit.starts_section:
+                carried_tokens = 0
+                for previous in reversed(current):
+                    if carried_tokens + previous.tokens > overlap_tokens:
+                        break
+                    carried.insert(0, previous)
+                    carried_tokens += previous.tokens
+                while carried and sum(u.tokens for u in carried) + unit.tokens > max_tokens:
+                    carried.pop(0)
+            current = carried
+            current_tokens = sum(u.tokens for u in current)
+        current.append(unit)
+        current_tokens += unit.tokens
+
+    if current:
+        yield _make_chunk(current)
+
+
+def chunk_texts(
+    pages: Iterable[Tuple[int, str]],
+    max_tokens: int = 384,
+    overlap_tokens: int = 40,
+    count_tokens: TokenCounter = estimate_tokens,
+) -> List[str]:
+    return [chunk.text for chunk in iter_chunks(pages, max_tokens, overlap_tokens, count_tokens)]
@@ -0,0 +1,60 @@
+"""
+Small BM25 index for lexical retrieval over a fixed set of passages.
+
+Needs no embedding model or network, which makes it a good fit for ranking
+the clauses of one policy document against a short query.
+"""
+
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Sequence, Tuple
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Function words that match everywhere and only add noise to the scores.
+STOPWORDS = frozenset(
+    "a an and are as at be been by can do for from has have i if in is it its my of on or "
+    "so than that the their there this to was were will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    words = _WORD.findall(text.lower())
+    # Crude plural folding, so "exclusions" matches "exclusion".
+    return [word[:-1] if len(word) > 4 and word.endswith("s") and not word.endswith("ss") else word for word in words if word not in STOPWORDS]
+
+
+class BM25Index:
+    def __init__(self, passages: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._lengths: List[int] = []
+        for i, passage in enumerate(passages):
+            terms = tokenize(passage)
+            self._lengths.append(len(terms))
+            for term, count in Counter(terms).items():
+                self._postings[term].append((i, count))
+        self._average_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def scores(self, query: str) -> List[float]:
+        scores = [0.0] * len(self._lengths)
+        total = len(self._lengths)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for i, count in postings:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[i] / (self._average_length or 1))
+                scores[i] += idf * count * (self.k1 + 1) / (count + norm)
+        return scores
+
+    def top(self, query: str, n: int) -> List[Tuple[int, float]]:
+        """Indices and scores of the `n` best passages with a non-zero score, best first."""
+        ranked = sorted(((score, i) for i, score in enumerate(self.scores(query)) if score > 0), reverse=True)
+        return [(i, score) for score, i in ranked[:n]]
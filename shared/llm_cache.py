@@ -0,0 +1,296 @@
+"""
+Persistent LLM response cache shared by the PolicyPal Python services.
+
+Responses are keyed on the model name plus the normalized prompt, so the same
+prompt sent to the same model is answered from the cache instead of the
+provider. Lookups go through a list of tiers, fastest first (by default an
+in-process LRU in front of a SQLite file). A hit in a slower tier is copied
+into the faster ones.
+
+Each service calls `LLMResponseCache.from_env()`. Pointing LLM_CACHE_PATH at the
+same file lets every service on a host share one disk tier.
+"""
+
+import os
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "policypal", "llm_cache.sqlite3")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Canonical form of a prompt for cache lookups: NFKC, collapsed whitespace, case-folded."""
+    return " ".join(unicodedata.normalize("NFKC", prompt).split()).casefold()
+
+
+def cache_key(model: str, prompt: str) -> str:
+    return hashlib.sha256(f"{model}\x00{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+
+class CacheTier:
+    """Interface of a cache storage tier. Implementations must be thread-safe."""
+
+    name = "tier"
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, model: str, value: str, ttl_seconds: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class MemoryTier(CacheTier):
+    """In-process LRU bounded by entry count."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at and expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, model: str, value: str, ttl_seconds: float) -> None:
+        expires_at = time.time() + ttl_seconds if ttl_seconds > 0 else 0.0
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteTier(CacheTier):
+    """
+    On-disk tier in a single SQLite file, bounded by the total size of the stored
+    responses. Least recently used rows are evicted first. WAL mode lets several
+    processes share the file.
+    """
+
+    name = "disk"
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = 256 * 1024 * 1024, evict_every: int = 64):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self._writes_since_eviction = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache (last_used)")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            response, expires_at = row
+            if expires_at and expires_at < now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+            return response
+
+    def set(self, key: str, model: str, value: str, ttl_seconds: float) -> None:
+        now = time.time()
+        expires_at = now + ttl_seconds if ttl_seconds > 0 else 0.0
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, response, size, expires_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, value, len(value.encode("utf-8")), expires_at, now),
+            )
+            self._writes_since_eviction += 1
+            if self._writes_since_eviction >= self.evict_every:
+                self._writes_since_eviction = 0
+                self._evict_locked(now)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+
+    def evict(self) -> None:
+        """Drops expired rows, then least recently used rows until under `max_bytes`."""
+        with self._lock:
+            self._evict_locked(time.time())
+
+    def _evict_locked(self, now: float) -> None:
+        self._conn.execute("DELETE FROM llm_cache WHERE expires_at > 0 AND expires_at < ?", (now,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        stale_keys = []
+        for key, size in self._conn.execute("SELECT key, size FROM llm_cache ORDER BY last_used"):
+            stale_keys.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM llm_cache WHERE key = ?", stale_keys)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class LLMResponseCache:
+    """Read-through cache of LLM completions over one or more `CacheTier`s."""
+
+    def __init__(self, tiers: List[CacheTier], ttl_seconds: float = 7 * 24 * 60 * 60, enabled: bool = True):
+        self.tiers = tiers
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.tier_hits = {tier.name: 0 for tier in tiers}
+
+    @classmethod
+    def from_env(cls) -> "LLMResponseCache":
+        """
+        Builds the default memory + SQLite cache from environment variables:
+        LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_MEMORY_ENTRIES,
+        LLM_CACHE_MAX_BYTES and LLM_CACHE_TTL_SECONDS.
+        """
+        enabled = os.environ.get("LLM_CACHE_ENABLED", "true").lower() == "true"
+        tiers: List[CacheTier] = [MemoryTier(max_entries=int(os.environ.get("LLM_CACHE_MEMORY_ENTRIES", "1024")))]
+        if enabled:
+            tiers.append(SQLiteTier(
+                path=os.environ.get("LLM_CACHE_PATH", DEFAULT_CACHE_PATH),
+                max_bytes=int(os.environ.get("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+            ))
+        return cls(
+            tiers,
+            ttl_seconds=float(os.environ.get("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 60 * 60))),
+            enabled=enabled,
+        )
+
+    def get(self, model: str, prompt: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        key = cache_key(model, prompt)
+        for position, tier in enumerate(self.tiers):
+            value = tier.get(key)
+            if value is not None:
+                for faster_tier in self.tiers[:position]:
+                    faster_tier.set(key, model, value, self.ttl_seconds)
+                with self._lock:
+                    self.hits += 1
+                    self.tier_hits[tier.name] += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, model: str, prompt: str, response: str) -> None:
+        if not self.enabled:
+            return
+        key = cache_key(model, prompt)
+        for tier in self.tiers:
+            tier.set(key, model, response, self.ttl_seconds)
+
+    def invalidate(self, model: str, prompt: str) -> None:
+        """Forgets a cached response, e.g. one that turned out to be unusable."""
+        key = cache_key(model, prompt)
+        for tier in self.tiers:
+            tier.delete(key)
+
+    def get_or_call(
+        self,
+        model: str,
+        prompt: str,
+        call: Callable[[], Tuple[str, str]],
+        validate: Optional[Callable[[str], bool]] = None,
+    ) -> str:
+        """
+        Returns the cached response, or the one `call()` returns along with the
+        name of the model that answered it. A reply from any other model than
+        `model` (e.g. a fallback) is returned but not cached under `model`.
+        With `validate`, only responses it accepts are cached, and a cached one
+        it rejects is dropped and replaced, so one malformed reply is not served
+        again for the whole TTL.
+        """
+        cached = self.get(model, prompt)
+        if cached is not None:
+            if validate is None or validate(cached):
+                return cached
+            self.invalidate(model, prompt)
+        response, answered_by = call()
+        if answered_by == model and (validate is None or validate(response)):
+            self.set(model, prompt, response)
+        return response
+
+    async def aget_or_call(
+        self,
+        model: str,
+        prompt: str,
+        call: Callable[[], Awaitable[Tuple[str, str]]],
+        validate: Optional[Callable[[str], bool]] = None,
+    ) -> str:
+        # The disk tier does blocking I/O, so lookups and writes run off the event loop.
+        cached = await asyncio.to_thread(self.get, model, prompt)
+        if cached is not None:
+            if validate is None or validate(cached):
+                return cached
+            await asyncio.to_thread(self.invalidate, model, prompt)
+        response, answered_by = await call()
+        if answered_by == model and (validate is None or validate(response)):
+            await asyncio.to_thread(self.set, model, prompt, response)
+        return response
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "tier_hits": dict(self.tier_hits),
+            }
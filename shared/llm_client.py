@@ -0,0 +1,404 @@
+"""
+Rate-aware access to the hosted model APIs, shared by the PolicyPal Python
+services.
+
+A `ClientPool` fronts one provider. It holds an ordered list of models, each
+with a factory that returns a long-lived client, so connections are reused.
+Every call goes through the pool, which:
+
+- waits on two token buckets, one for requests per minute and one for tokens
+  per minute. Callers pass an estimate of the tokens each call uses;
+- retries rate limits (429), overloads, 5xx responses, timeouts and
+  connection errors. It uses exponential backoff with full jitter and waits at
+  least as long as a Retry-After header asks;
+- optionally hedges: when a call has run longer than a percentile of the
+  model's recent latencies, it sends one duplicate and keeps whichever answer
+  arrives first. A hedge is only sent if the request bucket has room for it;
+- falls back to the next model once a model has used up its retries.
+
+The pool does not know any provider SDK. Callers pass a function that makes
+one call on a client, e.g. `pool.call(lambda llm: llm.invoke(prompt), tokens)`.
+Provider clients should have their own retries turned off, so attempts are
+counted once.
+
+Each service builds its pools with `ClientPool.from_env(provider, models)`.
+"""
+
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import AsyncIterator, Awaitable, Callable, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+# Exception class names of provider SDKs (groq, cohere, google.api_core, httpx) that mean "try again".
+_RETRYABLE_NAMES = ("RateLimit", "Timeout", "Connection", "Unavailable", "Overloaded", "ResourceExhausted", "InternalServer")
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+
+def status_code(exc: BaseException) -> Optional[int]:
+    """The HTTP status an SDK exception carries, if any."""
+    for source in (exc, getattr(exc, "response", None)):
+        for attr in ("status_code", "status", "code"):
+            value = getattr(source, attr, None)
+            if isinstance(value, int):
+                return int(value)
+    return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+        return True
+    status = status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return any(name in type(exc).__name__ for name in _RETRYABLE_NAMES)
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds the provider asked us to wait (Retry-After header), if it said."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Refills at `per_minute / 60` units a second, up to `per_minute`. Callers
+    reserve before they wait, so the balance can go negative; the wait is
+    the time until that debt is repaid. This queues callers fairly without
+    a lock held across the sleep. A `per_minute` of 0 means unlimited.
+    """
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self._tokens = per_minute
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Takes `amount` units and returns how many seconds to wait before using them."""
+        if not self.rate or amount <= 0:
+            return 0.0
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.rate)
+
+    def give_back(self, amount: float) -> None:
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+    def try_take(self, amount: float) -> bool:
+        """Takes `amount` units only if they are available right now."""
+        if not self.rate or amount <= 0:
+            return True
+        with self._lock:
+            self._refill()
+            if self._tokens < amount:
+                return False
+            self._tokens -= amount
+            return True
+
+
+class _Model:
+    def __init__(self, name: str, factory: Callable[[], object]):
+        self.name = name
+        self.factory = factory
+        self.latencies: deque = deque(maxlen=LATENCY_WINDOW)
+
+
+class ClientPool:
+    def __init__(
+        self,
+        provider: str,
+        models: Sequence[Tuple[str, Callable[[], object]]],
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_retries: int = 3,
+        backoff_base_seconds: float = 0.5,
+        backoff_max_seconds: float = 20.0,
+        hedge_percentile: float = 0,
+    ):
+        """
+        `models` is `[(model_name, client_factory)]`, the primary model first.
+        `hedge_percentile` (e.g. 95) turns hedging on; 0 leaves it off.
+        """
+        if not models:
+            raise ValueError("A client pool needs at least one model.")
+        self.provider = provider
+        self.models = [_Model(name, factory) for name, factory in models]
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.hedge_percentile = hedge_percentile
+        self._hedge_executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.counts = {"calls": 0, "attempts": 0, "retries": 0, "rate_limited": 0, "hedged": 0, "hedge_wins": 0, "fallbacks": 0, "failures": 0}
+        self.throttled_seconds = 0.0
+
+    @classmethod
+    def from_env(cls, provider: str, models: Sequence[Tuple[str, Callable[[], object]]]) -> "ClientPool":
+        """
+        Builds a pool configured by environment variables. Limits are per
+        provider: {PROVIDER}_REQUESTS_PER_MINUTE and {PROVIDER}_TOKENS_PER_MINUTE
+        (0, the default, means unlimited). Retries and hedging are shared:
+        LLM_MAX_RETRIES, LLM_BACKOFF_BASE_SECONDS, LLM_BACKOFF_MAX_SECONDS and
+        LLM_HEDGE_PERCENTILE.
+        """
+        prefix = provider.upper()
+        return cls(
+            provider,
+            models,
+            requests_per_minute=float(os.environ.get(f"{prefix}_REQUESTS_PER_MINUTE", "0")),
+            tokens_per_minute=float(os.environ.get(f"{prefix}_TOKENS_PER_MINUTE", "0")),
+            max_retries=int(os.environ.get("LLM_MAX_RETRIES", "3")),
+            backoff_base_seconds=float(os.environ.get("LLM_BACKOFF_BASE_SECONDS", "0.5")),
+            backoff_max_seconds=float(os.environ.get("LLM_BACKOFF_MAX_SECONDS", "20")),
+            hedge_percentile=float(os.environ.get("LLM_HEDGE_PERCENTILE", "0")),
+        )
+
+    @property
+    def model_name(self) -> str:
+        return self.models[0].name
+
+    def call(self, fn: Callable[[object], T], tokens: int = 0) -> T:
+        """Runs `fn(client)` under the rate limits, with retries, hedging and fallback."""
+        return self.call_with_model(fn, tokens)[0]
+
+    def call_with_model(self, fn: Callable[[object], T], tokens: int = 0) -> Tuple[T, str]:
+        """`call`, also returning the name of the model that answered (a fallback, if the primary failed)."""
+        self._count("calls")
+        return self._with_fallback(lambda model: (self._sync_attempts(model, fn, tokens), model.name))
+
+    async def acall(self, fn: Callable[[object], Awaitable[T]], tokens: int = 0) -> T:
+        """Async `call`. `fn(client)` returns an awaitable."""
+        return (await self.acall_with_model(fn, tokens))[0]
+
+    async def acall_with_model(self, fn: Callable[[object], Awaitable[T]], tokens: int = 0) -> Tuple[T, str]:
+        """Async `call_with_model`."""
+        self._count("calls")
+        last_error = None
+        for model in self._fallback_order():
+            try:
+                return await self._async_attempts(model, fn, tokens), model.name
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                last_error = e
+        self._count("failures")
+        raise last_error
+
+    async def astream(self, fn: Callable[[object], AsyncIterator[T]], tokens: int = 0) -> AsyncIterator[T]:
+        """
+        Yields from `fn(client)`. Failures before the first item are retried and
+        fall back like `acall`. Once items have been yielded, an error is raised
+        to the caller, since the partial output cannot be taken back. Streams
+        are not hedged.
+        """
+        async for item, _ in self.astream_with_model(fn, tokens):
+            yield item
+
+    async def astream_with_model(self, fn: Callable[[object], AsyncIterator[T]], tokens: int = 0) -> AsyncIterator[Tuple[T, str]]:
+        """`astream`, yielding each item with the name of the model streaming it."""
+        self._count("calls")
+        last_error = None
+        for model in self._fallback_order():
+            for attempt in range(self.max_retries + 1):
+                await self._athrottle(tokens, attempt)
+                started = time.monotonic()
+                yielded = False
+                try:
+                    async for item in fn(model.factory()):
+                        yielded = True
+                        yield item, model.name
+                    model.latencies.append(time.monotonic() - started)
+                    return
+                except Exception as e:
+                    if not self._should_retry(e) or yielded:
+                        raise
+                    last_error = e
+                    if attempt < self.max_retries:
+                        await asyncio.sleep(self._backoff(e, attempt))
+        self._count("failures")
+        raise last_error
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.counts)
+            stats["throttled_seconds"] = round(self.throttled_seconds, 4)
+        stats["hedge_threshold_seconds"] = self._hedge_threshold(self.models[0])
+        return stats
+
+    def close(self) -> None:
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=False)
+
+    # --- Internals ---
+
+    def _count(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self.counts[name] += amount
+
+    def _fallback_order(self):
+        for index, model in enumerate(self.models):
+            if index:
+                self._count("fallbacks")
+            yield model
+
+    def _with_fallback(self, attempts: Callable[[_Model], T]) -> T:
+        last_error = None
+        for model in self._fallback_order():
+            try:
+                return attempts(model)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                last_error = e
+        self._count("failures")
+        raise last_error
+
+    def _wait_seconds(self, tokens: int, attempt: int) -> float:
+        self._count("attempts")
+        if attempt:
+            self._count("retries")
+        wait_seconds = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+        if wait_seconds:
+            with self._lock:
+                self.throttled_seconds += wait_seconds
+        return wait_seconds
+
+    def _throttle(self, tokens: int, attempt: int) -> None:
+        wait_seconds = self._wait_seconds(tokens, attempt)
+        if wait_seconds:
+            time.sleep(wait_seconds)
+
+    async def _athrottle(self, tokens: int, attempt: int) -> None:
+        wait_seconds = self._wait_seconds(tokens, attempt)
+        if wait_seconds:
+            await asyncio.sleep(wait_seconds)
+
+    def _should_retry(self, exc: BaseException) -> bool:
+        if status_code(exc) == 429 or "RateLimit" in type(exc).__name__:
+            self._count("rate_limited")
+        return is_retryable(exc)
+
+    def _backoff(self, exc: BaseException, attempt: int) -> float:
+        """Full-jitter exponential backoff, but never shorter than the provider's Retry-After."""
+        delay = random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** attempt))
+        return max(delay, retry_after(exc) or 0.0)
+
+    def _hedge_threshold(self, model: _Model) -> Optional[float]:
+        if not self.hedge_percentile or len(model.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        latencies = sorted(model.latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * self.hedge_percentile / 100))]
+
+    def _sync_attempts(self, model: _Model, fn: Callable[[object], T], tokens: int) -> T:
+        for attempt in range(self.max_retries + 1):
+            self._throttle(tokens, attempt)
+            try:
+                return self._sync_hedged(model, fn, tokens)
+            except Exception as e:
+                if not self._should_retry(e) or attempt == self.max_retries:
+                    raise
+                time.sleep(self._backoff(e, attempt))
+
+    def _sync_hedged(self, model: _Model, fn: Callable[[object], T], tokens: int) -> T:
+        def timed() -> T:
+            started = time.monotonic()
+            result = fn(model.factory())
+            model.latencies.append(time.monotonic() - started)
+            return result
+
+        threshold = self._hedge_threshold(model)
+        if threshold is None:
+            return timed()
+        with self._lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(thread_name_prefix=f"{self.provider}-hedge")
+        primary = self._hedge_executor.submit(timed)
+        done, _ = wait([primary], timeout=threshold)
+        if done or not self._take_hedge_slot(tokens):
+            return primary.result()
+        # A thread cannot be cancelled: the slower call finishes in the background and is discarded.
+        hedge = self._hedge_executor.submit(timed)
+        pending = {primary, hedge}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = self._first_success(done, pending, hedge)
+            if winner is not None:
+                return winner.result()
+
+    async def _async_attempts(self, model: _Model, fn: Callable[[object], Awaitable[T]], tokens: int) -> T:
+        for attempt in range(self.max_retries + 1):
+            await self._athrottle(tokens, attempt)
+            try:
+                return await self._async_hedged(model, fn, tokens)
+            except Exception as e:
+                if not self._should_retry(e) or attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(e, attempt))
+
+    async def _async_hedged(self, model: _Model, fn: Callable[[object], Awaitable[T]], tokens: int) -> T:
+        async def timed() -> T:
+            started = time.monotonic()
+            result = await fn(model.factory())
+            model.latencies.append(time.monotonic() - started)
+            return result
+
+        threshold = self._hedge_threshold(model)
+        if threshold is None:
+            return await timed()
+        primary = asyncio.ensure_future(timed())
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=threshold)
+            if done or not self._take_hedge_slot(tokens):
+                return await primary
+            hedge = asyncio.ensure_future(timed())
+            pending.add(hedge)
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = self._first_success(done, pending, hedge)
+                if winner is not None:
+                    return winner.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _first_success(self, done: set, pending: set, hedge):
+        """The finished call to answer with: a success, or the last failure once nothing is pending."""
+        for call in done:
+            if call.exception() is None:
+                if call is hedge:
+                    self._count("hedge_wins")
+                return call
+        return next(iter(done)) if not pending else None
+
+    def _take_hedge_slot(self, tokens: int) -> bool:
+        """Hedges only with capacity to spare: a duplicate must not push the pool into the rate limit."""
+        if not self.requests.try_take(1):
+            return False
+        if not self.tokens.try_take(tokens):
+            self.requests.give_back(1)
+            return False
+        self._count("hedged")
+        self._count("attempts")
+        return True
@@ -0,0 +1,257 @@
+"""
+Prometheus metrics shared by the PolicyPal FastAPI services.
+
+Every metric has a `service` label ("doc_qa", "tinyllama"), so the services
+can share dashboards. Durations are histograms with fixed buckets. Each
+observation is a couple of atomic increments, so it is cheap enough for
+every request. Cache statistics are not pushed: registered caches are read
+through their `stats()` when Prometheus scrapes `/metrics`.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from starlette.routing import compile_path
+
+# From cache hits and vector searches (milliseconds) up to cold indexing of big PDFs (minutes).
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+STAGE_DURATION = Histogram(
+    "policypal_stage_duration_seconds", "Duration of one pipeline stage.", ["service", "stage"], buckets=DURATION_BUCKETS
+)
+REQUEST_DURATION = Histogram(
+    "policypal_request_duration_seconds", "Duration of HTTP requests, including streamed bodies.",
+    ["service", "endpoint", "status"], buckets=DURATION_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge("policypal_requests_in_flight", "HTTP requests being handled.", ["service", "endpoint"])
+LLM_TOKENS = Counter(
+    "policypal_llm_tokens_total", "Tokens sent to and generated by LLMs (cache hits excluded).", ["service", "stage", "kind"]
+)
+LLM_CALLS = Counter("policypal_llm_calls_total", "LLM calls that reached the model (cache hits excluded).", ["service", "stage"])
+JOBS = Gauge("policypal_jobs", "Submitted jobs by state (queued, running).", ["service", "state"])
+DOCUMENT_CHUNKS = Histogram(
+    "policypal_document_chunks", "Chunks produced per indexed document.", ["service"],
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000),
+)
+EMBEDDINGS = Counter(
+    "policypal_embeddings_total", "Texts embedded, by kind (documents include chunk embedding cache hits).", ["service", "kind"]
+)
+
+
+def observe_stage(service: str, stage: str, seconds: float) -> None:
+    STAGE_DURATION.labels(service, stage).observe(seconds)
+
+
+def stage_observer(service: str) -> Callable[[str, float], None]:
+    """A `(stage, seconds)` callback recording into the stage histogram, e.g. for StageTimings."""
+    return lambda stage, seconds: observe_stage(service, stage, seconds)
+
+
+@contextmanager
+def stage_timer(service: str, stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(service, stage, time.perf_counter() - started)
+
+
+def record_llm_call(service: str, stage: str, prompt_tokens: int, completion_tokens: int) -> None:
+    LLM_CALLS.labels(service, stage).inc()
+    LLM_TOKENS.labels(service, stage, "prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(service, stage, "completion").inc(completion_tokens)
+
+
+def record_document(service: str, chunks: int) -> None:
+    DOCUMENT_CHUNKS.labels(service).observe(chunks)
+
+
+def record_embeddings(service: str, kind: str, count: int) -> None:
+    EMBEDDINGS.labels(service, kind).inc(count)
+
+
+def set_job_counts(service: str, queued: int, running: int) -> None:
+    JOBS.labels(service, "queued").set(queued)
+    JOBS.labels(service, "running").set(running)
+
+
+class _CacheStatsCollector:
+    """Exposes `stats()` dicts (hits, misses, evictions, sizes) of registered caches at scrape time."""
+
+    COUNTERS = ("hits", "misses", "evictions")
+
+    def __init__(self):
+        self._caches: Dict[tuple, Callable[[], Optional[dict]]] = {}
+
+    def register(self, service: str, cache: str, stats: Callable[[], Optional[dict]]) -> None:
+        self._caches[(service, cache)] = stats
+
+    def describe(self):
+        # Lets the registry accept the collector without calling collect() at registration.
+        return []
+
+    def collect(self):
+        counters = {
+            name: CounterMetricFamily(f"policypal_cache_{name}", f"Cache {name}.", labels=["service", "cache"])
+            for name in self.COUNTERS
+        }
+        hit_rate = GaugeMetricFamily("policypal_cache_hit_rate", "Cache hit rate since start.", labels=["service", "cache"])
+        size = GaugeMetricFamily("policypal_cache_entries", "Entries held in memory by the cache.", labels=["service", "cache"])
+        for (service, cache), stats in list(self._caches.items()):
+            values = stats() or {}
+            for name in self.COUNTERS:
+                if name in values:
+                    counters[name].add_metric([service, cache], values[name])
+            lookups = values.get("hits", 0) + values.get("misses", 0)
+            hit_rate.add_metric([service, cache], values["hits"] / lookups if lookups else 0.0)
+            entries = values.get("open_entries", values.get("entries"))
+            if entries is not None:
+                size.add_metric([service, cache], entries)
+        yield from counters.values()
+        yield hit_rate
+        yield size
+
+
+class _SingleFlightStatsCollector:
+    """Exposes `stats()` of registered `shared.singleflight` groups at scrape time."""
+
+    def __init__(self):
+        self._groups: Dict[tuple, Callable[[], Optional[dict]]] = {}
+
+    def register(self, service: str, group: str, stats: Callable[[], Optional[dict]]) -> None:
+        self._groups[(service, group)] = stats
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        executions = CounterMetricFamily(
+            "policypal_singleflight_executions", "Calls that did the work.", labels=["service", "group"]
+        )
+        coalesced = CounterMetricFamily(
+            "policypal_singleflight_coalesced", "Duplicate calls that shared an in-flight result.", labels=["service", "group"]
+        )
+        in_flight = GaugeMetricFamily("policypal_singleflight_in_flight", "Distinct calls running.", labels=["service", "group"])
+        for (service, group), stats in list(self._groups.items()):
+            values = stats()
+            if values is None:
+                continue
+            executions.add_metric([service, group], values["executions"])
+            coalesced.add_metric([service, group], values["coalesced"])
+            in_flight.add_metric([service, group], values["in_flight"])
+        yield executions
+        yield coalesced
+        yield in_flight
+
+
+class _ClientPoolStatsCollector:
+    """Exposes `stats()` of registered `shared.llm_client.ClientPool`s at scrape time."""
+
+    EVENTS = ("calls", "attempts", "retries", "rate_limited", "hedged", "hedge_wins", "fallbacks", "failures")
+
+    def __init__(self):
+        self._pools: Dict[tuple, Callable[[], Optional[dict]]] = {}
+
+    def register(self, service: str, pool: str, stats: Callable[[], Optional[dict]]) -> None:
+        self._pools[(service, pool)] = stats
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        events = CounterMetricFamily(
+            "policypal_client_pool_events",
+            "Provider calls, attempts, retries, rate limits (429s), hedges, hedge wins, model fallbacks and failures.",
+            labels=["service", "pool", "event"],
+        )
+        throttled = CounterMetricFamily(
+            "policypal_client_pool_throttled_seconds", "Time spent waiting on the pool's rate limits.", labels=["service", "pool"]
+        )
+        for (service, pool), stats in list(self._pools.items()):
+            values = stats()
+            if values is None:
+                continue
+            for event in self.EVENTS:
+                events.add_metric([service, pool, event], values[event])
+            throttled.add_metric([service, pool], values["throttled_seconds"])
+        yield events
+        yield throttled
+
+
+_cache_stats = _CacheStatsCollector()
+REGISTRY.register(_cache_stats)
+_singleflight_stats = _SingleFlightStatsCollector()
+REGISTRY.register(_singleflight_stats)
+_client_pool_stats = _ClientPoolStatsCollector()
+REGISTRY.register(_client_pool_stats)
+
+
+def register_cache(service: str, cache: str, stats: Callable[[], Optional[dict]]) -> None:
+    """Publishes a cache's `stats()` (hits/misses/evictions/entries) as `policypal_cache_*` metrics."""
+    _cache_stats.register(service, cache, stats)
+
+
+def register_singleflight(service: str, group: str, stats: Callable[[], Optional[dict]]) -> None:
+    """Publishes the executed/coalesced counts of a single-flight group as `policypal_singleflight_*` metrics."""
+    _singleflight_stats.register(service, group, stats)
+
+
+def register_client_pool(service: str, pool: str, stats: Callable[[], Optional[dict]]) -> None:
+    """Publishes a client pool's event counts as `policypal_client_pool_*` metrics."""
+    _client_pool_stats.register(service, pool, stats)
+
+
+def render():
+    """`(body, content_type)` of the Prometheus text exposition of every metric."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that tracks in-flight requests and request durations per
+    endpoint. Durations cover the whole response, including streamed bodies.
+    `paths` are route templates (e.g. "/api/jobs/{job_id}"). A request is
+    labelled with the template its path matches, so path parameters don't add
+    labels. Paths matching none of them are grouped as "other", which keeps
+    label cardinality bounded.
+    """
+
+    def __init__(self, app, service: str, paths: Optional[Iterable[str]] = None, exclude: Iterable[str] = ("/metrics",)):
+        self.app = app
+        self.service = service
+        self.paths = [(path, compile_path(path)[0]) for path in sorted(set(paths))] if paths is not None else None
+        self.exclude = set(exclude)
+
+    def _endpoint(self, path: str) -> str:
+        if self.paths is None:
+            return path
+        for template, pattern in self.paths:
+            if pattern.match(path):
+                return template
+        return "other"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = self._endpoint(scope["path"])
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(self.service, endpoint)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            REQUEST_DURATION.labels(self.service, endpoint, str(status["code"])).observe(time.perf_counter() - started)
+
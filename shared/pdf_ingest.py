@@ -0,0 +1,97 @@
+"""
+In-memory PDF ingestion shared by the PolicyPal Python services.
+
+PDFs are parsed straight from their bytes (no temp files) and text comes out
+lazily, one `(page_number, text)` pair at a time, in page order. Page numbers
+are 0-based, matching what PyPDFLoader used to put in chunk metadata.
+
+Large documents are split into one page range per worker, extracted in parallel
+by a process pool. Text extraction is CPU-bound pure Python, so threads would not
+help. The pool is created on first use and reused after that.
+"""
+
+import os
+import atexit
+import threading
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+from pypdf import PdfReader
+
+PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "64"))
+INGEST_WORKERS = int(os.environ.get("PDF_INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # "spawn" rather than fork: the services are multi-threaded, and forking
+            # a process that holds other threads' locks can deadlock the child.
+            _pool = ProcessPoolExecutor(max_workers=INGEST_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            atexit.register(shutdown_pool)
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _extract_page_range(pdf_bytes: bytes, start: int, stop: int) -> List[Tuple[int, str]]:
+    reader = PdfReader(BytesIO(pdf_bytes))
+    return [(number, reader.pages[number].extract_text() or "") for number in range(start, stop)]
+
+
+def page_count(pdf_bytes: bytes) -> int:
+    return len(PdfReader(BytesIO(pdf_bytes)).pages)
+
+
+def iter_pages(pdf_bytes: bytes, parallel_min_pages: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Yields `(page_number, text)` for every page, in order. Documents with at least
+    `parallel_min_pages` pages (default PDF_PARALLEL_MIN_PAGES) are extracted across
+    the process pool. Pages are still yielded as soon as their range is done.
+    """
+    reader = PdfReader(BytesIO(pdf_bytes))
+    total_pages = len(reader.pages)
+    threshold = PARALLEL_MIN_PAGES if parallel_min_pages is None else parallel_min_pages
+
+    if INGEST_WORKERS <= 1 or total_pages < threshold:
+        for number, page in enumerate(reader.pages):
+            yield number, page.extract_text() or ""
+        return
+
+    # One contiguous range per worker: every range costs a copy of the whole PDF sent
+    # to its worker and a full re-parse there, which more, smaller ranges would repeat.
+    range_size = max(1, -(-total_pages // INGEST_WORKERS))
+    pool = _get_pool()
+    futures = [
+        pool.submit(_extract_page_range, pdf_bytes, start, min(start + range_size, total_pages))
+        for start in range(0, total_pages, range_size)
+    ]
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        # The consumer may stop early; don't keep extracting pages nobody will read.
+        for future in futures:
+            future.cancel()
+
+
+def extract_text(pdf_bytes: bytes, separator: str = "\n") -> str:
+    """Full text of the document, pages joined with `separator`."""
+    return separator.join(text for _, text in iter_pages(pdf_bytes))
+
+
+def read_pdf_bytes(pdf_path: str) -> bytes:
+    with open(pdf_path, "rb") as f:
+        return f.read()
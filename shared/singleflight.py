@@ -0,0 +1,91 @@
+"""
+Request coalescing ("single flight") for duplicate work that is in flight at
+the same time.
+
+While a call for some key is running, further calls with the same key do
+not start their own: they wait for the first one and share its result (or
+its exception). Nothing is kept once the call finishes, so this complements
+the result caches rather than replacing them: it covers the window in which
+the first request has not yet produced anything cacheable.
+
+`SingleFlight` coordinates threads and `AsyncSingleFlight` coordinates
+coroutines on one event loop. Both count executions and coalesced calls.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class _Counters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+
+    def _count(self, shared: bool) -> None:
+        with self._lock:
+            if shared:
+                self.coalesced += 1
+            else:
+                self.executions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            calls = self.executions + self.coalesced
+            return {
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+                "coalesced_rate": round(self.coalesced / calls, 4) if calls else 0.0,
+            }
+
+
+class SingleFlight(_Counters):
+    def __init__(self):
+        super().__init__()
+        self._calls: Dict[str, Future] = {}
+
+    def do(self, key: str, fn: Callable[[], T]) -> Tuple[T, bool]:
+        """Runs `fn()` unless a call for `key` is already running. Returns `(result, shared)`."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        self._count(not leader)
+        if not leader:
+            return future.result(), True
+
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return future.result(), False
+
+
+class AsyncSingleFlight(_Counters):
+    def __init__(self):
+        super().__init__()
+        self._calls: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        Awaits `fn()` unless a call for `key` is already running. Returns
+        `(result, shared)`. The shared call runs as its own task, so a caller
+        that is cancelled (e.g. a client disconnecting) does not cancel it for
+        the others.
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+        if not shared:
+            task = self._calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        self._count(shared)
+        return await asyncio.shield(task), shared